@@ -0,0 +1,242 @@
+import argparse
+import random
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Union
+import numpy as np
+from bitboard import FULL, FILE_A, FILE_B, FILE_G, FILE_H, iter_squares
+from board import ChessBoard
+from pieces import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from position import Position
+
+# Batched feature extraction over many positions at once. Positions become rows of twelve
+# uint64 bitboards (white P N B R Q K, then black), and every feature below is computed
+# with whole-array operations, one pass per piece kind and direction.
+MATERIAL_VALUES = np.array([1, 3, 3, 5, 9, 0], dtype=np.int64)
+
+_U = np.uint64
+_FULL = _U(FULL)
+_NOT_FILE_A = _U(FULL ^ FILE_A)
+_NOT_FILE_H = _U(FULL ^ FILE_H)
+_NOT_FILE_AB = _U(FULL ^ (FILE_A | FILE_B))
+_NOT_FILE_GH = _U(FULL ^ (FILE_G | FILE_H))
+
+
+def _shifter(mask: np.uint64, amount: int) -> Callable[[np.ndarray], np.ndarray]:
+    # Positive amounts shift towards higher square indexes (south/east), negative ones
+    # towards lower; the mask drops the file that would wrap around the board edge.
+    if amount > 0:
+        shift = _U(amount)
+        return lambda bb: (bb & mask) << shift
+    shift = _U(-amount)
+    return lambda bb: (bb & mask) >> shift
+
+
+# Same orientation as bitboard.py: north is a right shift by 8.
+NORTH = _shifter(_FULL, -8)
+SOUTH = _shifter(_FULL, 8)
+EAST = _shifter(_NOT_FILE_H, 1)
+WEST = _shifter(_NOT_FILE_A, -1)
+NORTH_EAST = _shifter(_NOT_FILE_H, -7)
+NORTH_WEST = _shifter(_NOT_FILE_A, -9)
+SOUTH_EAST = _shifter(_NOT_FILE_H, 9)
+SOUTH_WEST = _shifter(_NOT_FILE_A, 7)
+ROOK_SHIFTS = (NORTH, SOUTH, EAST, WEST)
+BISHOP_SHIFTS = (NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST)
+KING_SHIFTS = ROOK_SHIFTS + BISHOP_SHIFTS
+KNIGHT_SHIFTS = (_shifter(_NOT_FILE_H, -15), _shifter(_NOT_FILE_A, -17),
+                 _shifter(_NOT_FILE_GH, -6), _shifter(_NOT_FILE_AB, -10),
+                 _shifter(_NOT_FILE_A, 15), _shifter(_NOT_FILE_H, 17),
+                 _shifter(_NOT_FILE_AB, 6), _shifter(_NOT_FILE_GH, 10))
+PAWN_SHIFTS = ((NORTH_EAST, NORTH_WEST), (SOUTH_EAST, SOUTH_WEST))
+
+
+class BatchFeatures(NamedTuple):
+    # attack_counts[n, color, square]: pieces of that colour attacking the square, own
+    # pieces on it included (defenders), x-rays not. mobility[n, color]: attacked squares
+    # not occupied by that colour, summed over its pieces. material[n, color] in pawns.
+    attack_counts: np.ndarray
+    mobility: np.ndarray
+    material: np.ndarray
+
+
+def encode_bitboards(boards: Sequence[Union[ChessBoard, Position]]) -> np.ndarray:
+    return np.array([board.bitboards for board in boards], dtype=np.uint64).reshape(-1, 12)
+
+
+def to_planes(bitboards: np.ndarray) -> np.ndarray:
+    # (N, 12) uint64 -> (N, 12, 8, 8) uint8 with planes[n, i, y, x] for square y * 8 + x.
+    count = bitboards.shape[0]
+    as_bytes = bitboards.astype("<u8").view(np.uint8).reshape(count, 12, 8)
+    return np.unpackbits(as_bytes, axis=2, bitorder="little").reshape(count, 12, 8, 8)
+
+
+def encode_planes(boards: Sequence[Union[ChessBoard, Position]]) -> np.ndarray:
+    return to_planes(encode_bitboards(boards))
+
+
+_BYTE_COUNTS = np.array([bin(value).count("1") for value in range(256)], dtype=np.int64)
+
+
+def popcount(bitboards: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bitboards).astype(np.int64)
+    # NumPy < 2.0: count per byte through a lookup table.
+    as_bytes = bitboards.astype("<u8").view(np.uint8).reshape(bitboards.shape + (8,))
+    return _BYTE_COUNTS[as_bytes].sum(axis=-1)
+
+
+def _square_bits(bitboards: np.ndarray) -> np.ndarray:
+    # (N,) uint64 -> (N, 64) uint8, one column per square.
+    as_bytes = bitboards.astype("<u8").view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis=1, bitorder="little")
+
+
+def _slide(sliders: np.ndarray, empty: np.ndarray, shift: Callable) -> np.ndarray:
+    # Occluded fill in one direction. Along a single direction only the nearest slider can
+    # reach a square, so these sets add up to exact per-square attacker counts.
+    flood = sliders
+    ray = sliders
+    for _ in range(6):
+        ray = shift(ray) & empty
+        flood = flood | ray
+    return shift(flood)
+
+
+def _attack_sets(bitboards: np.ndarray, color: int) -> List[np.ndarray]:
+    # Every (N,) attack set for one colour, split so that no square is counted twice within
+    # a set: one per knight/king jump, pawn capture direction and slider direction.
+    base = color * 6
+    empty = ~(np.bitwise_or.reduce(bitboards, axis=1))
+    pawns = bitboards[:, base + PAWN]
+    knights = bitboards[:, base + KNIGHT]
+    kings = bitboards[:, base + KING]
+    diagonal = bitboards[:, base + BISHOP] | bitboards[:, base + QUEEN]
+    orthogonal = bitboards[:, base + ROOK] | bitboards[:, base + QUEEN]
+
+    sets = [shift(pawns) for shift in PAWN_SHIFTS[color]]
+    sets.extend(shift(knights) for shift in KNIGHT_SHIFTS)
+    sets.extend(shift(kings) for shift in KING_SHIFTS)
+    sets.extend(_slide(orthogonal, empty, shift) for shift in ROOK_SHIFTS)
+    sets.extend(_slide(diagonal, empty, shift) for shift in BISHOP_SHIFTS)
+    return sets
+
+
+def compute_features(bitboards: np.ndarray) -> BatchFeatures:
+    count = bitboards.shape[0]
+    attack_counts = np.zeros((count, 2, 64), dtype=np.uint8)
+    mobility = np.zeros((count, 2), dtype=np.int64)
+    pieces = popcount(bitboards)
+    material = np.stack([pieces[:, 0:6] @ MATERIAL_VALUES, pieces[:, 6:12] @ MATERIAL_VALUES],
+                        axis=1)
+    for color in (0, 1):
+        own = np.bitwise_or.reduce(bitboards[:, color * 6:color * 6 + 6], axis=1)
+        not_own = ~own
+        for attacks in _attack_sets(bitboards, color):
+            attack_counts[:, color] += _square_bits(attacks)
+            mobility[:, color] += popcount(attacks & not_own)
+    return BatchFeatures(attack_counts, mobility, material)
+
+
+def scalar_features(board: ChessBoard) -> BatchFeatures:
+    # One position at a time through the per-piece generators: the reference the batch
+    # results are checked against.
+    attack_counts = np.zeros((2, 64), dtype=np.uint8)
+    mobility = np.zeros(2, dtype=np.int64)
+    material = np.zeros(2, dtype=np.int64)
+    board_state = board.board_state
+    for color, name in enumerate(("white", "black")):
+        own = board.pieces(name)
+        enemy = board.pieces("black" if name == "white" else "white")
+        for piece in own:
+            material[color] += MATERIAL_VALUES[piece.piece_type]
+            mobility[color] += len(piece.get_possible_moves(
+                pieces_pos=board_state, enemy_pieces=enemy, own_pieces=own, own_king=own.king,
+                only_attacking_moves=True))
+            for square in iter_squares(board.attacks_from(piece.square)):
+                attack_counts[color, square] += 1
+    return BatchFeatures(attack_counts, mobility, material)
+
+
+def check_against_scalar(boards: Sequence[ChessBoard], features: BatchFeatures) -> List[str]:
+    errors = []
+    for index, board in enumerate(boards):
+        reference = scalar_features(board)
+        for name, expected, actual in zip(BatchFeatures._fields, reference,
+                                          (feature[index] for feature in features)):
+            if not np.array_equal(expected, actual):
+                errors.append(f"{board.to_fen()}: {name} differs")
+    return errors
+
+
+def random_positions(count: int, seed: int = 0, max_plies: int = 120) -> List[Position]:
+    rng = random.Random(seed)
+    positions = []
+    board = ChessBoard()
+    while len(positions) < count:
+        moves = board.generate_legal_moves()
+        if not moves or len(board.move_stack) >= max_plies:
+            board = ChessBoard()
+            continue
+        board.make_move(rng.choice(moves))
+        positions.append(board.to_position())
+    return positions
+
+
+def measure_throughput(positions: Sequence[Position], batch_size: int) -> Dict[str, float]:
+    start = time.perf_counter()
+    encode_seconds = 0.0
+    for offset in range(0, len(positions), batch_size):
+        encode_start = time.perf_counter()
+        bitboards = encode_bitboards(positions[offset:offset + batch_size])
+        to_planes(bitboards)
+        encode_seconds += time.perf_counter() - encode_start
+        compute_features(bitboards)
+    seconds = time.perf_counter() - start
+    return {"positions": len(positions),
+            "seconds": seconds,
+            "positions_per_second": len(positions) / seconds if seconds > 0 else 0.0,
+            "encode_positions_per_second":
+                len(positions) / encode_seconds if encode_seconds > 0 else 0.0}
+
+
+def measure_scalar_throughput(positions: Sequence[Position]) -> float:
+    boards = [ChessBoard.from_position(position) for position in positions]
+    start = time.perf_counter()
+    for board in boards:
+        scalar_features(board)
+    seconds = time.perf_counter() - start
+    return len(boards) / seconds if seconds > 0 else 0.0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Batched NumPy position features.")
+    parser.add_argument("--count", type=int, default=20_000, help="positions to process")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--check", type=int, default=500,
+                        help="positions to verify against the scalar generators")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    positions = random_positions(args.count, args.seed)
+    if args.check:
+        sample = positions[:args.check]
+        errors = check_against_scalar([ChessBoard.from_position(position) for position in sample],
+                                      compute_features(encode_bitboards(sample)))
+        for line in errors[:20]:
+            print(line)
+        print(f"scalar check on {len(sample)} positions: {'FAIL' if errors else 'ok'}")
+        if errors:
+            return 1
+
+    result = measure_throughput(positions, args.batch_size)
+    scalar_rate = measure_scalar_throughput(positions[:1000])
+    print(f"batch: {result['positions']:,} positions in {result['seconds']:.3f}s "
+          f"({result['positions_per_second']:,.0f} positions/s, encoding alone "
+          f"{result['encode_positions_per_second']:,.0f} positions/s)")
+    print(f"scalar generators: {scalar_rate:,.0f} positions/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import argparse
+import random
+import sys
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+from board import ChessBoard
+from move import Move
+from position import Position
+
+
+def measure_board_memory(count: int = 1000) -> Dict[str, float]:
+    # Measured twice: fresh boards, and boards while a {(x, y): piece} board_state view of
+    # each is held, as callers of the legacy get_possible_moves API do.
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        boards = [ChessBoard() for _ in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+        views = [board.board_state for board in boards]
+        with_view = tracemalloc.get_traced_memory()[0]
+        del views
+    finally:
+        tracemalloc.stop()
+
+    board = boards[0]
+    king = board.king("white")
+    enemy_king = board.king("black")
+    number = 200_000
+    access_seconds = timeit.timeit(lambda: (king.x, king.y, king.color, king.is_own_piece(enemy_king)),
+                                   number=number)
+    construct_seconds = timeit.timeit(ChessBoard, number=2000)
+    return {"bytes_per_board": (after - before) / count,
+            "bytes_per_board_with_view": (with_view - before) / count,
+            "attribute_access_ns": access_seconds / number * 1e9,
+            "construct_us": construct_seconds / 2000 * 1e6}
+
+
+def run_memory(args: argparse.Namespace) -> None:
+    result = measure_board_memory(args.count)
+    print(f"bytes per board:        {result['bytes_per_board']:,.0f} "
+          f"({result['bytes_per_board_with_view']:,.0f} while a board_state view is held)")
+    print(f"piece attribute access: {result['attribute_access_ns']:,.0f} ns")
+    print(f"board construction:     {result['construct_us']:,.1f} us")
+
+
+def _random_walk(count: int, seed: int) -> List[Move]:
+    # A line of `count` random legal moves, restarting from the initial position at game end.
+    rng = random.Random(seed)
+    board = ChessBoard()
+    moves = []
+    while len(moves) < count:
+        legal = board.generate_legal_moves()
+        if not legal or board.halfmove_clock >= 100:
+            board = ChessBoard()
+            moves.append(None)
+            continue
+        move = rng.choice(legal)
+        board.make_move(move)
+        moves.append(move)
+    return moves
+
+
+def _traced_bytes(build: Callable[[], list]) -> float:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        nodes = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before) / len(nodes)
+
+
+def measure_snapshot_memory(count: int = 2000, seed: int = 0) -> Dict[str, float]:
+    # Stores every node of a random line three ways: Position snapshots derived with push(),
+    # copies of the {(x, y): piece} dict, and whole ChessBoard copies.
+    walk = _random_walk(count, seed)
+    root = ChessBoard().to_position()
+
+    def build_positions() -> List[Position]:
+        nodes = []
+        position = root
+        for move in walk:
+            position = root if move is None else position.push(move)
+            nodes.append(position)
+        return nodes
+
+    def build_dicts() -> list:
+        board = ChessBoard()
+        nodes = []
+        for move in walk:
+            if move is None:
+                board = ChessBoard()
+            else:
+                board.make_move(move)
+            nodes.append(dict(board.board_state))
+        return nodes
+
+    positions = build_positions()
+    position_bytes = _traced_bytes(build_positions)
+    dict_bytes = _traced_bytes(build_dicts)
+    board_bytes = _traced_bytes(lambda: [ChessBoard.from_position(position)
+                                         for position in positions[:500]])
+
+    board = ChessBoard.from_position(positions[len(positions) // 2])
+    parent = board.to_position()
+    move = board.generate_legal_moves()[0]
+    state = board.board_state
+    number = 20_000
+    return {"position_bytes": position_bytes,
+            "dict_bytes": dict_bytes,
+            "board_bytes": board_bytes,
+            "push_us": timeit.timeit(lambda: parent.push(move), number=number) / number * 1e6,
+            "dict_copy_us": timeit.timeit(state.copy, number=number) / number * 1e6,
+            "board_copy_us": timeit.timeit(lambda: ChessBoard.from_position(parent),
+                                           number=2000) / 2000 * 1e6}
+
+
+def run_snapshots(args: argparse.Namespace) -> None:
+    result = measure_snapshot_memory(args.count, args.seed)
+    print(f"bytes per stored node: Position {result['position_bytes']:,.0f}, "
+          f"dict copy {result['dict_bytes']:,.0f}, ChessBoard {result['board_bytes']:,.0f}")
+    print(f"deriving a child:      Position.push {result['push_us']:.2f} us, "
+          f"dict copy {result['dict_copy_us']:.2f} us, ChessBoard {result['board_copy_us']:.1f} us")
+
+
+def _per_piece_attacks(board: ChessBoard) -> int:
+    # The per-piece route: every piece of both colours through get_possible_moves, once for
+    # its moves and once for the squares it attacks.
+    board_state = board.board_state
+    total = 0
+    for color, other in (("white", "black"), ("black", "white")):
+        own = board.pieces(color)
+        enemy = board.pieces(other)
+        for piece in list(own):
+            total += len(piece.get_possible_moves(pieces_pos=board_state, enemy_pieces=enemy,
+                                                  own_pieces=own, own_king=own.king))
+            total += len(piece.get_possible_moves(pieces_pos=board_state, enemy_pieces=enemy,
+                                                  own_pieces=own, own_king=own.king,
+                                                  only_attacking_moves=True))
+    return total
+
+
+def measure_attack_map(count: int = 300, seed: int = 0) -> Dict[str, float]:
+    walk = _random_walk(count, seed)
+    boards = []
+    board = ChessBoard()
+    for move in walk:
+        if move is None:
+            board = ChessBoard()
+        else:
+            board.make_move(move)
+            boards.append(ChessBoard.from_position(board.to_position()))
+
+    def per_piece() -> None:
+        for position in boards:
+            _per_piece_attacks(position)
+
+    def attack_map() -> None:
+        for position in boards:
+            position._compute_attack_map()
+
+    def cached() -> None:
+        for position in boards:
+            position.attack_map()
+
+    cached()
+    number = 3
+    scale = 1e6 / (number * len(boards))
+    return {"positions": len(boards),
+            "per_piece_us": timeit.timeit(per_piece, number=number) * scale,
+            "attack_map_us": timeit.timeit(attack_map, number=number) * scale,
+            "cached_us": timeit.timeit(cached, number=number) * scale}
+
+
+def run_attacks(args: argparse.Namespace) -> None:
+    result = measure_attack_map(args.count, args.seed)
+    print(f"positions:                      {result['positions']:,}")
+    print(f"per-piece get_possible_moves:   {result['per_piece_us']:,.1f} us/position")
+    print(f"ChessBoard.attack_map():        {result['attack_map_us']:,.1f} us/position "
+          f"({result['per_piece_us'] / result['attack_map_us']:.1f}x)")
+    print(f"attack_map(), cached:           {result['cached_us']:,.2f} us/position")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro benchmarks for the board representation.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    memory_parser = subparsers.add_parser("memory", help="bytes per board and attribute access cost")
+    memory_parser.add_argument("--count", type=int, default=1000, help="boards to allocate")
+    memory_parser.set_defaults(run=run_memory)
+
+    snapshot_parser = subparsers.add_parser("snapshots",
+                                            help="memory and cost of stored variation-tree nodes")
+    snapshot_parser.add_argument("--count", type=int, default=2000, help="nodes to store")
+    snapshot_parser.add_argument("--seed", type=int, default=0)
+    snapshot_parser.set_defaults(run=run_snapshots)
+
+    attack_parser = subparsers.add_parser("attacks",
+                                          help="whole-board attack map against per-piece queries")
+    attack_parser.add_argument("--count", type=int, default=300, help="positions to measure")
+    attack_parser.add_argument("--seed", type=int, default=0)
+    attack_parser.set_defaults(run=run_attacks)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
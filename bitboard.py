@@ -0,0 +1,220 @@
+from typing import Iterator, List, Tuple
+
+# Square index layout: index = y * 8 + x, so bit 0 is (0, 0) (a8) and bit 63 is (7, 7) (h1).
+# "North" is the direction white pawns move (decreasing y), i.e. a right shift by 8.
+FULL = 0xFFFF_FFFF_FFFF_FFFF
+FILE_A = 0x0101_0101_0101_0101
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL ^ FILE_A
+NOT_FILE_H = FULL ^ FILE_H
+NOT_FILE_AB = FULL ^ (FILE_A | FILE_B)
+NOT_FILE_GH = FULL ^ (FILE_G | FILE_H)
+RANK_8 = 0xFF
+RANK_1 = RANK_8 << 56
+
+WHITE_INDEX = 0
+BLACK_INDEX = 1
+
+NORTH, SOUTH, EAST, WEST, NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST = range(8)
+ROOK_DIRECTIONS = (NORTH, SOUTH, EAST, WEST)
+BISHOP_DIRECTIONS = (NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST)
+# Directions that walk towards higher square indexes; their first blocker is the lowest set bit.
+POSITIVE_DIRECTIONS = (SOUTH, EAST, SOUTH_EAST, SOUTH_WEST)
+
+SQUARE_COORDS: Tuple[Tuple[int, int], ...] = tuple((sq & 7, sq >> 3) for sq in range(64))
+
+
+def square_index(x: int, y: int) -> int:
+    return (y << 3) | x
+
+
+def square_coords(square: int) -> Tuple[int, int]:
+    return SQUARE_COORDS[square]
+
+
+def lsb(bb: int) -> int:
+    return (bb & -bb).bit_length() - 1
+
+
+def msb(bb: int) -> int:
+    return bb.bit_length() - 1
+
+
+def popcount(bb: int) -> int:
+    return bb.bit_count()
+
+
+def iter_squares(bb: int) -> Iterator[int]:
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def shift_north(bb: int) -> int:
+    return bb >> 8
+
+
+def shift_south(bb: int) -> int:
+    return (bb << 8) & FULL
+
+
+def shift_east(bb: int) -> int:
+    return ((bb & NOT_FILE_H) << 1) & FULL
+
+
+def shift_west(bb: int) -> int:
+    return (bb & NOT_FILE_A) >> 1
+
+
+def shift_north_east(bb: int) -> int:
+    return (bb & NOT_FILE_H) >> 7
+
+
+def shift_north_west(bb: int) -> int:
+    return (bb & NOT_FILE_A) >> 9
+
+
+def shift_south_east(bb: int) -> int:
+    return ((bb & NOT_FILE_H) << 9) & FULL
+
+
+def shift_south_west(bb: int) -> int:
+    return ((bb & NOT_FILE_A) << 7) & FULL
+
+
+_SHIFTS = (shift_north, shift_south, shift_east, shift_west,
+           shift_north_east, shift_north_west, shift_south_east, shift_south_west)
+
+
+def knight_attacks(bb: int) -> int:
+    return ((((bb & NOT_FILE_H) >> 15) | ((bb & NOT_FILE_A) >> 17)
+             | ((bb & NOT_FILE_GH) >> 6) | ((bb & NOT_FILE_AB) >> 10)
+             | ((bb & NOT_FILE_A) << 15) | ((bb & NOT_FILE_H) << 17)
+             | ((bb & NOT_FILE_AB) << 6) | ((bb & NOT_FILE_GH) << 10)) & FULL)
+
+
+def king_attacks(bb: int) -> int:
+    sideways = shift_east(bb) | shift_west(bb)
+    row = bb | sideways
+    return sideways | shift_north(row) | shift_south(row)
+
+
+def pawn_attacks(bb: int, color_index: int) -> int:
+    if color_index == WHITE_INDEX:
+        return shift_north_east(bb) | shift_north_west(bb)
+    return shift_south_east(bb) | shift_south_west(bb)
+
+
+def _build_rays() -> List[List[int]]:
+    rays = []
+    for shift in _SHIFTS:
+        direction_rays = []
+        for square in range(64):
+            ray = 0
+            bb = shift(1 << square)
+            while bb:
+                ray |= bb
+                bb = shift(bb)
+            direction_rays.append(ray)
+        rays.append(direction_rays)
+    return rays
+
+
+RAYS = _build_rays()
+KNIGHT_ATTACKS = [knight_attacks(1 << sq) for sq in range(64)]
+KING_ATTACKS = [king_attacks(1 << sq) for sq in range(64)]
+PAWN_ATTACKS = [[pawn_attacks(1 << sq, color_index) for sq in range(64)]
+                for color_index in (WHITE_INDEX, BLACK_INDEX)]
+
+_NORTH_RAYS, _SOUTH_RAYS, _EAST_RAYS, _WEST_RAYS, \
+    _NORTH_EAST_RAYS, _NORTH_WEST_RAYS, _SOUTH_EAST_RAYS, _SOUTH_WEST_RAYS = RAYS
+
+
+def ray_attacks(square: int, occupied: int, direction: int) -> int:
+    ray = RAYS[direction][square]
+    blockers = ray & occupied
+    if blockers:
+        if direction in POSITIVE_DIRECTIONS:
+            ray ^= RAYS[direction][(blockers & -blockers).bit_length() - 1]
+        else:
+            ray ^= RAYS[direction][blockers.bit_length() - 1]
+    return ray
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    # Unrolled ray_attacks for the four orthogonal directions.
+    attacks = 0
+
+    ray = _NORTH_RAYS[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _NORTH_RAYS[blockers.bit_length() - 1]
+    attacks |= ray
+
+    ray = _SOUTH_RAYS[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _SOUTH_RAYS[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+
+    ray = _EAST_RAYS[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _EAST_RAYS[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+
+    ray = _WEST_RAYS[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _WEST_RAYS[blockers.bit_length() - 1]
+    return attacks | ray
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    # Unrolled ray_attacks for the four diagonal directions.
+    attacks = 0
+
+    ray = _NORTH_EAST_RAYS[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _NORTH_EAST_RAYS[blockers.bit_length() - 1]
+    attacks |= ray
+
+    ray = _NORTH_WEST_RAYS[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _NORTH_WEST_RAYS[blockers.bit_length() - 1]
+    attacks |= ray
+
+    ray = _SOUTH_EAST_RAYS[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _SOUTH_EAST_RAYS[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+
+    ray = _SOUTH_WEST_RAYS[square]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= _SOUTH_WEST_RAYS[(blockers & -blockers).bit_length() - 1]
+    return attacks | ray
+
+
+def queen_attacks(square: int, occupied: int) -> int:
+    return rook_attacks(square, occupied) | bishop_attacks(square, occupied)
+
+
+def _build_between() -> List[List[int]]:
+    # BETWEEN[a][b] holds the squares strictly between two aligned squares, 0 otherwise.
+    between = [[0] * 64 for _ in range(64)]
+    for direction_rays in RAYS:
+        for square in range(64):
+            ray = direction_rays[square]
+            for target in iter_squares(ray):
+                between[square][target] = ray & ~direction_rays[target] & ~(1 << target)
+    return between
+
+
+BETWEEN = _build_between()
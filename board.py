@@ -1,106 +1,1193 @@
-from typing import Dict, Tuple, Optional, List
-from pieces import ChessPiece, Rook, Knight, Bishop, Queen, King, Pawn
+import struct
+import weakref
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, NamedTuple, Tuple, Optional, List
+from bitboard import SQUARE_COORDS, WHITE_INDEX, BLACK_INDEX, KNIGHT_ATTACKS, KING_ATTACKS, \
+    PAWN_ATTACKS, BETWEEN, FULL, RANK_1, RANK_8, square_index, iter_squares, knight_attacks, \
+    king_attacks, pawn_attacks, rook_attacks, bishop_attacks, queen_attacks, shift_north_east, \
+    shift_north_west, shift_south_east, shift_south_west
+from move import Move, PROMOTION_TYPES, get_move, parse_square, square_name
+from move_cache import MoveCache
+from san import parse_san, move_to_san
+from piece_list import PieceList
+from zobrist import PIECE_SQUARE_KEYS, BLACK_TO_MOVE_KEY, CASTLING_KEYS, EN_PASSANT_FILE_KEYS, \
+    en_passant_key, compute_hash
+from pieces import ChessPiece, Rook, Knight, Bishop, Queen, King, Pawn, \
+    PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, COLOR_NAMES
+
+if TYPE_CHECKING:
+    from position import Position
+    from tablebase import Tablebase, TablebaseEntry
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+PIECE_LETTERS = "pnbrqk"
+PIECE_CLASSES = (Pawn, Knight, Bishop, Rook, Queen, King)
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+KING_START_SQUARES = (60, 4)
+# Per colour: (right, rook square, squares that must be empty, squares the king crosses, king target)
+CASTLING_SIDES = (
+    ((WHITE_KINGSIDE, 63, (1 << 61) | (1 << 62), (61, 62), 62),
+     (WHITE_QUEENSIDE, 56, (1 << 57) | (1 << 58) | (1 << 59), (59, 58), 58)),
+    ((BLACK_KINGSIDE, 7, (1 << 5) | (1 << 6), (5, 6), 6),
+     (BLACK_QUEENSIDE, 0, (1 << 1) | (1 << 2) | (1 << 3), (3, 2), 2)),
+)
+# King target square -> (rook origin, rook target) for castling moves.
+CASTLING_ROOK_MOVES = {62: (63, 61), 58: (56, 59), 6: (7, 5), 2: (0, 3)}
+# Rights that survive a move touching the given square (as origin or target).
+CASTLING_MASKS = [15] * 64
+CASTLING_MASKS[60] &= ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASKS[63] &= ~WHITE_KINGSIDE
+CASTLING_MASKS[56] &= ~WHITE_QUEENSIDE
+CASTLING_MASKS[4] &= ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASKS[7] &= ~BLACK_KINGSIDE
+CASTLING_MASKS[0] &= ~BLACK_QUEENSIDE
+CASTLING_LETTERS = {"K": WHITE_KINGSIDE, "Q": WHITE_QUEENSIDE, "k": BLACK_KINGSIDE, "q": BLACK_QUEENSIDE}
+FEN_PIECE_INDEXES = {**{letter.upper(): index for index, letter in enumerate(PIECE_LETTERS)},
+                     **{letter: index + 6 for index, letter in enumerate(PIECE_LETTERS)}}
+_EMPTY_SQUARES = [None] * 64
+_EMPTY_BITBOARDS = [0] * 12
+PROMOTION_CLASSES = {KNIGHT: Knight, BISHOP: Bishop, ROOK: Rook, QUEEN: Queen}
+
+# 32-byte position record: occupancy, one 4-bit bitboard index per occupied square in
+# square order (at most 32 pieces), side to move and castling rights, en passant square + 1
+# (0 for none), halfmove clock, fullmove number. The first 26 bytes identify the position
+# itself, without the move counters.
+PACKED_POSITION = struct.Struct("<Q16sBBHH2x")
+PACKED_POSITION_SIZE = PACKED_POSITION.size
+PACKED_POSITION_KEY_SIZE = 26
+
+ONGOING = "ongoing"
+CHECKMATE = "checkmate"
+STALEMATE = "stalemate"
+INSUFFICIENT_MATERIAL = "insufficient_material"
+FIFTY_MOVES = "fifty_moves"
+THREEFOLD_REPETITION = "threefold_repetition"
+
+
+def pack_position(bitboards: Iterable[int], turn: int, castling_rights: int,
+                  en_passant_square: Optional[int], halfmove_clock: int,
+                  fullmove_number: int) -> bytes:
+    occupancy = 0
+    codes = 0
+    shifts = {}
+    for index, bb in enumerate(bitboards):
+        occupancy |= bb
+        for square in iter_squares(bb):
+            shifts[square] = index
+    if len(shifts) > 32:
+        raise ValueError("At most 32 pieces fit in a packed position")
+    for slot, square in enumerate(sorted(shifts)):
+        codes |= shifts[square] << (slot * 4)
+    return PACKED_POSITION.pack(occupancy, codes.to_bytes(16, "little"),
+                                turn | (castling_rights << 1),
+                                0 if en_passant_square is None else en_passant_square + 1,
+                                min(halfmove_clock, 0xFFFF), min(fullmove_number, 0xFFFF))
+
+
+def unpack_position(data: bytes) -> Tuple[List[Tuple[int, int]], int, int, Optional[int], int, int]:
+    # Returns (square, bitboard index) pairs plus the state fields, ready for ChessBoard._load.
+    occupancy, packed_codes, flags, en_passant, halfmove_clock, fullmove_number = \
+        PACKED_POSITION.unpack(data)
+    codes = int.from_bytes(packed_codes, "little")
+    placed = []
+    for slot, square in enumerate(iter_squares(occupancy)):
+        index = (codes >> (slot * 4)) & 0xF
+        if index >= 12:
+            raise ValueError(f"Invalid piece code {index} in packed position")
+        placed.append((square, index))
+    return placed, flags & 1, flags >> 1, en_passant - 1 if en_passant else None, \
+        halfmove_clock, fullmove_number
+
+
+def color_index(color: str) -> int:
+    return WHITE_INDEX if color == "white" else BLACK_INDEX
+
+
+def bitboard_index(piece: ChessPiece) -> int:
+    # Twelve bitboards: white pawn..king at 0..5, black pawn..king at 6..11.
+    return piece.color_code * 6 + piece.piece_type
+
+
+class AttackMap(NamedTuple):
+    # counts[color][square]: pieces of that colour attacking the square, so own pieces on it
+    # count as defenders; x-rays are not included. attacked[color]: the union of those squares.
+    # mobility: destination squares per occupied square, both colours counted as if to move.
+    # attacked_pieces / defended_pieces[color]: that colour's pieces hit by the enemy / covered
+    # by their own side.
+    counts: Tuple[Tuple[int, ...], Tuple[int, ...]]
+    attacked: Tuple[int, int]
+    mobility: Dict[int, int]
+    attacked_pieces: Tuple[int, int]
+    defended_pieces: Tuple[int, int]
+
+    def hanging(self, color: str) -> int:
+        index = color_index(color)
+        return self.attacked_pieces[index] & ~self.defended_pieces[index]
+
+
+class BoardState(dict):
+    # Compatibility view of the board as {(x, y): piece}. Writes go through the owning
+    # ChessBoard so the bitboards stay in sync; copies are plain dicts.
+    __slots__ = ("_board", "__weakref__")
+
+    def __init__(self, board: 'ChessBoard') -> None:
+        squares = board._squares
+        super().__init__((SQUARE_COORDS[square_index(x, y)], squares[square_index(x, y)])
+                         for x in range(board.SIZE)
+                         for y in range(board.SIZE))
+        self._board = board
+
+    def __setitem__(self, square: Tuple[int, int], piece: Optional[ChessPiece]) -> None:
+        self._board.set_piece_at(square_index(*square), piece)
+
+    def update(self, *args, **kwargs) -> None:
+        for square, piece in dict(*args, **kwargs).items():
+            self[square] = piece
 
 
 class ChessBoard:
+    __slots__ = ("_move_cache", "_squares", "_bitboards", "_occupancy", "_en_passant_square",
+                 "_turn", "_castling_rights", "_halfmove_clock", "_fullmove_number",
+                 "_undo_stack", "_hash", "_position_counts", "_board_state", "_white_pieces",
+                 "_black_pieces", "_attack_map")
     SIZE = 8
 
-    def __init__(self) -> None:
-        self._board_state = {(x, y): None
-                            for x in range(self.SIZE)
-                            for y in range(self.SIZE)}
-        self._white_pieces = []
-        self._black_pieces = []
-        self.place_pieces()
+    def __init__(self, move_cache: Optional[MoveCache] = None, fen: Optional[str] = None) -> None:
+        self._move_cache = move_cache
+        self._squares: List[Optional[ChessPiece]] = [None] * 64
+        self._bitboards = [0] * 12
+        self._occupancy = [0, 0]
+        self._en_passant_square: Optional[int] = None
+        self._turn = WHITE_INDEX
+        self._castling_rights = 0
+        self._halfmove_clock = 0
+        self._fullmove_number = 1
+        # Created by the first make_move, so boards that are only stored carry neither.
+        self._undo_stack: Optional[List[tuple]] = None
+        self._hash = 0
+        # How often each Zobrist key has occurred since the last set_fen, kept up to date by
+        # make_move/unmake_move so repetition checks are a single lookup. None stands for
+        # the current position seen once.
+        self._position_counts: Optional[Dict[int, int]] = None
+        # The {(x, y): piece} view (a 64-entry dict, about 2.6 KB) is built on request and
+        # only weakly referenced: it is kept in sync while a caller holds it and freed after.
+        self._board_state: Optional[weakref.ref] = None
+        # (Zobrist key, map) from the last attack_map() call.
+        self._attack_map: Optional[Tuple[int, AttackMap]] = None
+        self._white_pieces = PieceList()
+        self._black_pieces = PieceList()
+        if fen is None:
+            self.place_pieces()
+            self.update_castling_rights()
+        else:
+            self.set_fen(fen)
 
     @property
     def board_state(self) -> Dict[Tuple[int, int], Optional[ChessPiece]]:
-        return self._board_state
+        view = self._live_view()
+        if view is None:
+            view = BoardState(self)
+            self._board_state = weakref.ref(view)
+        return view
+
+    def _live_view(self) -> Optional[BoardState]:
+        if self._board_state is None:
+            return None
+        view = self._board_state()
+        if view is None:
+            self._board_state = None
+        return view
 
     @board_state.setter
     def board_state(self, new_pieces_pos: Dict[Tuple[int, int], Optional[ChessPiece]]) -> None:
-        self._board_state = new_pieces_pos
+        # Like set_fen, a new placement starts a new history: undo records and the en passant
+        # square belong to the old position. The side to move is kept.
+        for square in range(64):
+            self.set_piece_at(square, None)
+        self._white_pieces.clear()
+        self._black_pieces.clear()
+        for (x, y), piece in new_pieces_pos.items():
+            self.set_piece_at(square_index(x, y), piece)
+            if piece is not None:
+                self._pieces_of(piece).add(piece)
+        self.update_castling_rights()
+        self._en_passant_square = None
+        self._undo_stack = None
+        self._hash = self.compute_zobrist_hash()
+        self._position_counts = None
 
     @property
-    def white_pieces(self) -> List[ChessPiece]:
+    def white_pieces(self) -> PieceList:
         return self._white_pieces
 
     @white_pieces.setter
-    def white_pieces(self, pieces: List[ChessPiece]) -> None:
-        self._white_pieces = pieces
+    def white_pieces(self, pieces: Iterable[ChessPiece]) -> None:
+        self._white_pieces = PieceList(pieces)
 
     @property
-    def black_pieces(self) -> List[ChessPiece]:
+    def black_pieces(self) -> PieceList:
         return self._black_pieces
 
     @black_pieces.setter
-    def black_pieces(self, pieces: List[ChessPiece]) -> None:
-        self._black_pieces = pieces
+    def black_pieces(self, pieces: Iterable[ChessPiece]) -> None:
+        self._black_pieces = PieceList(pieces)
+
+    def pieces(self, color: str) -> PieceList:
+        return self._white_pieces if color == "white" else self._black_pieces
+
+    def king(self, color: str) -> Optional[King]:
+        return self.pieces(color).king
+
+    @property
+    def move_cache(self) -> Optional[MoveCache]:
+        return self._move_cache
+
+    @move_cache.setter
+    def move_cache(self, cache: Optional[MoveCache]) -> None:
+        self._move_cache = cache
+
+    @property
+    def bitboards(self) -> List[int]:
+        return self._bitboards
+
+    @property
+    def occupied(self) -> int:
+        return self._occupancy[WHITE_INDEX] | self._occupancy[BLACK_INDEX]
+
+    def occupancy(self, color: str) -> int:
+        return self._occupancy[color_index(color)]
+
+    def pieces_bitboard(self, color: str, piece_type: int) -> int:
+        return self._bitboards[color_index(color) * 6 + piece_type]
+
+    @property
+    def en_passant_square(self) -> Optional[int]:
+        return self._en_passant_square
+
+    @en_passant_square.setter
+    def en_passant_square(self, square: Optional[int]) -> None:
+        self._hash ^= en_passant_key(self._en_passant_square) ^ en_passant_key(square)
+        self._en_passant_square = square
+
+    @property
+    def turn(self) -> str:
+        return COLOR_NAMES[self._turn]
+
+    @turn.setter
+    def turn(self, color: str) -> None:
+        if color_index(color) != self._turn:
+            self._hash ^= BLACK_TO_MOVE_KEY
+        self._turn = color_index(color)
+
+    @property
+    def halfmove_clock(self) -> int:
+        return self._halfmove_clock
+
+    @halfmove_clock.setter
+    def halfmove_clock(self, value: int) -> None:
+        self._halfmove_clock = value
+
+    @property
+    def fullmove_number(self) -> int:
+        return self._fullmove_number
+
+    @fullmove_number.setter
+    def fullmove_number(self, value: int) -> None:
+        self._fullmove_number = value
+
+    @property
+    def move_stack(self) -> List[Move]:
+        return [entry[0] for entry in self._undo_stack or ()]
+
+    @property
+    def castling_rights(self) -> int:
+        return self._castling_rights
+
+    def update_castling_rights(self) -> None:
+        # Re-derive the rights from the has_moved flags, e.g. after editing pieces directly.
+        rights = 0
+        for index, sides in enumerate(CASTLING_SIDES):
+            king = self._squares[KING_START_SQUARES[index]]
+            if king is None or king.piece_type != KING or king.has_moved or \
+                    king.color_code != index:
+                continue
+            for right, rook_square, _, _, _ in sides:
+                rook = self._squares[rook_square]
+                if rook is not None and rook.piece_type == ROOK and not rook.has_moved and \
+                        rook.color_code == index:
+                    rights |= right
+        self._hash ^= CASTLING_KEYS[self._castling_rights] ^ CASTLING_KEYS[rights]
+        self._castling_rights = rights
+
+    @property
+    def zobrist_hash(self) -> int:
+        return self._hash
+
+    def compute_zobrist_hash(self) -> int:
+        # From-scratch recomputation, used to verify the incrementally updated key.
+        return compute_hash(self._bitboards, self._turn == BLACK_INDEX, self._castling_rights,
+                            self._en_passant_square)
+
+    def piece_at(self, square: int) -> Optional[ChessPiece]:
+        return self._squares[square]
+
+    def set_piece_at(self, square: int, piece: Optional[ChessPiece]) -> None:
+        mask = 1 << square
+        old_piece = self._squares[square]
+        if old_piece is not None:
+            index = bitboard_index(old_piece)
+            self._bitboards[index] ^= mask
+            self._occupancy[old_piece.color_code] ^= mask
+            self._hash ^= PIECE_SQUARE_KEYS[index][square]
+
+        self._squares[square] = piece
+        if self._board_state is not None:
+            view = self._live_view()
+            if view is not None:
+                dict.__setitem__(view, SQUARE_COORDS[square], piece)
+        if piece is not None:
+            index = bitboard_index(piece)
+            self._bitboards[index] |= mask
+            self._occupancy[piece.color_code] |= mask
+            self._hash ^= PIECE_SQUARE_KEYS[index][square]
+
+    def attacks_from(self, square: int) -> int:
+        piece = self._squares[square]
+        if piece is None:
+            return 0
+
+        piece_type = piece.piece_type
+        if piece_type == PAWN:
+            return PAWN_ATTACKS[piece.color_code][square]
+        if piece_type == KNIGHT:
+            return KNIGHT_ATTACKS[square]
+        if piece_type == KING:
+            return KING_ATTACKS[square]
+        if piece_type == BISHOP:
+            return bishop_attacks(square, self.occupied)
+        if piece_type == ROOK:
+            return rook_attacks(square, self.occupied)
+        return queen_attacks(square, self.occupied)
+
+    def attacked_squares(self, color: str) -> int:
+        index = color_index(color)
+        bitboards = self._bitboards[index * 6:index * 6 + 6]
+        occupied = self.occupied
+
+        attacks = pawn_attacks(bitboards[PAWN], index) | knight_attacks(bitboards[KNIGHT]) | \
+            king_attacks(bitboards[KING])
+        for square in iter_squares(bitboards[BISHOP] | bitboards[QUEEN]):
+            attacks |= bishop_attacks(square, occupied)
+        for square in iter_squares(bitboards[ROOK] | bitboards[QUEEN]):
+            attacks |= rook_attacks(square, occupied)
+        return attacks
+
+    def is_square_attacked(self, square: int, by_color: str) -> bool:
+        return self._is_attacked(square, color_index(by_color), self.occupied)
+
+    def is_check(self) -> bool:
+        king_bb = self._bitboards[self._turn * 6 + KING]
+        return bool(king_bb) and \
+            self._is_attacked(king_bb.bit_length() - 1, self._turn ^ 1, self.occupied)
+
+    def _is_attacked(self, square: int, by_index: int, occupied: int) -> bool:
+        # Looks outward from the square: knight and pawn patterns, king adjacency and the
+        # first blocker on each ray, stopping at the first attacker found.
+        bitboards = self._bitboards
+        base = by_index * 6
+        if KNIGHT_ATTACKS[square] & bitboards[base + KNIGHT]:
+            return True
+        if PAWN_ATTACKS[by_index ^ 1][square] & bitboards[base + PAWN]:
+            return True
+        if KING_ATTACKS[square] & bitboards[base + KING]:
+            return True
+        queens = bitboards[base + QUEEN]
+        if bishop_attacks(square, occupied) & (bitboards[base + BISHOP] | queens):
+            return True
+        return bool(rook_attacks(square, occupied) & (bitboards[base + ROOK] | queens))
+
+    def generate_legal_moves(self, color: Optional[str] = None) -> List[Move]:
+        us = self._turn if color is None else color_index(color)
+        cache = self._move_cache
+        if cache is None:
+            return self._generate_legal_moves(us)
+
+        # The Zobrist key covers placement, side to move, castling rights and en passant,
+        # so a hit can never describe a different position (up to 64-bit collisions).
+        key = (self._hash, us)
+        moves = cache.get(key)
+        if moves is None:
+            moves = tuple(self._generate_legal_moves(us))
+            cache.put(key, moves)
+        return list(moves)
+
+    def _generate_legal_moves(self, us: int) -> List[Move]:
+        them = us ^ 1
+        bitboards = self._bitboards
+        own = self._occupancy[us]
+        enemy = self._occupancy[them]
+        occupied = own | enemy
+        base = them * 6
+        enemy_pawns = bitboards[base + PAWN]
+        enemy_knights = bitboards[base + KNIGHT]
+        enemy_diagonal = bitboards[base + BISHOP] | bitboards[base + QUEEN]
+        enemy_orthogonal = bitboards[base + ROOK] | bitboards[base + QUEEN]
+
+        moves = []
+        append = moves.append
+
+        king_bb = bitboards[us * 6 + KING]
+        if not king_bb:
+            return moves
+        king_square = king_bb.bit_length() - 1
+
+        checkers = (KNIGHT_ATTACKS[king_square] & enemy_knights) | \
+            (PAWN_ATTACKS[us][king_square] & enemy_pawns) | \
+            (bishop_attacks(king_square, occupied) & enemy_diagonal) | \
+            (rook_attacks(king_square, occupied) & enemy_orthogonal)
+
+        # King steps are tested with the king lifted off the board so it cannot hide
+        # behind itself on the checking ray.
+        without_king = occupied ^ king_bb
+        for to_square in iter_squares(KING_ATTACKS[king_square] & ~own):
+            if not self._is_attacked(to_square, them, without_king):
+                append(get_move(king_square, to_square))
+
+        if checkers & (checkers - 1):
+            return moves
+
+        if checkers:
+            checker_square = checkers.bit_length() - 1
+            check_mask = checkers | BETWEEN[king_square][checker_square]
+        else:
+            check_mask = FULL
+            rights = self.castling_rights
+            for right, _, empty_mask, king_path, king_target in CASTLING_SIDES[us]:
+                if rights & right and not occupied & empty_mask and \
+                        not any(self._is_attacked(square, them, occupied) for square in king_path):
+                    append(get_move(king_square, king_target))
+
+        pin_masks = {}
+        snipers = (rook_attacks(king_square, enemy) & enemy_orthogonal) | \
+            (bishop_attacks(king_square, enemy) & enemy_diagonal)
+        for sniper in iter_squares(snipers):
+            blockers = BETWEEN[king_square][sniper] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pin_masks[blockers.bit_length() - 1] = BETWEEN[king_square][sniper] | (1 << sniper)
+
+        targets = ~own & check_mask
+        own_base = us * 6
+
+        for from_square in iter_squares(bitboards[own_base + KNIGHT]):
+            if from_square in pin_masks:
+                continue
+            for to_square in iter_squares(KNIGHT_ATTACKS[from_square] & targets):
+                append(get_move(from_square, to_square))
+
+        for piece_type, attacks in ((BISHOP, bishop_attacks), (ROOK, rook_attacks),
+                                    (QUEEN, queen_attacks)):
+            for from_square in iter_squares(bitboards[own_base + piece_type]):
+                piece_targets = attacks(from_square, occupied) & targets
+                if from_square in pin_masks:
+                    piece_targets &= pin_masks[from_square]
+                for to_square in iter_squares(piece_targets):
+                    append(get_move(from_square, to_square))
+
+        forward = -8 if us == WHITE_INDEX else 8
+        start_rank = 6 if us == WHITE_INDEX else 1
+        promotion_rank = RANK_8 if us == WHITE_INDEX else RANK_1
+        pawn_attacks_table = PAWN_ATTACKS[us]
+        # The en passant square belongs to whichever colour captures towards its rank, so asking
+        # for the other colour's moves with generate_legal_moves(color) ignores it.
+        en_passant = self._en_passant_square
+        if en_passant is not None and en_passant >> 3 != (2 if us == WHITE_INDEX else 5):
+            en_passant = None
+        for from_square in iter_squares(bitboards[own_base + PAWN]):
+            pawn_targets = pawn_attacks_table[from_square] & enemy
+            one_step = from_square + forward
+            if not occupied >> one_step & 1:
+                pawn_targets |= 1 << one_step
+                two_steps = one_step + forward
+                if from_square >> 3 == start_rank and not occupied >> two_steps & 1:
+                    pawn_targets |= 1 << two_steps
+            pawn_targets &= check_mask
+            if from_square in pin_masks:
+                pawn_targets &= pin_masks[from_square]
+
+            for to_square in iter_squares(pawn_targets):
+                if (1 << to_square) & promotion_rank:
+                    for piece_type in PROMOTION_TYPES:
+                        append(get_move(from_square, to_square, piece_type))
+                else:
+                    append(get_move(from_square, to_square))
+
+            if en_passant is not None and pawn_attacks_table[from_square] >> en_passant & 1:
+                captured_bb = 1 << (en_passant - forward)
+                if checkers & ~captured_bb & (enemy_knights | enemy_pawns):
+                    continue
+                # Re-test the sliders with both pawns gone: this covers pins, checks and the
+                # horizontal discovered check along the capturing rank.
+                after = (occupied ^ (1 << from_square) ^ captured_bb) | (1 << en_passant)
+                if bishop_attacks(king_square, after) & enemy_diagonal or \
+                        rook_attacks(king_square, after) & enemy_orthogonal:
+                    continue
+                append(get_move(from_square, en_passant))
+
+        return moves
+
+    def attack_map(self) -> AttackMap:
+        # Keyed like the move cache: the Zobrist key changes with every placement, side to
+        # move, castling or en passant change, and comes back when a move is unmade.
+        cached = self._attack_map
+        if cached is not None and cached[0] == self._hash:
+            return cached[1]
+        attack_map = self._compute_attack_map()
+        self._attack_map = (self._hash, attack_map)
+        return attack_map
+
+    def _compute_attack_map(self) -> AttackMap:
+        # Each attack set is added into bit-sliced counters (planes[i] holds bit i of every
+        # square's count), so a piece costs a few big-int operations instead of a loop over
+        # its target squares; counts are read out once per attacked square at the end.
+        bitboards = self._bitboards
+        occupied = self.occupied
+        counts = []
+        attacked = []
+        for color in (WHITE_INDEX, BLACK_INDEX):
+            base = color * 6
+            pawns = bitboards[base + PAWN]
+            if color == WHITE_INDEX:
+                sets = [shift_north_east(pawns), shift_north_west(pawns)]
+            else:
+                sets = [shift_south_east(pawns), shift_south_west(pawns)]
+            sets.extend(KNIGHT_ATTACKS[square] for square in iter_squares(bitboards[base + KNIGHT]))
+            sets.extend(bishop_attacks(square, occupied)
+                        for square in iter_squares(bitboards[base + BISHOP]))
+            sets.extend(rook_attacks(square, occupied)
+                        for square in iter_squares(bitboards[base + ROOK]))
+            sets.extend(queen_attacks(square, occupied)
+                        for square in iter_squares(bitboards[base + QUEEN]))
+            sets.extend(KING_ATTACKS[square] for square in iter_squares(bitboards[base + KING]))
+
+            planes = [0, 0, 0, 0, 0]
+            union = 0
+            for attacks in sets:
+                union |= attacks
+                carry = attacks
+                plane = 0
+                while carry:
+                    planes[plane], carry = planes[plane] ^ carry, planes[plane] & carry
+                    plane += 1
+            color_counts = [0] * 64
+            for square in iter_squares(union):
+                color_counts[square] = (planes[0] >> square & 1) | \
+                    (planes[1] >> square & 1) << 1 | (planes[2] >> square & 1) << 2 | \
+                    (planes[3] >> square & 1) << 3 | (planes[4] >> square & 1) << 4
+            counts.append(tuple(color_counts))
+            attacked.append(union)
+
+        # A promotion counts once per destination square, not once per promotion piece.
+        mobility = dict.fromkeys(iter_squares(occupied), 0)
+        for us in (WHITE_INDEX, BLACK_INDEX):
+            for from_square, _, promotion in self._generate_legal_moves(us):
+                if promotion is None or promotion == QUEEN:
+                    mobility[from_square] += 1
+
+        white, black = self._occupancy
+        return AttackMap((counts[WHITE_INDEX], counts[BLACK_INDEX]),
+                         (attacked[WHITE_INDEX], attacked[BLACK_INDEX]), mobility,
+                         (white & attacked[BLACK_INDEX], black & attacked[WHITE_INDEX]),
+                         (white & attacked[WHITE_INDEX], black & attacked[BLACK_INDEX]))
+
+    def iter_legal_moves(self, captures: bool = True, quiets: bool = True) -> Iterator[Move]:
+        # Staged generator: captures, en passant and promotions first, then quiet moves.
+        # Checks and pins are worked out once; king steps and castling paths are only tested
+        # for attacks right before they are yielded, so a caller that stops early (a cutoff,
+        # or has_legal_move) does not pay for the rest.
+        us = self._turn
+        them = us ^ 1
+        bitboards = self._bitboards
+        own = self._occupancy[us]
+        enemy = self._occupancy[them]
+        occupied = own | enemy
+        base = them * 6
+        enemy_pawns = bitboards[base + PAWN]
+        enemy_knights = bitboards[base + KNIGHT]
+        enemy_diagonal = bitboards[base + BISHOP] | bitboards[base + QUEEN]
+        enemy_orthogonal = bitboards[base + ROOK] | bitboards[base + QUEEN]
+
+        king_bb = bitboards[us * 6 + KING]
+        if not king_bb:
+            return
+        king_square = king_bb.bit_length() - 1
+        without_king = occupied ^ king_bb
+
+        checkers = (KNIGHT_ATTACKS[king_square] & enemy_knights) | \
+            (PAWN_ATTACKS[us][king_square] & enemy_pawns) | \
+            (bishop_attacks(king_square, occupied) & enemy_diagonal) | \
+            (rook_attacks(king_square, occupied) & enemy_orthogonal)
+        double_check = checkers & (checkers - 1)
+        if checkers:
+            check_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        else:
+            check_mask = FULL
+
+        pin_masks = {}
+        if not double_check:
+            snipers = (rook_attacks(king_square, enemy) & enemy_orthogonal) | \
+                (bishop_attacks(king_square, enemy) & enemy_diagonal)
+            for sniper in iter_squares(snipers):
+                blockers = BETWEEN[king_square][sniper] & occupied
+                if blockers and not blockers & (blockers - 1) and blockers & own:
+                    pin_masks[blockers.bit_length() - 1] = \
+                        BETWEEN[king_square][sniper] | (1 << sniper)
+
+        own_base = us * 6
+        forward = -8 if us == WHITE_INDEX else 8
+        start_rank = 6 if us == WHITE_INDEX else 1
+        promotion_rank = RANK_8 if us == WHITE_INDEX else RANK_1
+        pawn_attacks_table = PAWN_ATTACKS[us]
+        pawns = bitboards[own_base + PAWN]
+        knights = bitboards[own_base + KNIGHT]
+        pre_promotion = promotion_rank << 8 if us == WHITE_INDEX else promotion_rank >> 8
+        empty = ~occupied & FULL
+        slider_attacks = None
+
+        for is_capture_stage in ((True,) if captures else ()) + ((False,) if quiets else ()):
+            stage_targets = enemy if is_capture_stage else empty
+            if not double_check:
+                targets = stage_targets & check_mask
+                # Set-wise prefilters skip knights and pawns with nothing to do in this stage.
+                for from_square in iter_squares(knights and knight_attacks(targets) & knights):
+                    if from_square in pin_masks:
+                        continue
+                    for to_square in iter_squares(KNIGHT_ATTACKS[from_square] & targets):
+                        yield get_move(from_square, to_square)
+
+                # Slider attack sets are computed once and shared by both stages.
+                if slider_attacks is None:
+                    slider_attacks = []
+                    for piece_type, attacks in ((BISHOP, bishop_attacks), (ROOK, rook_attacks),
+                                                (QUEEN, queen_attacks)):
+                        for from_square in iter_squares(bitboards[own_base + piece_type]):
+                            piece_attacks = attacks(from_square, occupied) & check_mask
+                            if from_square in pin_masks:
+                                piece_attacks &= pin_masks[from_square]
+                            slider_attacks.append((from_square, piece_attacks))
+                for from_square, piece_attacks in slider_attacks:
+                    for to_square in iter_squares(piece_attacks & stage_targets):
+                        yield get_move(from_square, to_square)
+
+                if not pawns:
+                    stage_pawns = 0
+                elif is_capture_stage:
+                    stage_pawns = (pawn_attacks(targets, them) & pawns) | (pawns & pre_promotion)
+                else:
+                    stage_pawns = pawns & ~pre_promotion & (
+                        empty << 8 if us == WHITE_INDEX else empty >> 8)
+                for from_square in iter_squares(stage_pawns):
+                    one_step = from_square + forward
+                    promotes = (1 << one_step) & promotion_rank
+                    if is_capture_stage:
+                        # Every promotion counts as tactical, including plain pushes.
+                        pawn_targets = pawn_attacks_table[from_square] & enemy
+                        if promotes and not occupied >> one_step & 1:
+                            pawn_targets |= 1 << one_step
+                    elif promotes or occupied >> one_step & 1:
+                        continue
+                    else:
+                        pawn_targets = 1 << one_step
+                        two_steps = one_step + forward
+                        if from_square >> 3 == start_rank and not occupied >> two_steps & 1:
+                            pawn_targets |= 1 << two_steps
+                    pawn_targets &= check_mask
+                    if from_square in pin_masks:
+                        pawn_targets &= pin_masks[from_square]
+                    for to_square in iter_squares(pawn_targets):
+                        if promotes:
+                            for piece_type in PROMOTION_TYPES:
+                                yield get_move(from_square, to_square, piece_type)
+                        else:
+                            yield get_move(from_square, to_square)
+
+                en_passant = self._en_passant_square
+                if is_capture_stage and en_passant is not None:
+                    captured_bb = 1 << (en_passant - forward)
+                    for from_square in iter_squares(PAWN_ATTACKS[them][en_passant] & pawns):
+                        if checkers & ~captured_bb & (enemy_knights | enemy_pawns):
+                            continue
+                        after = (occupied ^ (1 << from_square) ^ captured_bb) | (1 << en_passant)
+                        if bishop_attacks(king_square, after) & enemy_diagonal or \
+                                rook_attacks(king_square, after) & enemy_orthogonal:
+                            continue
+                        yield get_move(from_square, en_passant)
+
+            for to_square in iter_squares(KING_ATTACKS[king_square] & stage_targets):
+                if not self._is_attacked(to_square, them, without_king):
+                    yield get_move(king_square, to_square)
+
+            if not is_capture_stage and not checkers:
+                rights = self._castling_rights
+                for right, _, empty_mask, king_path, king_target in CASTLING_SIDES[us]:
+                    if rights & right and not occupied & empty_mask and \
+                            not any(self._is_attacked(square, them, occupied)
+                                    for square in king_path):
+                        yield get_move(king_square, king_target)
+
+    def has_legal_move(self) -> bool:
+        for _ in self.iter_legal_moves():
+            return True
+        return False
+
+    def is_checkmate(self) -> bool:
+        return self.is_check() and not self.has_legal_move()
+
+    def is_stalemate(self) -> bool:
+        return not self.is_check() and not self.has_legal_move()
+
+    def is_insufficient_material(self) -> bool:
+        # Bare kings, a single minor piece, or only bishops that all stand on one colour.
+        minors = []
+        for pieces in (self._white_pieces, self._black_pieces):
+            if pieces.count(PAWN) or pieces.count(ROOK) or pieces.count(QUEEN):
+                return False
+            minors.extend(pieces.of_type(KNIGHT))
+            minors.extend(pieces.of_type(BISHOP))
+        if len(minors) <= 1:
+            return True
+        if any(piece.piece_type == KNIGHT for piece in minors):
+            return False
+        return len({(piece.x + piece.y) & 1 for piece in minors}) == 1
+
+    def repetition_count(self) -> int:
+        if self._position_counts is None:
+            return 1
+        return self._position_counts.get(self._hash, 1)
+
+    def is_repetition(self, count: int = 3) -> bool:
+        return self.repetition_count() >= count
+
+    def is_fifty_moves(self) -> bool:
+        return self._halfmove_clock >= 100
+
+    def game_status(self) -> str:
+        # Mate and stalemate take precedence over the draw rules; the move search stops at
+        # the first legal move, and the rest are counter or dictionary lookups.
+        if not self.has_legal_move():
+            return CHECKMATE if self.is_check() else STALEMATE
+        if self.is_insufficient_material():
+            return INSUFFICIENT_MATERIAL
+        if self.is_fifty_moves():
+            return FIFTY_MOVES
+        if self.is_repetition():
+            return THREEFOLD_REPETITION
+        return ONGOING
+
+    def is_game_over(self) -> bool:
+        return self.game_status() != ONGOING
+
+    def _pieces_of(self, piece: ChessPiece) -> PieceList:
+        return self._black_pieces if piece.color_code else self._white_pieces
+
+    def make_move(self, move: Move) -> None:
+        from_square, to_square, promotion = move
+        squares = self._squares
+        piece = squares[from_square]
+        captured = squares[to_square]
+        captured_square = to_square
+        piece_type = piece.piece_type
+        previous_hash = self._hash
+
+        if piece_type == PAWN and to_square == self._en_passant_square and captured is None:
+            captured_square = to_square + (8 if self._turn == WHITE_INDEX else -8)
+            captured = squares[captured_square]
+
+        if captured is not None:
+            self._pieces_of(captured).remove(captured)
+            self.set_piece_at(captured_square, None)
+
+        if self._undo_stack is None:
+            self._undo_stack = []
+        self._undo_stack.append((move, piece, captured, captured_square,
+                                 getattr(piece, "has_moved", None), self._castling_rights,
+                                 self._en_passant_square, self._halfmove_clock, previous_hash))
+
+        self.set_piece_at(from_square, None)
+        if promotion is not None:
+            promoted = PROMOTION_CLASSES[promotion](*SQUARE_COORDS[to_square], piece.color_code)
+            pieces = self._pieces_of(piece)
+            pieces.remove(piece)
+            pieces.add(promoted)
+            self.set_piece_at(to_square, promoted)
+        else:
+            piece.move_to(*SQUARE_COORDS[to_square])
+            self.set_piece_at(to_square, piece)
+
+        if piece_type == KING and to_square in CASTLING_ROOK_MOVES and \
+                from_square == KING_START_SQUARES[self._turn]:
+            rook_from, rook_to = CASTLING_ROOK_MOVES[to_square]
+            rook = squares[rook_from]
+            self.set_piece_at(rook_from, None)
+            rook.move_to(*SQUARE_COORDS[rook_to])
+            self.set_piece_at(rook_to, rook)
+
+        new_hash = self._hash ^ BLACK_TO_MOVE_KEY
+        if self._en_passant_square is not None:
+            new_hash ^= EN_PASSANT_FILE_KEYS[self._en_passant_square & 7]
+        self._en_passant_square = None
+        if piece_type == PAWN and abs(to_square - from_square) == 16:
+            # Only record the square when an enemy pawn could actually capture there.
+            passed_square = (from_square + to_square) >> 1
+            them = self._turn ^ 1
+            if PAWN_ATTACKS[self._turn][passed_square] & self._bitboards[them * 6 + PAWN]:
+                self._en_passant_square = passed_square
+                new_hash ^= EN_PASSANT_FILE_KEYS[passed_square & 7]
+
+        rights = self._castling_rights & CASTLING_MASKS[from_square] & CASTLING_MASKS[to_square]
+        if rights != self._castling_rights:
+            new_hash ^= CASTLING_KEYS[self._castling_rights] ^ CASTLING_KEYS[rights]
+            self._castling_rights = rights
+        self._hash = new_hash
+        counts = self._position_counts
+        if counts is None:
+            counts = self._position_counts = {previous_hash: 1}
+        counts[new_hash] = counts.get(new_hash, 0) + 1
+        if piece_type == PAWN or captured is not None:
+            self._halfmove_clock = 0
+        else:
+            self._halfmove_clock += 1
+        if self._turn == BLACK_INDEX:
+            self._fullmove_number += 1
+        self._turn ^= 1
+
+    def unmake_move(self) -> Move:
+        if not self._undo_stack:
+            raise IndexError("no move to unmake")
+        move, piece, captured, captured_square, has_moved, castling_rights, \
+            en_passant_square, halfmove_clock, zobrist_hash = self._undo_stack.pop()
+        from_square, to_square, promotion = move
+
+        count = self._position_counts.get(self._hash, 0)
+        if count > 1:
+            self._position_counts[self._hash] = count - 1
+        else:
+            self._position_counts.pop(self._hash, None)
+
+        self._turn ^= 1
+        if self._turn == BLACK_INDEX:
+            self._fullmove_number -= 1
+        self._castling_rights = castling_rights
+        self._en_passant_square = en_passant_square
+        self._halfmove_clock = halfmove_clock
+
+        if piece.piece_type == KING and to_square in CASTLING_ROOK_MOVES and \
+                from_square == KING_START_SQUARES[self._turn]:
+            rook_from, rook_to = CASTLING_ROOK_MOVES[to_square]
+            rook = self._squares[rook_to]
+            self.set_piece_at(rook_to, None)
+            rook.move_to(*SQUARE_COORDS[rook_from])
+            rook.has_moved = False
+            self.set_piece_at(rook_from, rook)
+
+        if promotion is not None:
+            pieces = self._pieces_of(piece)
+            pieces.remove(self._squares[to_square])
+            pieces.add(piece)
+        else:
+            piece.move_to(*SQUARE_COORDS[from_square])
+            if has_moved is not None:
+                piece.has_moved = has_moved
+        self.set_piece_at(to_square, None)
+        self.set_piece_at(from_square, piece)
+
+        if captured is not None:
+            self.set_piece_at(captured_square, captured)
+            self._pieces_of(captured).add(captured)
+        self._hash = zobrist_hash
+        return move
+
+    def parse_san(self, san: str) -> Move:
+        return parse_san(self, san)
+
+    def san(self, move: Move) -> str:
+        return move_to_san(self, move)
+
+    def push_san(self, san: str) -> Move:
+        move = parse_san(self, san)
+        self.make_move(move)
+        return move
+
+    def perft(self, depth: int) -> int:
+        if depth <= 0:
+            return 1
+        moves = self.generate_legal_moves()
+        if depth == 1:
+            return len(moves)
+
+        nodes = 0
+        for move in moves:
+            self.make_move(move)
+            nodes += self.perft(depth - 1)
+            self.unmake_move()
+        return nodes
+
+    def divide(self, depth: int) -> Dict[str, int]:
+        counts = {}
+        for move in self.generate_legal_moves():
+            self.make_move(move)
+            counts[move.uci()] = self.perft(depth - 1)
+            self.unmake_move()
+        return counts
+
+    @classmethod
+    def from_fen(cls, fen: str, move_cache: Optional[MoveCache] = None) -> 'ChessBoard':
+        return cls(move_cache=move_cache, fen=fen)
+
+    def set_fen(self, fen: str) -> None:
+        # Bulk loader: rebuilds the arrays in place and recycles this board's own piece
+        # objects, so reloading one board per worker allocates almost nothing.
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"FEN needs at least 4 fields: {fen!r}")
+        placement, turn, castling, en_passant = fields[:4]
+        if turn not in ("w", "b"):
+            raise ValueError(f"Invalid side to move in FEN: {turn!r}")
+        rows = placement.split("/")
+        if len(rows) != self.SIZE:
+            raise ValueError(f"FEN placement needs 8 ranks: {fen!r}")
+
+        placed = []
+        for y, row in enumerate(rows):
+            x = 0
+            for char in row:
+                if char in "12345678":
+                    x += int(char)
+                    continue
+                index = FEN_PIECE_INDEXES.get(char)
+                if index is None or x >= self.SIZE:
+                    raise ValueError(f"Invalid FEN placement: {placement!r}")
+                placed.append(((y << 3) | x, index))
+                x += 1
+            if x != self.SIZE:
+                raise ValueError(f"Invalid FEN placement: {placement!r}")
+
+        rights = 0
+        if castling != "-":
+            for char in castling:
+                if char not in CASTLING_LETTERS:
+                    raise ValueError(f"Invalid castling field in FEN: {castling!r}")
+                rights |= CASTLING_LETTERS[char]
+        try:
+            halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError(f"Invalid move counters in FEN: {fen!r}") from None
+
+        self._load(placed, WHITE_INDEX if turn == "w" else BLACK_INDEX, rights,
+                   None if en_passant == "-" else parse_square(en_passant),
+                   halfmove_clock, fullmove_number)
+
+    def to_position(self) -> 'Position':
+        # position.py builds on this module's move tables, hence the late import.
+        from position import Position
+        return Position(tuple(self._bitboards), self._turn, self._castling_rights,
+                        self._en_passant_square, self._halfmove_clock, self._fullmove_number,
+                        self._hash)
+
+    def set_position(self, position: 'Position') -> None:
+        placed = [(square, index) for index, bb in enumerate(position.bitboards)
+                  for square in iter_squares(bb)]
+        self._load(placed, position.turn, position.castling_rights, position.en_passant_square,
+                   position.halfmove_clock, position.fullmove_number)
+
+    @classmethod
+    def from_position(cls, position: 'Position',
+                      move_cache: Optional[MoveCache] = None) -> 'ChessBoard':
+        board = cls(move_cache=move_cache)
+        board.set_position(position)
+        return board
+
+    def probe_tablebase(self, tablebase: 'Tablebase') -> Optional['TablebaseEntry']:
+        # The tables hold no castling or en passant state, so such positions are not probed.
+        if self._castling_rights or self._en_passant_square is not None:
+            return None
+        placed = [(square, index) for index, bb in enumerate(self._bitboards) if bb
+                  for square in iter_squares(bb)]
+        return tablebase.probe_placed(placed, self._turn)
+
+    def to_bytes(self) -> bytes:
+        return pack_position(self._bitboards, self._turn, self._castling_rights,
+                             self._en_passant_square, self._halfmove_clock,
+                             self._fullmove_number)
+
+    def set_bytes(self, data: bytes) -> None:
+        self._load(*unpack_position(data))
+
+    @classmethod
+    def from_bytes(cls, data: bytes, move_cache: Optional[MoveCache] = None) -> 'ChessBoard':
+        board = cls(move_cache=move_cache)
+        board.set_bytes(data)
+        return board
+
+    def _load(self, placed: Iterable[Tuple[int, int]], turn: int, rights: int,
+              en_passant_square: Optional[int], halfmove_clock: int,
+              fullmove_number: int) -> None:
+        # Shared by set_fen and set_position; placed holds (square, bitboard index) pairs.
+        spare_pieces = [list(pieces.of_type(piece_type))
+                        for pieces in (self._white_pieces, self._black_pieces)
+                        for piece_type in range(6)]
+        self._white_pieces.clear()
+        self._black_pieces.clear()
+
+        squares = self._squares
+        squares[:] = _EMPTY_SQUARES
+        bitboards = self._bitboards
+        bitboards[:] = _EMPTY_BITBOARDS
+        for square, index in placed:
+            if spare_pieces[index]:
+                piece = spare_pieces[index].pop()
+                piece.square = square
+            else:
+                piece = PIECE_CLASSES[index % 6](square & 7, square >> 3, index // 6)
+            squares[square] = piece
+            bitboards[index] |= 1 << square
+            (self._black_pieces if index >= 6 else self._white_pieces).add(piece)
+
+        self._occupancy[WHITE_INDEX] = bitboards[0] | bitboards[1] | bitboards[2] | \
+            bitboards[3] | bitboards[4] | bitboards[5]
+        self._occupancy[BLACK_INDEX] = bitboards[6] | bitboards[7] | bitboards[8] | \
+            bitboards[9] | bitboards[10] | bitboards[11]
+        view = self._live_view()
+        if view is not None:
+            dict.update(view, zip(SQUARE_COORDS, squares))
+
+        self._turn = turn
+        self._set_has_moved_flags(rights)
+        self.update_castling_rights()
+
+        self._en_passant_square = None
+        if en_passant_square is not None:
+            # Same convention as make_move: keep the square only if it can be captured on.
+            us = self._turn
+            if PAWN_ATTACKS[us ^ 1][en_passant_square] & bitboards[us * 6 + PAWN] and \
+                    squares[en_passant_square + (8 if us == WHITE_INDEX else -8)] is not None:
+                self._en_passant_square = en_passant_square
+
+        self._halfmove_clock = halfmove_clock
+        self._fullmove_number = fullmove_number
+        self._undo_stack = None
+        self._hash = self.compute_zobrist_hash()
+        self._position_counts = None
+
+    def to_fen(self) -> str:
+        rows = []
+        squares = self._squares
+        for y in range(self.SIZE):
+            row = ""
+            empty = 0
+            for square in range(y << 3, (y << 3) + 8):
+                piece = squares[square]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                letter = PIECE_LETTERS[piece.piece_type]
+                row += letter if piece.color_code else letter.upper()
+            if empty:
+                row += str(empty)
+            rows.append(row)
+
+        castling = "".join(letter for letter, right in CASTLING_LETTERS.items()
+                           if self._castling_rights & right) or "-"
+        en_passant = "-" if self._en_passant_square is None \
+            else square_name(self._en_passant_square)
+        return f"{'/'.join(rows)} {'w' if self._turn == WHITE_INDEX else 'b'} {castling} " \
+               f"{en_passant} {self._halfmove_clock} {self._fullmove_number}"
+
+    def _set_has_moved_flags(self, rights: int) -> None:
+        for pieces, start_rank in ((self._white_pieces, 6), (self._black_pieces, 1)):
+            for pawn in pieces.of_type(PAWN):
+                pawn.has_moved = pawn.y != start_rank
+            for piece_type in (ROOK, KING):
+                for piece in pieces.of_type(piece_type):
+                    piece.has_moved = True
+
+        for index, sides in enumerate(CASTLING_SIDES):
+            king = self._squares[KING_START_SQUARES[index]]
+            if king is None or king.piece_type != KING or king.color_code != index:
+                continue
+            for right, rook_square, _, _, _ in sides:
+                rook = self._squares[rook_square]
+                if rights & right and rook is not None and rook.piece_type == ROOK and \
+                        rook.color_code == index:
+                    king.has_moved = False
+                    rook.has_moved = False
 
     def place_pieces(self):
         # Pawns
         for x in range(self.SIZE):
             black_pawn = Pawn(x, 1, "black")
-            self.board_state[(x, 1)] = black_pawn
+            self.set_piece_at(square_index(x, 1), black_pawn)
             self.black_pieces.append(black_pawn)
 
             white_pawn = Pawn(x, 6, "white")
-            self.board_state[(x, 6)] = white_pawn
+            self.set_piece_at(square_index(x, 6), white_pawn)
             self.white_pieces.append(white_pawn)
 
         # Rooks
         black_rook1 = Rook(0, 0, "black")
         black_rook2 = Rook(7, 0, "black")
-        self.board_state[(0, 0)] = black_rook1
-        self.board_state[(7, 0)] = black_rook2
+        self.set_piece_at(square_index(0, 0), black_rook1)
+        self.set_piece_at(square_index(7, 0), black_rook2)
         self.black_pieces.extend((black_rook1, black_rook2))
 
         white_rook1 = Rook(0, 7, "white")
         white_rook2 = Rook(7, 7, "white")
-        self.board_state[(0, 7)] = white_rook1
-        self.board_state[(7, 7)] = white_rook2
+        self.set_piece_at(square_index(0, 7), white_rook1)
+        self.set_piece_at(square_index(7, 7), white_rook2)
         self.white_pieces.extend((white_rook1, white_rook2))
 
         # Knights
         black_knight1 = Knight(1, 0, "black")
         black_knight2 = Knight(6, 0, "black")
-        self.board_state[(1, 0)] = black_knight1
-        self.board_state[(6, 0)] = black_knight2
+        self.set_piece_at(square_index(1, 0), black_knight1)
+        self.set_piece_at(square_index(6, 0), black_knight2)
         self.black_pieces.extend((black_knight1, black_knight2))
 
         white_knight1 = Knight(1, 7, "white")
         white_knight2 = Knight(6, 7, "white")
-        self.board_state[(1, 7)] = white_knight1
-        self.board_state[(6, 7)] = white_knight2
+        self.set_piece_at(square_index(1, 7), white_knight1)
+        self.set_piece_at(square_index(6, 7), white_knight2)
         self.white_pieces.extend((white_knight1, white_knight2))
 
         # Bishops
         black_bishop1 = Bishop(2, 0, "black")
         black_bishop2 = Bishop(5, 0, "black")
-        self.board_state[(2, 0)] = black_bishop1
-        self.board_state[(5, 0)] = black_bishop2
+        self.set_piece_at(square_index(2, 0), black_bishop1)
+        self.set_piece_at(square_index(5, 0), black_bishop2)
         self.black_pieces.extend((black_bishop1, black_bishop2))
 
         white_bishop1 = Bishop(2, 7, "white")
         white_bishop2 = Bishop(5, 7, "white")
-        self.board_state[(2, 7)] = white_bishop1
-        self.board_state[(5, 7)] = white_bishop2
+        self.set_piece_at(square_index(2, 7), white_bishop1)
+        self.set_piece_at(square_index(5, 7), white_bishop2)
         self.white_pieces.extend((white_bishop1, white_bishop2))
 
         # Queens
         black_queen = Queen(3, 0, "black")
-        self.board_state[(3, 0)] = black_queen
+        self.set_piece_at(square_index(3, 0), black_queen)
         self.black_pieces.append(black_queen)
 
         white_queen = Queen(3, 7, "white")
-        self.board_state[(3, 7)] = white_queen
+        self.set_piece_at(square_index(3, 7), white_queen)
         self.white_pieces.append(white_queen)
 
         # Kings
         black_king = King(4, 0, "black")
-        self.board_state[(4, 0)] = black_king
+        self.set_piece_at(square_index(4, 0), black_king)
         self.black_pieces.append(black_king)
 
         white_king = King(4, 7, "white")
-        self.board_state[(4, 7)] = white_king
+        self.set_piece_at(square_index(4, 7), white_king)
         self.white_pieces.append(white_king)
\ No newline at end of file
@@ -0,0 +1,351 @@
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+from board import ChessBoard, STARTING_FEN
+from move import Move
+from pieces import PAWN
+
+PIECE_VALUES = (100, 320, 330, 500, 900, 0)
+MATE_SCORE = 100_000
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITY = MATE_SCORE + 1
+MAX_PLY = 128
+# The clock is only read every this many nodes; keeps time checks off the hot path.
+CHECK_EVERY = 256
+# Captures that cannot lift the score to alpha even with this margin are skipped in quiescence.
+DELTA_MARGIN = 200
+
+# Piece-square bonuses from white's side, a8 first, i.e. already in board square order.
+# Black looks them up through square ^ 56.
+PAWN_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0)
+KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50)
+BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20)
+ROOK_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0)
+QUEEN_TABLE = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20)
+KING_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20)
+PIECE_SQUARE_TABLES = (PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, KING_TABLE)
+# Value plus positional bonus for each of the 12 bitboard indexes and 64 squares.
+SQUARE_SCORES = [[PIECE_VALUES[piece_type] + PIECE_SQUARE_TABLES[piece_type][square ^ (56 * color)]
+                  for square in range(64)]
+                 for color in range(2) for piece_type in range(6)]
+
+
+class SearchResult(NamedTuple):
+    best_move: Optional[Move]
+    score: int
+    depth: int
+    nodes: int
+    seconds: float
+    pv: List[Move]
+
+    @property
+    def nps(self) -> float:
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def evaluate(board: ChessBoard) -> int:
+    # Material plus piece-square bonuses, from the side to move's point of view.
+    bitboards = board.bitboards
+    score = 0
+    for index in range(12):
+        bb = bitboards[index]
+        table = SQUARE_SCORES[index]
+        total = 0
+        while bb:
+            low = bb & -bb
+            total += table[low.bit_length() - 1]
+            bb ^= low
+        score += total if index < 6 else -total
+    return score if board.turn == "white" else -score
+
+
+class Engine:
+    def __init__(self) -> None:
+        self.nodes = 0
+        self._next_check = CHECK_EVERY
+        self._deadline: Optional[float] = None
+        self._node_limit: Optional[int] = None
+        self._killers: List[List[Optional[Move]]] = [[None, None] for _ in range(MAX_PLY)]
+        self._history: Dict[Move, int] = {}
+        self._best_moves: Dict[int, Move] = {}
+
+    def search(self, board: ChessBoard, max_depth: int = 64, time_limit: Optional[float] = None,
+               node_limit: Optional[int] = None,
+               info: Optional[Callable[[SearchResult], None]] = None) -> SearchResult:
+        # Iterative deepening: each finished iteration replaces the result, and an iteration
+        # that runs out of budget is thrown away, so the answer is always from a full search.
+        # The board is left exactly as it was passed in.
+        start = time.perf_counter()
+        self.nodes = 0
+        self._deadline = start + time_limit if time_limit is not None else None
+        self._node_limit = node_limit
+        self._next_check = min(CHECK_EVERY, node_limit) if node_limit is not None else CHECK_EVERY
+        self._killers = [[None, None] for _ in range(MAX_PLY)]
+        self._history = {}
+        self._best_moves = {}
+
+        root_moves = board.generate_legal_moves()
+        fallback = self._order_moves(board, root_moves, 0)[0] if root_moves else None
+        result = SearchResult(fallback, 0, 0, 0, 0.0, [fallback] if fallback else [])
+        if len(root_moves) <= 1:
+            return result
+
+        for depth in range(1, min(max_depth, MAX_PLY - 1) + 1):
+            try:
+                score = self._negamax(board, depth, -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                break
+            pv = self._principal_variation(board, depth)
+            result = SearchResult(pv[0] if pv else fallback, score, depth, self.nodes,
+                                  time.perf_counter() - start, pv)
+            if info is not None:
+                info(result)
+            if abs(score) >= MATE_THRESHOLD:
+                break
+        return result._replace(nodes=self.nodes, seconds=time.perf_counter() - start)
+
+    def _check_budget(self) -> None:
+        if self._node_limit is not None and self.nodes >= self._node_limit:
+            raise SearchTimeout
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchTimeout
+        self._next_check = self.nodes + CHECK_EVERY
+        if self._node_limit is not None:
+            self._next_check = min(self._next_check, self._node_limit)
+
+    def _negamax(self, board: ChessBoard, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_budget()
+        if ply and (board.is_fifty_moves() or board.repetition_count() > 1):
+            return 0
+
+        in_check = board.is_check()
+        if in_check:
+            depth += 1
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self._quiescence(board, alpha, beta, ply)
+
+        moves = board.generate_legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        for move in self._order_moves(board, moves, ply):
+            quiet = self._victim_type(board, move) is None and move.promotion is None
+            board.make_move(move)
+            try:
+                score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.unmake_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if quiet:
+                    killers = self._killers[ply]
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    self._history[move] = self._history.get(move, 0) + depth * depth
+                break
+        # On a fail-low node every score is only an upper bound, so the "best" move is noise;
+        # keep whatever an earlier iteration found instead.
+        if best_score > original_alpha:
+            self._best_moves[board.zobrist_hash] = best_move
+        return best_score
+
+    def _quiescence(self, board: ChessBoard, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_budget()
+
+        # In check every evasion is searched; otherwise standing pat is an option and only
+        # captures and promotions that could still raise alpha are tried.
+        in_check = board.is_check()
+        if in_check:
+            moves = board.generate_legal_moves()
+            if not moves:
+                return -MATE_SCORE + ply
+            best_score = -INFINITY
+        else:
+            best_score = evaluate(board)
+            if best_score >= beta:
+                return best_score
+            if best_score > alpha:
+                alpha = best_score
+            moves = [move for move in board.iter_legal_moves(quiets=False)
+                     if best_score + self._gain(board, move) + DELTA_MARGIN > alpha]
+        if ply >= MAX_PLY - 1:
+            return evaluate(board)
+
+        for move in self._order_moves(board, moves, ply):
+            board.make_move(move)
+            try:
+                score = -self._quiescence(board, -beta, -alpha, ply + 1)
+            finally:
+                board.unmake_move()
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+        return best_score
+
+    @staticmethod
+    def _victim_type(board: ChessBoard, move: Move) -> Optional[int]:
+        # An en passant capture lands on an empty square; the pawn it takes is beside it.
+        victim = board.piece_at(move.to_square)
+        if victim is not None:
+            return victim.piece_type
+        if move.to_square == board.en_passant_square and \
+                board.piece_at(move.from_square).piece_type == PAWN:
+            return PAWN
+        return None
+
+    @staticmethod
+    def _gain(board: ChessBoard, move: Move) -> int:
+        victim = Engine._victim_type(board, move)
+        gain = PIECE_VALUES[victim] if victim is not None else PIECE_VALUES[PAWN]
+        if move.promotion is not None:
+            gain += PIECE_VALUES[move.promotion] - PIECE_VALUES[PAWN]
+        return gain
+
+    def _order_moves(self, board: ChessBoard, moves: List[Move], ply: int) -> List[Move]:
+        # Hash move, then captures by MVV-LVA, promotions, killers and the history table.
+        hash_move = self._best_moves.get(board.zobrist_hash)
+        killers = self._killers[ply] if ply < MAX_PLY else (None, None)
+        history = self._history
+        scores = {}
+        for move in moves:
+            if move == hash_move:
+                scores[move] = 10_000_000
+                continue
+            victim = self._victim_type(board, move)
+            if victim is not None:
+                attacker = board.piece_at(move.from_square).piece_type
+                scores[move] = 1_000_000 + victim * 10 - attacker
+            elif move.promotion is not None:
+                scores[move] = 900_000 + move.promotion
+            elif move == killers[0]:
+                scores[move] = 800_000
+            elif move == killers[1]:
+                scores[move] = 700_000
+            else:
+                scores[move] = history.get(move, 0)
+        return sorted(moves, key=scores.__getitem__, reverse=True)
+
+    def _principal_variation(self, board: ChessBoard, depth: int) -> List[Move]:
+        # Follows the stored best moves from the root; stops on a repeated or unknown position.
+        pv = []
+        seen = set()
+        while len(pv) < depth and board.zobrist_hash not in seen:
+            seen.add(board.zobrist_hash)
+            move = self._best_moves.get(board.zobrist_hash)
+            if move is None or move not in board.generate_legal_moves():
+                break
+            pv.append(move)
+            board.make_move(move)
+        for _ in pv:
+            board.unmake_move()
+        return pv
+
+
+def best_move(board: ChessBoard, time_limit: Optional[float] = None,
+              node_limit: Optional[int] = None, max_depth: int = 64) -> SearchResult:
+    return Engine().search(board, max_depth=max_depth, time_limit=time_limit,
+                           node_limit=node_limit)
+
+
+def format_score(score: int) -> str:
+    if abs(score) >= MATE_THRESHOLD:
+        plies = MATE_SCORE - abs(score)
+        return f"mate {(plies + 1) // 2 if score > 0 else -((plies + 1) // 2)}"
+    return f"cp {score}"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Search a position for the best move.")
+    parser.add_argument("--fen", default=STARTING_FEN, help="position to search")
+    parser.add_argument("--depth", type=int, default=64, help="maximum depth")
+    parser.add_argument("--time", type=float, help="time budget in seconds")
+    parser.add_argument("--nodes", type=int, help="node budget")
+    args = parser.parse_args(argv)
+    if args.time is None and args.nodes is None and args.depth == 64:
+        args.time = 1.0
+
+    def show(result: SearchResult) -> None:
+        print(f"depth {result.depth} score {format_score(result.score)} nodes {result.nodes} "
+              f"nps {result.nps:,.0f} time {result.seconds:.3f}s "
+              f"pv {' '.join(move.uci() for move in result.pv)}")
+
+    board = ChessBoard()
+    board.set_fen(args.fen)
+    result = Engine().search(board, max_depth=args.depth, time_limit=args.time,
+                             node_limit=args.nodes, info=show)
+    best = result.best_move.uci() if result.best_move else "(none)"
+    print(f"bestmove {best} (depth {result.depth}, {result.nodes:,} nodes, "
+          f"{result.seconds:.3f}s, {result.nps:,.0f} nps)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
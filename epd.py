@@ -0,0 +1,107 @@
+import gzip
+import io
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, TextIO, Tuple, Union
+from board import ChessBoard
+
+
+class EpdRecord(NamedTuple):
+    board: ChessBoard
+    operations: Dict[str, str]
+
+
+def parse_epd_operations(text: str) -> Dict[str, str]:
+    # Operations look like `bm Nf3; id "WAC.001"; c0 "a; b";` - semicolons inside quotes
+    # do not end an operation.
+    operations = {}
+    current = []
+    in_quotes = False
+    for char in text:
+        if char == '"':
+            in_quotes = not in_quotes
+        if char == ";" and not in_quotes:
+            _add_operation(operations, "".join(current))
+            current = []
+        else:
+            current.append(char)
+    _add_operation(operations, "".join(current))
+    return operations
+
+
+def _add_operation(operations: Dict[str, str], operation: str) -> None:
+    operation = operation.strip()
+    if not operation:
+        return
+    opcode, _, operand = operation.partition(" ")
+    operand = operand.strip()
+    if len(operand) >= 2 and operand[0] == operand[-1] == '"':
+        operand = operand[1:-1]
+    operations[opcode] = operand
+
+
+def split_epd_line(line: str) -> Tuple[str, Dict[str, str]]:
+    # Returns a full six-field FEN plus the EPD operations. Plain FEN lines are accepted too.
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"EPD line needs at least 4 fields: {line!r}")
+    rest = fields[4] if len(fields) > 4 else ""
+
+    clocks = rest.split(None, 2)
+    if len(clocks) >= 2 and clocks[0].isdigit() and clocks[1].isdigit():
+        operations = parse_epd_operations(clocks[2]) if len(clocks) > 2 else {}
+        return " ".join(fields[:4] + clocks[:2]), operations
+
+    operations = parse_epd_operations(rest)
+    halfmove_clock = operations.get("hmvc", "0")
+    fullmove_number = operations.get("fmvn", "1")
+    return " ".join(fields[:4] + [halfmove_clock, fullmove_number]), operations
+
+
+def open_text(source: Union[str, TextIO]) -> TextIO:
+    if not isinstance(source, str):
+        return source
+    if source.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(source, "rb"), encoding="utf-8")
+    return open(source, encoding="utf-8")
+
+
+def iter_epd_lines(lines: Iterable[str], board: Optional[ChessBoard] = None) \
+        -> Iterator[EpdRecord]:
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fen, operations = split_epd_line(line)
+        if board is None:
+            yield EpdRecord(ChessBoard.from_fen(fen), operations)
+        else:
+            board.set_fen(fen)
+            yield EpdRecord(board, operations)
+
+
+def read_epd(source: Union[str, TextIO], reuse_board: bool = False,
+             board: Optional[ChessBoard] = None) -> Iterator[EpdRecord]:
+    # Streams records one line at a time, so file size does not matter. With reuse_board
+    # (or an explicit board) every record reloads the same ChessBoard and its pieces; the
+    # yielded board is only valid until the next record is read.
+    if reuse_board and board is None:
+        board = ChessBoard()
+    stream = open_text(source)
+    try:
+        yield from iter_epd_lines(stream, board)
+    finally:
+        if stream is not source:
+            stream.close()
+
+
+def write_epd(records: Iterable[Tuple[ChessBoard, Dict[str, str]]], target: TextIO) -> int:
+    count = 0
+    for board, operations in records:
+        fields = board.to_fen().split()[:4]
+        line = " ".join(fields)
+        for opcode, operand in operations.items():
+            if operand and (" " in operand or ";" in operand):
+                operand = f'"{operand}"'
+            line += f" {opcode} {operand};" if operand else f" {opcode};"
+        target.write(line + "\n")
+        count += 1
+    return count
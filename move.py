@@ -0,0 +1,69 @@
+from typing import NamedTuple, Optional, Tuple
+from bitboard import SQUARE_COORDS, square_index
+from pieces import KNIGHT, BISHOP, ROOK, QUEEN
+
+FILES = "abcdefgh"
+PROMOTION_TYPES = (QUEEN, ROOK, BISHOP, KNIGHT)
+PROMOTION_LETTERS = {QUEEN: "q", ROOK: "r", BISHOP: "b", KNIGHT: "n"}
+
+
+def square_name(square: int) -> str:
+    x, y = SQUARE_COORDS[square]
+    return FILES[x] + str(8 - y)
+
+
+def parse_square(name: str) -> int:
+    if len(name) != 2 or name[0] not in FILES or name[1] not in "12345678":
+        raise ValueError(f"Invalid square: {name!r}")
+    return square_index(FILES.index(name[0]), 8 - int(name[1]))
+
+
+class Move(NamedTuple):
+    from_square: int
+    to_square: int
+    promotion: Optional[int] = None
+
+    @property
+    def from_coords(self) -> Tuple[int, int]:
+        return SQUARE_COORDS[self.from_square]
+
+    @property
+    def to_coords(self) -> Tuple[int, int]:
+        return SQUARE_COORDS[self.to_square]
+
+    def uci(self) -> str:
+        text = square_name(self.from_square) + square_name(self.to_square)
+        if self.promotion is not None:
+            text += PROMOTION_LETTERS[self.promotion]
+        return text
+
+    @classmethod
+    def from_uci(cls, text: str) -> 'Move':
+        promotion = None
+        if len(text) == 5:
+            for piece_type, letter in PROMOTION_LETTERS.items():
+                if letter == text[4]:
+                    promotion = piece_type
+            if promotion is None:
+                raise ValueError(f"Invalid promotion piece in move: {text!r}")
+        elif len(text) != 4:
+            raise ValueError(f"Invalid move: {text!r}")
+        return get_move(parse_square(text[:2]), parse_square(text[2:4]), promotion)
+
+
+# Moves are immutable, so the generators hand out shared instances instead of allocating.
+_MOVES = [Move(from_square, to_square)
+          for from_square in range(64)
+          for to_square in range(64)]
+_PROMOTION_MOVES = {(from_square, to_square, piece_type): Move(from_square, to_square, piece_type)
+                    for from_square in range(64)
+                    for to_square in range(64)
+                    if (from_square >> 3, to_square >> 3) in ((1, 0), (6, 7))
+                    for piece_type in PROMOTION_TYPES}
+
+
+def get_move(from_square: int, to_square: int, promotion: Optional[int] = None) -> Move:
+    if promotion is None:
+        return _MOVES[(from_square << 6) | to_square]
+    move = _PROMOTION_MOVES.get((from_square, to_square, promotion))
+    return move if move is not None else Move(from_square, to_square, promotion)
@@ -0,0 +1,93 @@
+import sys
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from move import Move
+
+# Rough per-entry bookkeeping cost: the OrderedDict slot and link node plus the key tuple.
+# Move objects themselves are shared instances and are not counted.
+ENTRY_OVERHEAD = 200
+
+
+class MoveCache:
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024) -> None:
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self._max_bytes = max_bytes
+        self._entries: 'OrderedDict[Tuple[int, int], Tuple[Tuple[Move, ...], int]]' = OrderedDict()
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes: int) -> None:
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self._max_bytes = max_bytes
+        self._evict()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size_bytes
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[int, int]) -> Optional[Tuple[Move, ...]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Tuple[int, int], moves: Tuple[Move, ...]) -> None:
+        size = sys.getsizeof(moves) + ENTRY_OVERHEAD
+        if size > self._max_bytes:
+            return
+        old_entry = self._entries.pop(key, None)
+        if old_entry is not None:
+            self._size_bytes -= old_entry[1]
+        self._entries[key] = (moves, size)
+        self._size_bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._size_bytes > self._max_bytes:
+            _, (_, size) = self._entries.popitem(last=False)
+            self._size_bytes -= size
+            self._evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size_bytes = 0
+
+    def reset_stats(self) -> None:
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._entries),
+                "size_bytes": self._size_bytes,
+                "max_bytes": self._max_bytes}
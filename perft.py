@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from board import ChessBoard, STARTING_FEN
+
+
+class PerftPosition(NamedTuple):
+    name: str
+    fen: str
+    node_counts: Sequence[int]
+
+
+# Node counts for depth 1, 2, ... from the Chess Programming Wiki "Perft Results" page.
+REFERENCE_POSITIONS = (
+    PerftPosition("start", STARTING_FEN,
+                  (20, 400, 8902, 197281, 4865609, 119060324)),
+    PerftPosition("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                  (48, 2039, 97862, 4085603, 193690690)),
+    PerftPosition("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                  (14, 191, 2812, 43238, 674624, 11030083)),
+    PerftPosition("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                  (6, 264, 9467, 422333, 15833292)),
+    PerftPosition("position4_mirrored",
+                  "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+                  (6, 264, 9467, 422333, 15833292)),
+    PerftPosition("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                  (44, 1486, 62379, 2103487, 89941194)),
+    PerftPosition("position6",
+                  "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                  (46, 2079, 89890, 3894594, 164075551)),
+)
+POSITIONS_BY_NAME = {position.name: position for position in REFERENCE_POSITIONS}
+
+
+class PerftTask(NamedTuple):
+    root_move: str
+    fen: str
+    depth: int
+
+
+class TaskResult(NamedTuple):
+    root_move: str
+    nodes: int
+    seconds: float
+    worker: int
+
+
+class ParallelResult(NamedTuple):
+    counts: Dict[str, int]
+    seconds: float
+    workers: Dict[int, Dict[str, float]]
+
+
+def split_tasks(board: ChessBoard, depth: int, split_depth: int = 1) -> List[PerftTask]:
+    # Expands the tree split_depth plies deep and ships each leaf as a FEN, which is all a
+    # worker needs to rebuild the position. Splitting at depth 2 gives ~20x more, smaller
+    # tasks than splitting at the root, so one heavy root move cannot stall the pool.
+    tasks = []
+    for move in board.generate_legal_moves():
+        board.make_move(move)
+        if split_depth <= 1 or depth <= 2:
+            tasks.append(PerftTask(move.uci(), board.to_fen(), depth - 1))
+        else:
+            for reply in board.generate_legal_moves():
+                board.make_move(reply)
+                tasks.append(PerftTask(move.uci(), board.to_fen(), depth - 2))
+                board.unmake_move()
+        board.unmake_move()
+    return tasks
+
+
+_worker_board: Optional[ChessBoard] = None
+
+
+def run_task(task: PerftTask) -> TaskResult:
+    global _worker_board
+    if _worker_board is None:
+        _worker_board = ChessBoard()
+    start = time.perf_counter()
+    _worker_board.set_fen(task.fen)
+    nodes = _worker_board.perft(task.depth)
+    return TaskResult(task.root_move, nodes, time.perf_counter() - start, os.getpid())
+
+
+def parallel_divide(fen: str, depth: int, workers: Optional[int] = None, split_depth: int = 1,
+                    executor: Optional[ProcessPoolExecutor] = None) -> ParallelResult:
+    board = ChessBoard()
+    board.set_fen(fen)
+    start = time.perf_counter()
+    counts = {move.uci(): 0 for move in board.generate_legal_moves()}
+    worker_stats: Dict[int, Dict[str, float]] = {}
+    if depth <= 1:
+        return ParallelResult({move: 1 for move in counts} if depth == 1 else {}, 0.0, {})
+
+    tasks = split_tasks(board, depth, split_depth)
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(run_task, task) for task in tasks]
+        for future in as_completed(futures):
+            result = future.result()
+            counts[result.root_move] += result.nodes
+            stats = worker_stats.setdefault(result.worker, {"tasks": 0, "nodes": 0, "seconds": 0.0})
+            stats["tasks"] += 1
+            stats["nodes"] += result.nodes
+            stats["seconds"] += result.seconds
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return ParallelResult(counts, time.perf_counter() - start, worker_stats)
+
+
+def parallel_perft(fen: str, depth: int, workers: Optional[int] = None, split_depth: int = 1,
+                   executor: Optional[ProcessPoolExecutor] = None) -> int:
+    return sum(parallel_divide(fen, depth, workers, split_depth, executor).counts.values())
+
+
+def check_against_serial(fen: str, depth: int, counts: Dict[str, int]) -> List[str]:
+    board = ChessBoard()
+    board.set_fen(fen)
+    serial = board.divide(depth)
+    return [f"{move}: parallel {counts.get(move)} != serial {serial.get(move)}"
+            for move in sorted(set(serial) | set(counts)) if counts.get(move) != serial.get(move)]
+
+
+def print_worker_stats(workers: Dict[int, Dict[str, float]], seconds: float) -> None:
+    if not workers:
+        return
+    busy = [stats["seconds"] for stats in workers.values()]
+    mean = sum(busy) / len(busy)
+    for index, (pid, stats) in enumerate(sorted(workers.items())):
+        print(f"  worker {index} (pid {pid}): {stats['tasks']:>5} tasks {stats['nodes']:>12,} nodes "
+              f"{stats['seconds']:9.3f}s busy")
+    imbalance = max(busy) / mean if mean > 0 else 1.0
+    print(f"  wall {seconds:.3f}s, busy {sum(busy):.3f}s, max/mean busy {imbalance:.2f}")
+
+
+def run_position(position: PerftPosition, max_depth: int,
+                 executor: Optional[ProcessPoolExecutor] = None, split_depth: int = 1) -> Dict:
+    board = ChessBoard()
+    board.set_fen(position.fen)
+    depths = []
+    for depth in range(1, min(max_depth, len(position.node_counts)) + 1):
+        start = time.perf_counter()
+        if executor is not None and depth > 1:
+            nodes = parallel_perft(position.fen, depth, split_depth=split_depth, executor=executor)
+        else:
+            nodes = board.perft(depth)
+        seconds = time.perf_counter() - start
+        expected = position.node_counts[depth - 1]
+        depths.append({"depth": depth,
+                       "nodes": nodes,
+                       "expected": expected,
+                       "ok": nodes == expected,
+                       "seconds": seconds,
+                       "nps": nodes / seconds if seconds > 0 else 0.0})
+    return {"fen": position.fen, "depths": depths}
+
+
+def run_suite(positions: Sequence[PerftPosition], max_depth: int,
+              executor: Optional[ProcessPoolExecutor] = None, split_depth: int = 1) -> Dict:
+    results = {"max_depth": max_depth, "positions": {}}
+    total_nodes = 0
+    total_seconds = 0.0
+    for position in positions:
+        result = run_position(position, max_depth, executor, split_depth)
+        results["positions"][position.name] = result
+        for entry in result["depths"]:
+            total_nodes += entry["nodes"]
+            total_seconds += entry["seconds"]
+    results["total_nodes"] = total_nodes
+    results["total_seconds"] = total_seconds
+    results["nps"] = total_nodes / total_seconds if total_seconds > 0 else 0.0
+    results["ok"] = all(entry["ok"]
+                        for result in results["positions"].values()
+                        for entry in result["depths"])
+    return results
+
+
+def compare_with_baseline(results: Dict, baseline: Dict) -> List[str]:
+    lines = []
+    for name, result in results["positions"].items():
+        old_result = baseline.get("positions", {}).get(name)
+        if old_result is None:
+            continue
+        old_depths = {entry["depth"]: entry for entry in old_result["depths"]}
+        for entry in result["depths"]:
+            old_entry = old_depths.get(entry["depth"])
+            if old_entry is None:
+                continue
+            if entry["nodes"] != old_entry["nodes"]:
+                lines.append(f"{name} depth {entry['depth']}: nodes changed "
+                             f"{old_entry['nodes']} -> {entry['nodes']}")
+            if old_entry["nps"] > 0:
+                change = (entry["nps"] / old_entry["nps"] - 1) * 100
+                lines.append(f"{name} depth {entry['depth']}: {old_entry['nps']:,.0f} -> "
+                             f"{entry['nps']:,.0f} nps ({change:+.1f}%)")
+    if baseline.get("nps"):
+        change = (results["nps"] / baseline["nps"] - 1) * 100
+        lines.append(f"total: {baseline['nps']:,.0f} -> {results['nps']:,.0f} nps ({change:+.1f}%)")
+    return lines
+
+
+def print_results(results: Dict) -> None:
+    for name, result in results["positions"].items():
+        print(f"{name}: {result['fen']}")
+        for entry in result["depths"]:
+            status = "ok" if entry["ok"] else f"FAIL (expected {entry['expected']})"
+            print(f"  depth {entry['depth']}: {entry['nodes']:>12,} nodes "
+                  f"{entry['seconds']:9.3f}s {entry['nps']:>12,.0f} nps  {status}")
+    print(f"total: {results['total_nodes']:,} nodes in {results['total_seconds']:.3f}s "
+          f"({results['nps']:,.0f} nps)")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Perft move generation benchmark.")
+    parser.add_argument("--depth", type=int, default=3, help="maximum depth per position")
+    parser.add_argument("--position", action="append", choices=sorted(POSITIONS_BY_NAME),
+                        help="reference position to run (repeatable, default: all)")
+    parser.add_argument("--fen", help="run divide on this FEN instead of the reference suite")
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes; above 1 the tree is split across a process pool")
+    parser.add_argument("--split-depth", type=int, choices=(1, 2), default=1,
+                        help="plies expanded before handing positions to workers")
+    parser.add_argument("--verify", action="store_true",
+                        help="with --fen and --workers, re-run serially and compare the counts")
+    args = parser.parse_args(argv)
+
+    if args.fen:
+        if args.workers > 1:
+            result = parallel_divide(args.fen, args.depth, args.workers, args.split_depth)
+            counts, seconds = result.counts, result.seconds
+        else:
+            board = ChessBoard()
+            board.set_fen(args.fen)
+            start = time.perf_counter()
+            counts = board.divide(args.depth)
+            seconds = time.perf_counter() - start
+        for move, nodes in sorted(counts.items()):
+            print(f"{move}: {nodes}")
+        total = sum(counts.values())
+        print(f"total: {total:,} nodes in {seconds:.3f}s")
+        if args.workers > 1:
+            print_worker_stats(result.workers, seconds)
+            if args.verify:
+                mismatches = check_against_serial(args.fen, args.depth, counts)
+                for line in mismatches:
+                    print(line)
+                print("serial check: " + ("FAIL" if mismatches else "ok"))
+                return 1 if mismatches else 0
+        return 0
+
+    positions = [POSITIONS_BY_NAME[name] for name in args.position] if args.position \
+        else REFERENCE_POSITIONS
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            results = run_suite(positions, args.depth, executor, args.split_depth)
+    else:
+        results = run_suite(positions, args.depth)
+    print_results(results)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        for line in compare_with_baseline(results, baseline):
+            print(line)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    return 0 if results["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
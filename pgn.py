@@ -0,0 +1,279 @@
+import argparse
+import re
+import resource
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, TextIO, \
+    Tuple, Union
+from board import ChessBoard, STARTING_FEN
+from epd import open_text
+
+HEADER_PATTERN = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+COMMENT_PATTERN = re.compile(r"\{[^}]*\}|;[^\n]*")
+VARIATION_PATTERN = re.compile(r"\([^()]*\)")
+MOVE_NUMBER_PATTERN = re.compile(r"^\d+\.+$|^\d+\.+(?=\S)")
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+EMIT_MODES = ("none", "hash", "fen")
+
+
+class PgnGame(NamedTuple):
+    headers: Dict[str, str]
+    movetext: str
+
+
+class GameResult(NamedTuple):
+    index: int
+    plies: int
+    error: Optional[str]
+    positions: List[Union[int, str]]
+
+
+class BatchResult(NamedTuple):
+    games: List[GameResult]
+    max_rss_kb: int
+
+
+def iter_pgn_games(lines: Iterable[str]) -> Iterator[PgnGame]:
+    # Splits a line stream into games without reading the whole file. Only complete tag
+    # pairs count as headers, so movetext that wraps onto "[%clk ...]" or similar stays
+    # movetext. A game ends at its result token (outside comments), when a header line
+    # follows movetext, or at the end of the stream. Lines are kept apart so that a ";"
+    # comment only runs to the end of its own line.
+    headers = {}
+    movetext = []
+    in_comment = False
+    for line in lines:
+        stripped = line.strip()
+        match = None if in_comment else HEADER_PATTERN.match(stripped)
+        if match:
+            if movetext:
+                yield PgnGame(headers, "\n".join(movetext))
+                headers = {}
+                movetext = []
+            headers[match.group(1)] = match.group(2)
+            continue
+        if not stripped or (stripped.startswith("%") and not in_comment):
+            continue
+        movetext.append(stripped)
+        in_comment, last_token = _scan_comments(stripped, in_comment)
+        if not in_comment and last_token in RESULTS:
+            yield PgnGame(headers, "\n".join(movetext))
+            headers = {}
+            movetext = []
+    if movetext or headers:
+        yield PgnGame(headers, "\n".join(movetext))
+
+
+def _scan_comments(line: str, in_comment: bool) -> Tuple[bool, Optional[str]]:
+    # (still inside a {...} comment at the end of the line, last token outside comments).
+    outside = []
+    for char in line:
+        if in_comment:
+            if char == "}":
+                in_comment = False
+                outside.append(" ")
+        elif char == "{":
+            in_comment = True
+            outside.append(" ")
+        elif char == ";":
+            break
+        else:
+            outside.append(char)
+    tokens = "".join(outside).split()
+    return in_comment, tokens[-1] if tokens else None
+
+
+def read_pgn(source: Union[str, TextIO]) -> Iterator[PgnGame]:
+    stream = open_text(source)
+    try:
+        yield from iter_pgn_games(stream)
+    finally:
+        if stream is not source:
+            stream.close()
+
+
+def movetext_tokens(movetext: str) -> List[str]:
+    text = COMMENT_PATTERN.sub(" ", movetext)
+    while True:
+        stripped = VARIATION_PATTERN.sub(" ", text)
+        if stripped == text:
+            break
+        text = stripped
+
+    tokens = []
+    for token in text.split():
+        token = MOVE_NUMBER_PATTERN.sub("", token)
+        if not token or token in RESULTS or token.startswith("$"):
+            continue
+        tokens.append(token)
+    return tokens
+
+
+def replay_game(game: PgnGame, board: Optional[ChessBoard] = None) -> Iterator[ChessBoard]:
+    # Yields the board after every move; the same board object is reused throughout.
+    if board is None:
+        board = ChessBoard()
+    board.set_fen(game.headers.get("FEN", STARTING_FEN))
+    for san in movetext_tokens(game.movetext):
+        board.push_san(san)
+        yield board
+
+
+_worker_board: Optional[ChessBoard] = None
+
+
+def process_games(games: Sequence[PgnGame], first_index: int, emit: str) -> BatchResult:
+    global _worker_board
+    if _worker_board is None:
+        _worker_board = ChessBoard()
+
+    results = []
+    for offset, game in enumerate(games):
+        positions = []
+        plies = 0
+        error = None
+        try:
+            for board in replay_game(game, _worker_board):
+                plies += 1
+                if emit == "hash":
+                    positions.append(board.zobrist_hash)
+                elif emit == "fen":
+                    positions.append(board.to_fen())
+        except ValueError as exc:
+            error = f"ply {plies + 1}: {exc}"
+        results.append(GameResult(first_index + offset, plies, error, positions))
+    return BatchResult(results, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def _batches(games: Iterable[PgnGame], batch_size: int) -> Iterator[List[PgnGame]]:
+    batch = []
+    for game in games:
+        batch.append(game)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class PipelineStats:
+    def __init__(self) -> None:
+        self.games = 0
+        self.plies = 0
+        self.errors = 0
+        self.worker_max_rss_kb = 0
+        self.start = time.perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.start
+
+    @property
+    def games_per_second(self) -> float:
+        return self.games / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def main_max_rss_kb(self) -> int:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def add(self, batch: BatchResult) -> None:
+        self.worker_max_rss_kb = max(self.worker_max_rss_kb, batch.max_rss_kb)
+        for game in batch.games:
+            self.games += 1
+            self.plies += game.plies
+            if game.error is not None:
+                self.errors += 1
+
+    def summary(self) -> Dict[str, float]:
+        return {"games": self.games,
+                "plies": self.plies,
+                "errors": self.errors,
+                "seconds": self.seconds,
+                "games_per_second": self.games_per_second,
+                "main_max_rss_kb": self.main_max_rss_kb,
+                "worker_max_rss_kb": self.worker_max_rss_kb}
+
+
+def run_pipeline(games: Iterable[PgnGame], workers: int = 1, batch_size: int = 64,
+                 max_pending: Optional[int] = None, emit: str = "none",
+                 stats: Optional[PipelineStats] = None) -> Iterator[GameResult]:
+    # Generator pipeline: games are read lazily, sent to the pool in batches, and at most
+    # max_pending batches are in flight, so memory stays bounded whatever the input size.
+    # Results come back in completion order; GameResult.index gives the input order.
+    if emit not in EMIT_MODES:
+        raise ValueError(f"emit must be one of {EMIT_MODES}")
+    if stats is None:
+        stats = PipelineStats()
+    batches = _batches(games, batch_size)
+
+    if workers <= 1:
+        index = 0
+        for batch in batches:
+            result = process_games(batch, index, emit)
+            index += len(batch)
+            stats.add(result)
+            yield from result.games
+        return
+
+    if max_pending is None:
+        max_pending = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Set[Future] = set()
+        index = 0
+        for batch in batches:
+            pending.add(executor.submit(process_games, batch, index, emit))
+            index += len(batch)
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    stats.add(result)
+                    yield from result.games
+        for future in pending:
+            result = future.result()
+            stats.add(result)
+            yield from result.games
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay PGN archives through the move rules.")
+    parser.add_argument("paths", nargs="+", help="PGN files (.pgn or .pgn.gz)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--batch-size", type=int, default=64, help="games per work item")
+    parser.add_argument("--max-pending", type=int, help="work items in flight (default 2x workers)")
+    parser.add_argument("--emit", choices=EMIT_MODES, default="none",
+                        help="what to emit for every position reached")
+    parser.add_argument("--output", help="write emitted positions here, one per line")
+    parser.add_argument("--show-errors", action="store_true", help="print games that fail")
+    args = parser.parse_args(argv)
+
+    def all_games() -> Iterator[PgnGame]:
+        for path in args.paths:
+            yield from read_pgn(path)
+
+    stats = PipelineStats()
+    output = open(args.output, "w") if args.output else None
+    try:
+        for result in run_pipeline(all_games(), workers=args.workers, batch_size=args.batch_size,
+                                   max_pending=args.max_pending, emit=args.emit, stats=stats):
+            if output is not None:
+                for position in result.positions:
+                    output.write(f"{position}\n")
+            if args.show_errors and result.error is not None:
+                print(f"game {result.index}: {result.error}", file=sys.stderr)
+    finally:
+        if output is not None:
+            output.close()
+
+    summary = stats.summary()
+    print(f"games: {summary['games']:,} ({summary['errors']:,} with errors), "
+          f"plies: {summary['plies']:,}")
+    print(f"time: {summary['seconds']:.2f}s, {summary['games_per_second']:,.1f} games/s")
+    print(f"memory high-water: main {summary['main_max_rss_kb'] / 1024:.1f} MiB, "
+          f"worker {summary['worker_max_rss_kb'] / 1024:.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
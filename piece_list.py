@@ -0,0 +1,91 @@
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+from pieces import ChessPiece, KING
+
+PIECE_TYPE_COUNT = 6
+
+
+class PieceList:
+    # Live pieces of one colour grouped by piece type. Each group is a plain list; a piece's
+    # slot is found by an identity scan of its own group (at most ten entries), and removal
+    # swaps in the last entry, so iteration never sees captured pieces and the same piece
+    # may sit in several lists at once.
+    __slots__ = ("_groups",)
+
+    def __init__(self, pieces: Iterable[ChessPiece] = ()) -> None:
+        self._groups: Tuple[List[ChessPiece], ...] = tuple([] for _ in range(PIECE_TYPE_COUNT))
+        for piece in pieces:
+            self.add(piece)
+
+    @staticmethod
+    def _slot(group: List[ChessPiece], piece: object) -> int:
+        for slot, other in enumerate(group):
+            if other is piece:
+                return slot
+        return -1
+
+    def add(self, piece: ChessPiece) -> None:
+        group = self._groups[piece.piece_type]
+        if self._slot(group, piece) < 0:
+            group.append(piece)
+
+    # List-style alias kept for callers written against the old plain lists.
+    append = add
+
+    def extend(self, pieces: Iterable[ChessPiece]) -> None:
+        for piece in pieces:
+            self.add(piece)
+
+    def remove(self, piece: ChessPiece) -> None:
+        group = self._groups[piece.piece_type]
+        slot = self._slot(group, piece)
+        if slot < 0:
+            raise ValueError(f"{piece!r} is not in the piece list")
+        last = group.pop()
+        if last is not piece:
+            group[slot] = last
+
+    def clear(self) -> None:
+        for group in self._groups:
+            group.clear()
+
+    def of_type(self, piece_type: int) -> Iterable[ChessPiece]:
+        return tuple(self._groups[piece_type])
+
+    def count(self, piece_type: int) -> int:
+        return len(self._groups[piece_type])
+
+    @property
+    def king(self) -> Optional[ChessPiece]:
+        for king in self._groups[KING]:
+            return king
+        return None
+
+    def __contains__(self, piece: object) -> bool:
+        piece_type = getattr(piece, "piece_type", None)
+        if piece_type is None:
+            return False
+        return self._slot(self._groups[piece_type], piece) >= 0
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[ChessPiece, List[ChessPiece]]:
+        # Same order as iteration: grouped by piece type, pawns first.
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("piece list index out of range")
+        for group in self._groups:
+            if index < len(group):
+                return group[index]
+            index -= len(group)
+        raise IndexError("piece list index out of range")
+
+    def __iter__(self) -> Iterator[ChessPiece]:
+        for group in self._groups:
+            yield from group
+
+    def __len__(self) -> int:
+        return sum(len(group) for group in self._groups)
+
+    def __repr__(self) -> str:
+        return f"PieceList({list(self)!r})"
@@ -1,31 +1,136 @@
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Tuple, Optional, List
+from typing import Dict, Tuple, Optional, List, Union
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+WHITE, BLACK = 0, 1
+COLOR_NAMES = ("white", "black")
+COLOR_CODES = {"white": WHITE, "black": BLACK}
+
+Square = Tuple[int, int]
+Ray = Tuple[Square, ...]
+
+# Direction orders match the order in which the generators used to walk the board.
+ROOK_DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+QUEEN_DIRECTIONS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+KNIGHT_OFFSETS = ((1, 2), (1, -2), (2, 1), (2, -1), (-1, 2), (-1, -2), (-2, 1), (-2, -1))
+PAWN_DIRECTIONS = {"white": -1, "black": 1}
+OPPOSITE_COLORS = {"white": "black", "black": "white"}
+
+
+def _on_board(x: int, y: int) -> bool:
+    return (0 <= x <= 7) and (0 <= y <= 7)
+
+
+def _build_ray(x: int, y: int, dx: int, dy: int) -> Ray:
+    ray = []
+    x, y = x + dx, y + dy
+    while _on_board(x, y):
+        ray.append((x, y))
+        x, y = x + dx, y + dy
+    return tuple(ray)
+
+
+def _build_steps(x: int, y: int, offsets: Tuple[Square, ...]) -> Ray:
+    return tuple((x + dx, y + dy) for dx, dy in offsets if _on_board(x + dx, y + dy))
+
+
+_table_build_start = time.perf_counter()
+ALL_SQUARES: Tuple[Square, ...] = tuple((x, y) for x in range(8) for y in range(8))
+ROOK_RAYS: Dict[Square, Tuple[Ray, ...]] = {
+    (x, y): tuple(_build_ray(x, y, dx, dy) for dx, dy in ROOK_DIRECTIONS) for x, y in ALL_SQUARES}
+BISHOP_RAYS: Dict[Square, Tuple[Ray, ...]] = {
+    (x, y): tuple(_build_ray(x, y, dx, dy) for dx, dy in BISHOP_DIRECTIONS) for x, y in ALL_SQUARES}
+QUEEN_RAYS: Dict[Square, Tuple[Ray, ...]] = {
+    (x, y): tuple(_build_ray(x, y, dx, dy) for dx, dy in QUEEN_DIRECTIONS) for x, y in ALL_SQUARES}
+KNIGHT_TARGETS: Dict[Square, Ray] = {
+    (x, y): _build_steps(x, y, KNIGHT_OFFSETS) for x, y in ALL_SQUARES}
+KING_TARGETS: Dict[Square, Ray] = {
+    (x, y): _build_steps(x, y, QUEEN_DIRECTIONS) for x, y in ALL_SQUARES}
+# Pawn tables are indexed by colour; pushes hold (one step, two steps) or None when off the board.
+PAWN_ATTACK_SQUARES: Dict[str, Dict[Square, Ray]] = {
+    color: {(x, y): _build_steps(x, y, ((-1, direction), (1, direction))) for x, y in ALL_SQUARES}
+    for color, direction in PAWN_DIRECTIONS.items()}
+PAWN_PUSH_SQUARES: Dict[str, Dict[Square, Tuple[Optional[Square], Optional[Square]]]] = {
+    color: {(x, y): tuple((x, y + step * direction) if _on_board(x, y + step * direction) else None
+                          for step in (1, 2))
+            for x, y in ALL_SQUARES}
+    for color, direction in PAWN_DIRECTIONS.items()}
+TABLE_BUILD_SECONDS = time.perf_counter() - _table_build_start
+
+
+def is_square_attacked(pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
+                       square: Tuple[int, int], by_color: str) -> bool:
+    # Looks outward from the target square and stops at the first attacker found.
+    by_code = COLOR_CODES[by_color]
+    for knight_square in KNIGHT_TARGETS[square]:
+        piece = pieces_pos.get(knight_square)
+        if piece is not None and piece.piece_type == KNIGHT and piece.color_code == by_code:
+            return True
+
+    for pawn_square in PAWN_ATTACK_SQUARES[OPPOSITE_COLORS[by_color]][square]:
+        piece = pieces_pos.get(pawn_square)
+        if piece is not None and piece.piece_type == PAWN and piece.color_code == by_code:
+            return True
+
+    for king_square in KING_TARGETS[square]:
+        piece = pieces_pos.get(king_square)
+        if piece is not None and piece.piece_type == KING and piece.color_code == by_code:
+            return True
+
+    for rays, slider_type in ((ROOK_RAYS[square], ROOK), (BISHOP_RAYS[square], BISHOP)):
+        for ray in rays:
+            for ray_square in ray:
+                piece = pieces_pos.get(ray_square)
+                if piece is None:
+                    continue
+                if piece.color_code == by_code and piece.piece_type in (slider_type, QUEEN):
+                    return True
+                break
+    return False
 
 
 class ChessPiece(ABC):
-    def __init__(self, start_x: int, start_y: int, color: str) -> None:
-        self._x = start_x
-        self._y = start_y
-        self._color = color
+    # Slots instead of a per-instance __dict__. The position is kept as a single square
+    # index (y * 8 + x) and the colour as WHITE/BLACK.
+    __slots__ = ("_square", "_color")
+    piece_type: int
+
+    def __init__(self, start_x: int, start_y: int, color: Union[str, int]) -> None:
+        self._square = (start_y << 3) | start_x
+        self._color = COLOR_CODES[color] if isinstance(color, str) else color
 
     @property
     def x(self) -> int:
-        return self._x
+        return self._square & 7
 
     @x.setter
     def x(self, new_x: int) -> None:
-        self._x = new_x
+        self._square = (self._square & ~7) | new_x
 
     @property
     def y(self) -> int:
-        return self._y
+        return self._square >> 3
 
     @y.setter
     def y(self, new_y: int) -> None:
-        self._y = new_y
+        self._square = (new_y << 3) | (self._square & 7)
+
+    @property
+    def square(self) -> int:
+        return self._square
+
+    @square.setter
+    def square(self, new_square: int) -> None:
+        self._square = new_square
 
     @property
     def color(self) -> str:
+        return COLOR_NAMES[self._color]
+
+    @property
+    def color_code(self) -> int:
         return self._color
 
     @staticmethod
@@ -37,14 +142,55 @@ class ChessPiece(ABC):
         return piece is not None
 
     def is_own_piece(self, piece: 'ChessPiece') -> bool:
-        return piece.color == self.color
+        return piece._color == self._color
 
     def move_to(self, new_x: int, new_y: int) -> None:
-        self.x = new_x
-        self.y = new_y
+        self._square = (new_y << 3) | new_x
+
+    def _simulate_move(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
+                       square: Tuple[int, int]) -> Dict[Tuple[int, int], Optional['ChessPiece']]:
+        # The board as it would look after this piece moves to square, for king-safety tests.
+        new_pieces_pos = pieces_pos.copy()
+        new_pieces_pos[(self.x, self.y)] = None
+        new_pieces_pos[square] = self
+        return new_pieces_pos
+
+    def _get_sliding_moves(self, rays: Tuple[Ray, ...],
+                           pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
+                           enemy_pieces: List['ChessPiece'], own_pieces: List['ChessPiece'],
+                           own_king: 'King', only_attacking_moves: bool) -> List[Tuple[int, int]]:
+        possible_moves = []
+
+        for ray in rays:
+            for square in ray:
+                target_piece = pieces_pos.get(square)
+
+                if only_attacking_moves:
+                    if self.has_piece(piece=target_piece):
+                        if not self.is_own_piece(piece=target_piece):
+                            possible_moves.append(square)
+                        break
+                    possible_moves.append(square)
+                else:
+                    if self.has_piece(piece=target_piece) and \
+                            self.is_own_piece(piece=target_piece):
+                        break
+
+                    new_pieces_pos = self._simulate_move(pieces_pos=pieces_pos, square=square)
+                    if not own_king.is_king_in_check(pieces_pos=new_pieces_pos,
+                                                     enemy_pieces=enemy_pieces,
+                                                     own_pieces=own_pieces,
+                                                     king_x=own_king.x,
+                                                     king_y=own_king.y):
+                        possible_moves.append(square)
+
+                    if self.has_piece(piece=target_piece):
+                        break
+
+        return possible_moves
 
     @abstractmethod
-    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int]: Optional['ChessPiece']],
+    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
                            enemy_pieces: List['ChessPiece'], own_pieces: List['ChessPiece'],
                            own_king: 'King', only_attacking_moves: bool = False) \
             -> List[Tuple[int, int]]:
@@ -52,7 +198,10 @@ class ChessPiece(ABC):
 
 
 class Rook(ChessPiece):
-    def __init__(self, start_x: int, start_y: int, color: str) -> None:
+    __slots__ = ("_has_moved",)
+    piece_type = ROOK
+
+    def __init__(self, start_x: int, start_y: int, color: Union[str, int]) -> None:
         super().__init__(start_x=start_x, start_y=start_y, color=color)
         self._has_moved = False
 
@@ -60,208 +209,94 @@ class Rook(ChessPiece):
     def has_moved(self) -> bool:
         return self._has_moved
 
+    @has_moved.setter
+    def has_moved(self, has_moved: bool) -> None:
+        self._has_moved = has_moved
+
     def move_to(self, new_x: int, new_y: int) -> None:
         if not self.has_moved:
             self._has_moved = True
         super().move_to(new_x=new_x, new_y=new_y)
 
-    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int]: Optional['ChessPiece']],
+    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
                            enemy_pieces: List['ChessPiece'], own_pieces: List['ChessPiece'],
                            own_king: 'King', only_attacking_moves: bool = False) \
             -> List[Tuple[int, int]]:
-        possible_moves = []
-        directions = ((0, -1), (0, 1), (-1, 0), (1, 0))
-
-        for dx, dy in directions:
-            step = 1
-            while True:
-                new_x = self.x + dx * step
-                new_y = self.y + dy * step
-                if not self.field_exists(x=new_x, y=new_y):
-                    break
-
-                target_piece = pieces_pos.get((new_x, new_y))
-
-                if only_attacking_moves:
-                    if self.has_piece(piece=target_piece):
-                        if not self.is_own_piece(piece=target_piece):
-                            possible_moves.append((new_x, new_y))
-                        break
-                    possible_moves.append((new_x, new_y))
-                else:
-                    if self.has_piece(piece=target_piece) and \
-                            self.is_own_piece(piece=target_piece):
-                        break
-
-                    new_pieces_pos = pieces_pos.copy()
-                    new_pieces_pos[(self.x, self.y)] = None
-                    new_pieces_pos[(new_x, new_y)] = self
-                    if not own_king.is_king_in_check(pieces_pos=new_pieces_pos,
-                                                     enemy_pieces=enemy_pieces,
-                                                     own_pieces=own_pieces,
-                                                     king_x=own_king.x,
-                                                     king_y=own_king.y):
-                        possible_moves.append((new_x, new_y))
-
-                    if self.has_piece(piece=target_piece) and \
-                            not self.is_own_piece(piece=target_piece):
-                        break
-                step += 1
-
-        return possible_moves
+        return self._get_sliding_moves(rays=ROOK_RAYS[(self.x, self.y)], pieces_pos=pieces_pos,
+                                       enemy_pieces=enemy_pieces, own_pieces=own_pieces,
+                                       own_king=own_king, only_attacking_moves=only_attacking_moves)
 
 
 class Knight(ChessPiece):
-    def __init__(self, start_x: int, start_y: int, color: str) -> None:
+    __slots__ = ()
+    piece_type = KNIGHT
+
+    def __init__(self, start_x: int, start_y: int, color: Union[str, int]) -> None:
         super().__init__(start_x=start_x, start_y=start_y, color=color)
 
-    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int]: Optional['ChessPiece']],
+    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
                            enemy_pieces: List['ChessPiece'], own_pieces: List['ChessPiece'],
                            own_king: 'King', only_attacking_moves: bool = False) \
             -> List[Tuple[int, int]]:
         possible_moves = []
-        directions = ((1, 2), (1, -2), (2, 1), (2, -1),
-                      (-1, 2), (-1, -2), (-2, 1), (-2, -1))
 
-        for dx, dy in directions:
-            new_x = self.x + dx
-            new_y = self.y + dy
-            if not self.field_exists(x=new_x, y=new_y):
+        for square in KNIGHT_TARGETS[(self.x, self.y)]:
+            target_piece = pieces_pos.get(square)
+            if self.has_piece(piece=target_piece) and \
+                    self.is_own_piece(piece=target_piece):
                 continue
 
-            target_piece = pieces_pos.get((new_x, new_y))
-
             if only_attacking_moves:
-                if self.has_piece(piece=target_piece) and \
-                        self.is_own_piece(piece=target_piece):
-                    continue
-                possible_moves.append((new_x, new_y))
+                possible_moves.append(square)
             else:
-                if self.has_piece(piece=target_piece) and \
-                        self.is_own_piece(piece=target_piece):
-                    continue
-
-                new_pieces_pos = pieces_pos.copy()
-                new_pieces_pos[(self.x, self.y)] = None
-                new_pieces_pos[(new_x, new_y)] = self
+                new_pieces_pos = self._simulate_move(pieces_pos=pieces_pos, square=square)
                 if not own_king.is_king_in_check(pieces_pos=new_pieces_pos,
                                                  enemy_pieces=enemy_pieces,
                                                  own_pieces=own_pieces,
                                                  king_x=own_king.x,
                                                  king_y=own_king.y):
-                    possible_moves.append((new_x, new_y))
+                    possible_moves.append(square)
 
         return possible_moves
 
 
 class Bishop(ChessPiece):
-    def __init__(self, start_x: int, start_y: int, color: str) -> None:
+    __slots__ = ()
+    piece_type = BISHOP
+
+    def __init__(self, start_x: int, start_y: int, color: Union[str, int]) -> None:
         super().__init__(start_x=start_x, start_y=start_y, color=color)
 
-    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int]: Optional['ChessPiece']],
+    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
                            enemy_pieces: List['ChessPiece'], own_pieces: List['ChessPiece'],
                            own_king: 'King', only_attacking_moves: bool = False) \
             -> List[Tuple[int, int]]:
-        possible_moves = []
-        directions = (-1, 1)
-
-        for dx in directions:
-            for dy in directions:
-                step = 1
-                while True:
-                    new_x = self.x + dx * step
-                    new_y = self.y + dy * step
-                    if not self.field_exists(x=new_x, y=new_y):
-                        break
-
-                    target_piece = pieces_pos.get((new_x, new_y))
-
-                    if only_attacking_moves:
-                        if self.has_piece(piece=target_piece):
-                            if not self.is_own_piece(piece=target_piece):
-                                possible_moves.append((new_x, new_y))
-                            break
-                        possible_moves.append((new_x, new_y))
-                    else:
-                        if self.has_piece(piece=target_piece) and \
-                                self.is_own_piece(piece=target_piece):
-                            break
-
-                        new_pieces_pos = pieces_pos.copy()
-                        new_pieces_pos[(self.x, self.y)] = None
-                        new_pieces_pos[(new_x, new_y)] = self
-                        if not own_king.is_king_in_check(pieces_pos=new_pieces_pos,
-                                                         enemy_pieces=enemy_pieces,
-                                                         own_pieces=own_pieces,
-                                                         king_x=own_king.x,
-                                                         king_y=own_king.y):
-                            possible_moves.append((new_x, new_y))
-
-                        if self.has_piece(piece=target_piece) and \
-                                not self.is_own_piece(piece=target_piece):
-                            break
-                    step += 1
-
-        return possible_moves
+        return self._get_sliding_moves(rays=BISHOP_RAYS[(self.x, self.y)], pieces_pos=pieces_pos,
+                                       enemy_pieces=enemy_pieces, own_pieces=own_pieces,
+                                       own_king=own_king, only_attacking_moves=only_attacking_moves)
 
 
 class Queen(ChessPiece):
-    def __init__(self, start_x: int, start_y: int, color: str) -> None:
+    __slots__ = ()
+    piece_type = QUEEN
+
+    def __init__(self, start_x: int, start_y: int, color: Union[str, int]) -> None:
         super().__init__(start_x=start_x, start_y=start_y, color=color)
 
-    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int]: Optional['ChessPiece']],
+    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
                            enemy_pieces: List['ChessPiece'], own_pieces: List['ChessPiece'],
                            own_king: 'King', only_attacking_moves: bool = False) \
             -> List[Tuple[int, int]]:
-        possible_moves = []
-        directions = (-1, 0, 1)
-
-        for dx in directions:
-            for dy in directions:
-                if (dx == 0) and (dy == 0):
-                    continue
-
-                step = 1
-                while True:
-                    new_x = self.x + step * dx
-                    new_y = self.y + step * dy
-                    if not self.field_exists(x=new_x, y=new_y):
-                        break
-
-                    target_piece = pieces_pos.get((new_x, new_y))
-
-                    if only_attacking_moves:
-                        if self.has_piece(piece=target_piece):
-                            if not self.is_own_piece(piece=target_piece):
-                                possible_moves.append((new_x, new_y))
-                            break
-                        possible_moves.append((new_x, new_y))
-                    else:
-                        if self.has_piece(piece=target_piece) and \
-                                self.is_own_piece(piece=target_piece):
-                            break
-
-                        new_pieces_pos = pieces_pos.copy()
-                        new_pieces_pos[(self.x, self.y)] = None
-                        new_pieces_pos[(new_x, new_y)] = self
-                        if not own_king.is_king_in_check(
-                                pieces_pos=new_pieces_pos,
-                                enemy_pieces=enemy_pieces,
-                                own_pieces=own_pieces,
-                                king_x=own_king.x,
-                                king_y=own_king.y):
-                            possible_moves.append((new_x, new_y))
-
-                        if self.has_piece(piece=target_piece) and \
-                                not self.is_own_piece(piece=target_piece):
-                            break
-                    step += 1
-
-        return possible_moves
+        return self._get_sliding_moves(rays=QUEEN_RAYS[(self.x, self.y)], pieces_pos=pieces_pos,
+                                       enemy_pieces=enemy_pieces, own_pieces=own_pieces,
+                                       own_king=own_king, only_attacking_moves=only_attacking_moves)
 
 
 class King(ChessPiece):
-    def __init__(self, start_x: int, start_y: int, color: str) -> None:
+    __slots__ = ("_has_moved",)
+    piece_type = KING
+
+    def __init__(self, start_x: int, start_y: int, color: Union[str, int]) -> None:
         super().__init__(start_x, start_y, color)
         self._has_moved = False
 
@@ -269,47 +304,36 @@ class King(ChessPiece):
     def has_moved(self) -> bool:
         return self._has_moved
 
+    @has_moved.setter
+    def has_moved(self, has_moved: bool) -> None:
+        self._has_moved = has_moved
+
     def move_to(self, new_x: int, new_y: int) -> None:
         if not self.has_moved:
             self._has_moved = True
         super().move_to(new_x, new_y)
 
-    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int]: Optional['ChessPiece']],
+    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
                            enemy_pieces: List['ChessPiece'], own_pieces: List['ChessPiece'],
                            own_king: 'King', only_attacking_moves: bool = False) \
             -> List[Tuple[int, int]]:
         possible_moves = []
-        directions = (-1, 0, 1)
-
-        for dx in directions:
-            for dy in directions:
-                if (dx == 0) and (dy == 0):
-                    continue
-
-                new_x = self.x + dx
-                new_y = self.y + dy
-                if not self.field_exists(x=new_x, y=new_y):
-                    continue
-
-                target_piece = pieces_pos.get((new_x, new_y))
 
-                if only_attacking_moves:
-                    if self.has_piece(piece=target_piece) and \
-                            self.is_own_piece(piece=target_piece):
-                        continue
-                    possible_moves.append((new_x, new_y))
-                else:
-                    if not self.has_piece(piece=target_piece) or \
-                            not self.is_own_piece(piece=target_piece):
+        for square in KING_TARGETS[(self.x, self.y)]:
+            target_piece = pieces_pos.get(square)
+            if self.has_piece(piece=target_piece) and \
+                    self.is_own_piece(piece=target_piece):
+                continue
 
-                        new_pieces_pos = pieces_pos.copy()
-                        new_pieces_pos[(self.x, self.y)] = None
-                        new_pieces_pos[(new_x, new_y)] = self
-                        if not self.is_king_in_check(pieces_pos=new_pieces_pos,
-                                                     enemy_pieces=enemy_pieces,
-                                                     own_pieces=own_pieces,
-                                                     king_x=new_x, king_y=new_y):
-                            possible_moves.append((new_x, new_y))
+            if only_attacking_moves:
+                possible_moves.append(square)
+            else:
+                new_pieces_pos = self._simulate_move(pieces_pos=pieces_pos, square=square)
+                if not self.is_king_in_check(pieces_pos=new_pieces_pos,
+                                             enemy_pieces=enemy_pieces,
+                                             own_pieces=own_pieces,
+                                             king_x=square[0], king_y=square[1]):
+                    possible_moves.append(square)
 
         if not only_attacking_moves and not self.is_king_in_check(pieces_pos=pieces_pos,
                                                                   enemy_pieces=enemy_pieces,
@@ -325,20 +349,13 @@ class King(ChessPiece):
 
         return possible_moves
 
-    def is_king_in_check(self, pieces_pos: Dict[Tuple[int, int]: Optional['ChessPiece']],
+    def is_king_in_check(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
                          enemy_pieces: List['ChessPiece'], own_pieces: List['ChessPiece'],
                          king_x: int, king_y: int) -> bool:
-        for piece in enemy_pieces:
-            attack_range = piece.get_possible_moves(pieces_pos=pieces_pos,
-                                                    enemy_pieces=enemy_pieces,
-                                                    own_pieces=own_pieces,
-                                                    own_king=self,
-                                                    only_attacking_moves=True)
-            if (king_x, king_y) in attack_range:
-                return True
-        return False
-
-    def can_short_castle(self, pieces_pos: Dict[Tuple[int, int]: Optional['ChessPiece']],
+        return is_square_attacked(pieces_pos=pieces_pos, square=(king_x, king_y),
+                                  by_color=OPPOSITE_COLORS[self.color])
+
+    def can_short_castle(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
                          enemy_pieces: List['ChessPiece'], own_pieces: List['ChessPiece']) \
             -> bool:
         if self.has_moved:
@@ -360,7 +377,7 @@ class King(ChessPiece):
             return False
         return True
 
-    def can_long_castle(self, pieces_pos: Dict[Tuple[int, int]: Optional['ChessPiece']],
+    def can_long_castle(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
                         enemy_pieces: List['ChessPiece'], own_pieces: List['ChessPiece']) \
             -> bool:
         if self.has_moved:
@@ -384,7 +401,10 @@ class King(ChessPiece):
 
 
 class Pawn(ChessPiece):
-    def __init__(self, start_x: int, start_y: int, color: str) -> None:
+    __slots__ = ("_has_moved",)
+    piece_type = PAWN
+
+    def __init__(self, start_x: int, start_y: int, color: Union[str, int]) -> None:
         super().__init__(start_x, start_y, color)
         self._has_moved = False
 
@@ -392,82 +412,69 @@ class Pawn(ChessPiece):
     def has_moved(self) -> bool:
         return self._has_moved
 
+    @has_moved.setter
+    def has_moved(self, has_moved: bool) -> None:
+        self._has_moved = has_moved
+
     def move_to(self, new_x: int, new_y: int) -> None:
         if not self.has_moved:
             self._has_moved = True
         super().move_to(new_x, new_y)
 
-    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int]: Optional['ChessPiece']],
+    def get_possible_moves(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
                            enemy_pieces: List['ChessPiece'], own_pieces: List['ChessPiece'],
                            own_king: 'King', only_attacking_moves: bool = False) \
             -> List[Tuple[int, int]]:
         possible_moves = []
-        direction = -1 if self.color == "white" else 1
+        attack_squares = PAWN_ATTACK_SQUARES[self.color][(self.x, self.y)]
 
         if only_attacking_moves:
-            for dx in (-1, 1):
-                new_x = self.x + dx
-                new_y = self.y + direction
-                if not self.field_exists(x=new_x, y=new_y):
-                    continue
-
-                target_piece = pieces_pos.get((new_x, new_y))
+            for square in attack_squares:
+                target_piece = pieces_pos.get(square)
                 if self.has_piece(piece=target_piece) and \
                         self.is_own_piece(piece=target_piece):
                     continue
-                possible_moves.append((new_x, new_y))
+                possible_moves.append(square)
         else:
-            new_y1 = self.y + direction
-            new_y2 = self.y + 2*direction
-
-            # Не забыть добавить проверку условия на предпоследнюю горизонталь
-            piece1 = pieces_pos[(self.x, new_y1)]
-            if not self.has_piece(piece1):
-                new_pieces_pos = pieces_pos.copy()
-                new_pieces_pos[(self.x, self.y)] = None
-                new_pieces_pos[(self.x, new_y1)] = self
+            square1, square2 = PAWN_PUSH_SQUARES[self.color][(self.x, self.y)]
+
+            # Either push square is None when it would leave the board (seventh or last rank).
+            if square1 is not None and not self.has_piece(pieces_pos[square1]):
+                new_pieces_pos = self._simulate_move(pieces_pos=pieces_pos, square=square1)
                 if not own_king.is_king_in_check(pieces_pos=new_pieces_pos,
                                                  enemy_pieces=enemy_pieces,
                                                  own_pieces=own_pieces,
                                                  king_x=own_king.x,
                                                  king_y=own_king.y):
-                    possible_moves.append((self.x, new_y1))
+                    possible_moves.append(square1)
 
-            piece2 = pieces_pos[(self.x, new_y2)]
-            if not self.has_moved and not self.has_piece(piece2):
-                new_pieces_pos = pieces_pos.copy()
-                new_pieces_pos[(self.x, self.y)] = None
-                new_pieces_pos[(self.x, new_y2)] = self
+            if square2 is not None and not self.has_moved and \
+                    not self.has_piece(pieces_pos[square2]):
+                new_pieces_pos = self._simulate_move(pieces_pos=pieces_pos, square=square2)
                 if not own_king.is_king_in_check(pieces_pos=new_pieces_pos,
                                                  enemy_pieces=enemy_pieces,
                                                  own_pieces=own_pieces,
                                                  king_x=own_king.x,
                                                  king_y=own_king.y):
-                    possible_moves.append((self.x, new_y2))
-
-            for dx in (-1, 1):
-                new_x = self.x + dx
-                if not self.field_exists(x=new_x, y=new_y1):
-                    continue
+                    possible_moves.append(square2)
 
-                target_piece = pieces_pos.get((new_x, new_y1))
+            for square in attack_squares:
+                target_piece = pieces_pos.get(square)
                 if self.has_piece(piece=target_piece) and \
                         self.is_own_piece(piece=target_piece):
                     continue
 
-                new_pieces_pos = pieces_pos.copy()
-                new_pieces_pos[(self.x, self.y)] = None
-                new_pieces_pos[(new_x, new_y1)] = self
+                new_pieces_pos = self._simulate_move(pieces_pos=pieces_pos, square=square)
                 if own_king.is_king_in_check(pieces_pos=new_pieces_pos,
                                              enemy_pieces=enemy_pieces,
                                              own_pieces=own_pieces,
                                              king_x=own_king.x,
                                              king_y=own_king.y):
                     continue
-                possible_moves.append((new_x, new_y1))
+                possible_moves.append(square)
 
         return possible_moves
 
-    def is_en_passant_avaible(self, pieces_pos: Dict[Tuple[int, int]: Optional['ChessPiece']],
+    def is_en_passant_avaible(self, pieces_pos: Dict[Tuple[int, int], Optional['ChessPiece']],
                               last_move: 'ChessPiece') -> bool:
         pass
\ No newline at end of file
@@ -0,0 +1,329 @@
+import argparse
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+from board import ChessBoard, PACKED_POSITION_KEY_SIZE, PACKED_POSITION_SIZE, STARTING_FEN
+from pgn import read_pgn, replay_game
+
+# An append-only position store: <path>.dat holds fixed-width records (Zobrist hash, packed
+# position, game result) in insertion order, and <path>.idx holds (hash, record number)
+# pairs sorted by hash. Both files are memory-mapped, so lookups are a binary search over
+# the index pages and nothing is loaded up front. Records appended after the last
+# build_index() form an unindexed tail that lookups scan linearly.
+RECORD = struct.Struct(f"<Q{PACKED_POSITION_SIZE}sB7x")
+INDEX_HEADER = struct.Struct("<8sQ")
+INDEX_ENTRY = struct.Struct("<QQ")
+INDEX_MAGIC = b"CCPOSIX1"
+
+UNKNOWN, WHITE_WIN, BLACK_WIN, DRAW = 0, 1, 2, 3
+RESULT_CODES = {"1-0": WHITE_WIN, "0-1": BLACK_WIN, "1/2-1/2": DRAW}
+
+
+class PositionRecord(NamedTuple):
+    zobrist_hash: int
+    position: bytes
+    result: int
+
+
+class PositionStats(NamedTuple):
+    count: int
+    white_wins: int
+    black_wins: int
+    draws: int
+    unknown: int
+
+
+def _map(path: str) -> Optional[mmap.mmap]:
+    # Empty files cannot be mapped; callers treat None as "no records".
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as stream:
+        return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_run(entries: List[Tuple[int, int]], directory: str) -> str:
+    entries.sort()
+    handle, path = tempfile.mkstemp(suffix=".run", dir=directory)
+    with os.fdopen(handle, "wb") as stream:
+        for entry in entries:
+            stream.write(INDEX_ENTRY.pack(*entry))
+    return path
+
+
+def _read_run(path: str) -> Iterator[Tuple[int, int]]:
+    with open(path, "rb") as stream:
+        while True:
+            chunk = stream.read(INDEX_ENTRY.size * 4096)
+            if not chunk:
+                return
+            yield from INDEX_ENTRY.iter_unpack(chunk)
+
+
+class PositionDatabase:
+    def __init__(self, path: str) -> None:
+        self.data_path = path + ".dat"
+        self.index_path = path + ".idx"
+        self._writer = open(self.data_path, "ab")
+        size = os.path.getsize(self.data_path)
+        self._count = size // RECORD.size
+        if size % RECORD.size:
+            # A partial record left by an interrupted append is cut off, so the next append
+            # starts on a record boundary and the map always holds whole records.
+            os.truncate(self.data_path, self._count * RECORD.size)
+        self._data: Optional[mmap.mmap] = None
+        self._index: Optional[mmap.mmap] = None
+        self._indexed = 0
+        self._index_entries = 0
+        self._open_index()
+
+    def __enter__(self) -> 'PositionDatabase':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._writer.close()
+        for mapped in (self._data, self._index):
+            if mapped is not None:
+                mapped.close()
+        self._data = self._index = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def indexed(self) -> int:
+        return self._indexed
+
+    def _open_index(self) -> None:
+        if self._index is not None:
+            self._index.close()
+        self._index = _map(self.index_path)
+        self._indexed = self._index_entries = 0
+        if self._index is None:
+            return
+        magic, indexed = INDEX_HEADER.unpack_from(self._index, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{self.index_path} is not a position index")
+        self._indexed = indexed
+        self._index_entries = (len(self._index) - INDEX_HEADER.size) // INDEX_ENTRY.size
+
+    def _data_map(self) -> Optional[mmap.mmap]:
+        # Remapped only when appends have grown the file since the last read. A superseded
+        # map is dropped rather than closed, as a running unique_positions() may still hold it.
+        if self._data is None or len(self._data) != self._count * RECORD.size:
+            self._writer.flush()
+            self._data = _map(self.data_path)
+        return self._data
+
+    def append(self, board: ChessBoard, result: int = UNKNOWN) -> int:
+        self._writer.write(RECORD.pack(board.zobrist_hash, board.to_bytes(), result))
+        self._count += 1
+        return self._count - 1
+
+    def extend(self, entries: Iterable[Tuple[int, bytes, int]]) -> int:
+        # (hash, packed position, result) triples, for callers that already hold the bytes.
+        written = 0
+        for zobrist_hash, position, result in entries:
+            self._writer.write(RECORD.pack(zobrist_hash, position, result))
+            written += 1
+        self._count += written
+        return written
+
+    def record(self, number: int) -> PositionRecord:
+        data = self._data_map()
+        if data is None or not 0 <= number < self._count:
+            raise IndexError(f"record {number} out of range")
+        return PositionRecord(*RECORD.unpack_from(data, number * RECORD.size))
+
+    def iter_records(self, start: int = 0) -> Iterator[PositionRecord]:
+        # Unpacks straight from the mapped pages; the file is never read into a buffer. The
+        # iterator maps the file itself, so close() and remapping never meet its view.
+        self._writer.flush()
+        data = _map(self.data_path)
+        if data is None:
+            return
+        try:
+            with memoryview(data)[start * RECORD.size:self._count * RECORD.size] as view:
+                for fields in RECORD.iter_unpack(view):
+                    yield PositionRecord(*fields)
+        finally:
+            data.close()
+
+    def build_index(self, run_size: int = 1_000_000) -> int:
+        # External sort: sorted runs of at most run_size entries go to temporary files and are
+        # merged into the new index, so memory stays bounded however large the store is.
+        count = len(self)
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        runs = []
+        entries = []
+        try:
+            for number, record in enumerate(self.iter_records()):
+                entries.append((record.zobrist_hash, number))
+                if len(entries) == run_size:
+                    runs.append(_write_run(entries, directory))
+                    entries = []
+            if entries:
+                runs.append(_write_run(entries, directory))
+            temporary = self.index_path + ".tmp"
+            with open(temporary, "wb") as stream:
+                stream.write(INDEX_HEADER.pack(INDEX_MAGIC, count))
+                for entry in heapq.merge(*(_read_run(run) for run in runs)):
+                    stream.write(INDEX_ENTRY.pack(*entry))
+        finally:
+            for run in runs:
+                os.remove(run)
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        os.replace(temporary, self.index_path)
+        self._open_index()
+        return count
+
+    def _first_entry(self, zobrist_hash: int) -> int:
+        low, high = 0, self._index_entries
+        index = self._index
+        while low < high:
+            middle = (low + high) >> 1
+            if INDEX_ENTRY.unpack_from(index, INDEX_HEADER.size + middle * INDEX_ENTRY.size)[0] \
+                    < zobrist_hash:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, zobrist_hash: int) -> List[int]:
+        # Record numbers with this hash: binary search in the index, then the unindexed tail.
+        numbers = []
+        if self._index is not None:
+            entry = self._first_entry(zobrist_hash)
+            while entry < self._index_entries:
+                found, number = INDEX_ENTRY.unpack_from(
+                    self._index, INDEX_HEADER.size + entry * INDEX_ENTRY.size)
+                if found != zobrist_hash:
+                    break
+                numbers.append(number)
+                entry += 1
+        data = self._data_map()
+        if data is not None:
+            for number in range(self._indexed, self._count):
+                if RECORD.unpack_from(data, number * RECORD.size)[0] == zobrist_hash:
+                    numbers.append(number)
+        return numbers
+
+    def find(self, board: ChessBoard) -> List[PositionRecord]:
+        # Hash matches are confirmed on the packed position, move counters excluded.
+        key = board.to_bytes()[:PACKED_POSITION_KEY_SIZE]
+        records = []
+        for number in self.lookup(board.zobrist_hash):
+            record = self.record(number)
+            if record.position[:PACKED_POSITION_KEY_SIZE] == key:
+                records.append(record)
+        return records
+
+    def stats(self, board: ChessBoard) -> PositionStats:
+        tally = [0, 0, 0, 0]
+        for record in self.find(board):
+            tally[record.result] += 1
+        return PositionStats(sum(tally), tally[WHITE_WIN], tally[BLACK_WIN], tally[DRAW],
+                             tally[UNKNOWN])
+
+    def unique_positions(self) -> Iterator[PositionRecord]:
+        # Walks the index in hash order, so duplicates are adjacent and only one hash group is
+        # held at a time; records past the index are checked against it individually.
+        data = self._data_map()
+        if data is None:
+            return
+        group_hash = None
+        group_keys: Set[bytes] = set()
+        for entry in range(self._index_entries):
+            zobrist_hash, number = INDEX_ENTRY.unpack_from(
+                self._index, INDEX_HEADER.size + entry * INDEX_ENTRY.size)
+            if zobrist_hash != group_hash:
+                group_hash = zobrist_hash
+                group_keys = set()
+            record = PositionRecord(*RECORD.unpack_from(data, number * RECORD.size))
+            key = record.position[:PACKED_POSITION_KEY_SIZE]
+            if key not in group_keys:
+                group_keys.add(key)
+                yield record
+
+        tail_keys: Set[bytes] = set()
+        for number in range(self._indexed, self._count):
+            record = PositionRecord(*RECORD.unpack_from(data, number * RECORD.size))
+            key = record.position[:PACKED_POSITION_KEY_SIZE]
+            if key in tail_keys:
+                continue
+            tail_keys.add(key)
+            if not any(self.record(other).position[:PACKED_POSITION_KEY_SIZE] == key
+                       for other in self.lookup(record.zobrist_hash) if other < self._indexed):
+                yield record
+
+
+def add_games(database: PositionDatabase, paths: Sequence[str]) -> Dict[str, int]:
+    board = ChessBoard()
+    games = positions = errors = 0
+    for path in paths:
+        for game in read_pgn(path):
+            result = RESULT_CODES.get(game.headers.get("Result", "*"), UNKNOWN)
+            games += 1
+            try:
+                # replay_game() yields only the positions after each move, so the one the
+                # game starts from is stored first.
+                board.set_fen(game.headers.get("FEN", STARTING_FEN))
+                database.append(board, result)
+                positions += 1
+                for position in replay_game(game, board):
+                    database.append(position, result)
+                    positions += 1
+            except ValueError:
+                errors += 1
+    return {"games": games, "positions": positions, "errors": errors}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Append-only binary position database.")
+    parser.add_argument("database", help="database path, without the .dat/.idx suffix")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="append every position of PGN games")
+    add.add_argument("paths", nargs="+", help="PGN files (.pgn or .pgn.gz)")
+    add.add_argument("--no-index", action="store_true", help="skip rebuilding the index")
+    commands.add_parser("index", help="rebuild the sorted hash index")
+    stats = commands.add_parser("stats", help="how often a position occurs, and the results")
+    stats.add_argument("fen")
+    info = commands.add_parser("info", help="record counts and file sizes")
+    info.add_argument("--unique", action="store_true", help="also count distinct positions")
+    args = parser.parse_args(argv)
+
+    with PositionDatabase(args.database) as database:
+        if args.command == "add":
+            summary = add_games(database, args.paths)
+            print(f"games: {summary['games']:,} ({summary['errors']:,} with errors), "
+                  f"positions appended: {summary['positions']:,}")
+            if not args.no_index:
+                print(f"indexed {database.build_index():,} records")
+        elif args.command == "index":
+            print(f"indexed {database.build_index():,} records")
+        elif args.command == "stats":
+            result = database.stats(ChessBoard.from_fen(args.fen))
+            print(f"seen {result.count:,} times: +{result.white_wins:,} ={result.draws:,} "
+                  f"-{result.black_wins:,} ({result.unknown:,} unknown)")
+        else:
+            records = len(database)
+            print(f"records: {records:,} ({database.indexed:,} indexed), "
+                  f"{RECORD.size} bytes each")
+            for path in (database.data_path, database.index_path):
+                if os.path.exists(path):
+                    print(f"{path}: {os.path.getsize(path):,} bytes")
+            if args.unique:
+                print(f"distinct positions: {sum(1 for _ in database.unique_positions()):,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
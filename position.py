@@ -0,0 +1,163 @@
+from typing import List, NamedTuple, Optional, Tuple
+from bitboard import PAWN_ATTACKS, WHITE_INDEX, iter_squares
+from board import ChessBoard, CASTLING_MASKS, CASTLING_ROOK_MOVES, KING_START_SQUARES, \
+    PIECE_LETTERS, pack_position
+from move import Move, square_name
+from pieces import PAWN, ROOK, KING
+from zobrist import PIECE_SQUARE_KEYS, BLACK_TO_MOVE_KEY, CASTLING_KEYS, EN_PASSANT_FILE_KEYS
+
+FEN_CASTLING = ((1, "K"), (2, "Q"), (4, "k"), (8, "q"))
+
+
+class Position(NamedTuple):
+    # An immutable snapshot: twelve piece bitboards plus the game state. Children share
+    # every unchanged bitboard with their parent, so a stored node costs one small tuple
+    # pair instead of a board, and old snapshots never change under a later push().
+    bitboards: Tuple[int, ...]
+    turn: int
+    castling_rights: int
+    en_passant_square: Optional[int]
+    halfmove_clock: int
+    fullmove_number: int
+    zobrist_hash: int
+
+    def __hash__(self) -> int:
+        return self.zobrist_hash
+
+    @classmethod
+    def from_fen(cls, fen: str) -> 'Position':
+        return ChessBoard.from_fen(fen).to_position()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Position':
+        board = _scratch_board()
+        board.set_bytes(data)
+        return board.to_position()
+
+    def to_bytes(self) -> bytes:
+        return pack_position(self.bitboards, self.turn, self.castling_rights,
+                             self.en_passant_square, self.halfmove_clock, self.fullmove_number)
+
+    @property
+    def occupied(self) -> int:
+        bitboards = self.bitboards
+        return bitboards[0] | bitboards[1] | bitboards[2] | bitboards[3] | bitboards[4] | \
+            bitboards[5] | bitboards[6] | bitboards[7] | bitboards[8] | bitboards[9] | \
+            bitboards[10] | bitboards[11]
+
+    def piece_index_at(self, square: int) -> Optional[int]:
+        mask = 1 << square
+        for index, bb in enumerate(self.bitboards):
+            if bb & mask:
+                return index
+        return None
+
+    def push(self, move: Move) -> 'Position':
+        # Derives the child without touching this snapshot: a new 12-tuple that reuses the
+        # untouched bitboards, with the Zobrist key updated the same way make_move does.
+        # The move is trusted; use legal_moves() to validate first.
+        from_square, to_square, promotion = move
+        us = self.turn
+        them = us ^ 1
+        from_mask = 1 << from_square
+        to_mask = 1 << to_square
+        bitboards = list(self.bitboards)
+        zobrist_hash = self.zobrist_hash ^ BLACK_TO_MOVE_KEY
+
+        base = us * 6
+        index = base
+        while not bitboards[index] & from_mask:
+            index += 1
+            if index == base + 6:
+                raise ValueError(f"No piece of the side to move on {square_name(from_square)}")
+        piece_type = index - base
+        bitboards[index] ^= from_mask
+        zobrist_hash ^= PIECE_SQUARE_KEYS[index][from_square]
+
+        captured = False
+        for captured_index in range(them * 6, them * 6 + 6):
+            if bitboards[captured_index] & to_mask:
+                bitboards[captured_index] ^= to_mask
+                zobrist_hash ^= PIECE_SQUARE_KEYS[captured_index][to_square]
+                captured = True
+                break
+        if piece_type == PAWN and to_square == self.en_passant_square:
+            captured_square = to_square + (8 if us == WHITE_INDEX else -8)
+            captured_index = them * 6 + PAWN
+            bitboards[captured_index] ^= 1 << captured_square
+            zobrist_hash ^= PIECE_SQUARE_KEYS[captured_index][captured_square]
+            captured = True
+
+        new_index = base + promotion if promotion is not None else index
+        bitboards[new_index] |= to_mask
+        zobrist_hash ^= PIECE_SQUARE_KEYS[new_index][to_square]
+
+        if piece_type == KING and to_square in CASTLING_ROOK_MOVES and \
+                from_square == KING_START_SQUARES[us]:
+            rook_from, rook_to = CASTLING_ROOK_MOVES[to_square]
+            rook_index = base + ROOK
+            bitboards[rook_index] ^= (1 << rook_from) | (1 << rook_to)
+            zobrist_hash ^= PIECE_SQUARE_KEYS[rook_index][rook_from] ^ \
+                PIECE_SQUARE_KEYS[rook_index][rook_to]
+
+        if self.en_passant_square is not None:
+            zobrist_hash ^= EN_PASSANT_FILE_KEYS[self.en_passant_square & 7]
+        en_passant_square = None
+        if piece_type == PAWN and abs(to_square - from_square) == 16:
+            passed_square = (from_square + to_square) >> 1
+            if PAWN_ATTACKS[us][passed_square] & bitboards[them * 6 + PAWN]:
+                en_passant_square = passed_square
+                zobrist_hash ^= EN_PASSANT_FILE_KEYS[passed_square & 7]
+
+        rights = self.castling_rights & CASTLING_MASKS[from_square] & CASTLING_MASKS[to_square]
+        if rights != self.castling_rights:
+            zobrist_hash ^= CASTLING_KEYS[self.castling_rights] ^ CASTLING_KEYS[rights]
+
+        return Position(tuple(bitboards), them, rights, en_passant_square,
+                        0 if piece_type == PAWN or captured else self.halfmove_clock + 1,
+                        self.fullmove_number + us, zobrist_hash)
+
+    def legal_moves(self) -> List[Move]:
+        board = _scratch_board()
+        board.set_position(self)
+        return board.generate_legal_moves()
+
+    def children(self) -> List[Tuple[Move, 'Position']]:
+        return [(move, self.push(move)) for move in self.legal_moves()]
+
+    def to_fen(self) -> str:
+        letters = ["1"] * 64
+        for index, bb in enumerate(self.bitboards):
+            letter = PIECE_LETTERS[index % 6]
+            for square in iter_squares(bb):
+                letters[square] = letter.upper() if index < 6 else letter
+        rows = []
+        for y in range(8):
+            row = ""
+            empty = 0
+            for letter in letters[y * 8:y * 8 + 8]:
+                if letter == "1":
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += letter
+            rows.append(row + (str(empty) if empty else ""))
+        castling = "".join(letter for right, letter in FEN_CASTLING
+                           if self.castling_rights & right) or "-"
+        en_passant = square_name(self.en_passant_square) \
+            if self.en_passant_square is not None else "-"
+        return f"{'/'.join(rows)} {'w' if self.turn == WHITE_INDEX else 'b'} {castling} " \
+               f"{en_passant} {self.halfmove_clock} {self.fullmove_number}"
+
+
+_board: Optional[ChessBoard] = None
+
+
+def _scratch_board() -> ChessBoard:
+    # One board per process is reloaded for every legality query on a snapshot.
+    global _board
+    if _board is None:
+        _board = ChessBoard()
+    return _board
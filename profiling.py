@@ -0,0 +1,191 @@
+import argparse
+import functools
+import json
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import pieces
+from board import ChessBoard
+from perft import REFERENCE_POSITIONS
+from pgn import read_pgn, replay_game
+from pieces import ChessPiece, Rook, Knight, Bishop, Queen, King, Pawn
+
+# (owner, attribute, category). Owners are classes or modules; the attribute is swapped for
+# a counting wrapper while profiling is enabled and put back afterwards, so the normal code
+# paths carry no instrumentation at all.
+HOOKS: Tuple[Tuple[Any, str, str], ...] = (
+    (Rook, "get_possible_moves", "Rook.get_possible_moves"),
+    (Knight, "get_possible_moves", "Knight.get_possible_moves"),
+    (Bishop, "get_possible_moves", "Bishop.get_possible_moves"),
+    (Queen, "get_possible_moves", "Queen.get_possible_moves"),
+    (King, "get_possible_moves", "King.get_possible_moves"),
+    (Pawn, "get_possible_moves", "Pawn.get_possible_moves"),
+    (King, "is_king_in_check", "is_king_in_check"),
+    (pieces, "is_square_attacked", "is_square_attacked"),
+    (ChessPiece, "_simulate_move", "dict_copy"),
+    (King, "can_short_castle", "can_short_castle"),
+    (King, "can_long_castle", "can_long_castle"),
+    (ChessBoard, "generate_legal_moves", "ChessBoard.generate_legal_moves"),
+    (ChessBoard, "has_legal_move", "ChessBoard.has_legal_move"),
+    (ChessBoard, "make_move", "ChessBoard.make_move"),
+    (ChessBoard, "unmake_move", "ChessBoard.unmake_move"),
+    (ChessBoard, "game_status", "ChessBoard.game_status"),
+)
+WORKLOADS = ("legacy", "perft", "pgn")
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.calls: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        # Exclusive time per call stack ("a;b;c"), the input flame graph tools expect.
+        self.stacks: Dict[str, float] = {}
+        self._stack: List[str] = []
+        self._child_seconds: List[float] = []
+        self._originals: List[Tuple[Any, str, Any]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._originals)
+
+    def enable(self, hooks: Sequence[Tuple[Any, str, str]] = HOOKS) -> None:
+        if self.enabled:
+            return
+        for owner, attribute, category in hooks:
+            original = vars(owner)[attribute]
+            self._originals.append((owner, attribute, original))
+            setattr(owner, attribute, self._wrap(category, original))
+
+    def disable(self) -> None:
+        for owner, attribute, original in reversed(self._originals):
+            setattr(owner, attribute, original)
+        self._originals = []
+
+    def reset(self) -> None:
+        self.calls.clear()
+        self.seconds.clear()
+        self.stacks.clear()
+
+    def _wrap(self, category: str, function: Callable) -> Callable:
+        calls = self.calls
+        seconds = self.seconds
+        stacks = self.stacks
+        stack = self._stack
+        child_seconds = self._child_seconds
+        perf_counter = time.perf_counter
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # Inclusive time only counts the outermost call of a category, so recursive
+            # calls (perft through make_move, say) are not added twice.
+            outermost = category not in stack
+            stack.append(category)
+            child_seconds.append(0.0)
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                key = ";".join(stack)
+                stack.pop()
+                stacks[key] = stacks.get(key, 0.0) + elapsed - child_seconds.pop()
+                if child_seconds:
+                    child_seconds[-1] += elapsed
+                calls[category] = calls.get(category, 0) + 1
+                if outermost:
+                    seconds[category] = seconds.get(category, 0.0) + elapsed
+        return wrapper
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {category: {"calls": count,
+                           "seconds": self.seconds.get(category, 0.0),
+                           "mean_us": self.seconds.get(category, 0.0) / count * 1e6}
+                for category, count in sorted(self.calls.items(),
+                                              key=lambda item: -self.seconds.get(item[0], 0.0))}
+
+    def to_json(self) -> str:
+        return json.dumps({"categories": self.report(), "stacks": self.stacks}, indent=2)
+
+    def folded_stacks(self) -> str:
+        # One "frame;frame;frame microseconds" line per stack, as read by flamegraph.pl
+        # and speedscope.
+        return "".join(f"{key} {round(value * 1e6)}\n"
+                       for key, value in sorted(self.stacks.items()) if value > 0)
+
+
+@contextmanager
+def profile(hooks: Sequence[Tuple[Any, str, str]] = HOOKS) -> Iterator[Profiler]:
+    profiler = Profiler()
+    profiler.enable(hooks)
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+
+
+def run_legacy_workload(board: ChessBoard) -> int:
+    # Every piece of the side to move through its own get_possible_moves, as the original
+    # per-piece API is used.
+    own = board.pieces(board.turn)
+    enemy = board.pieces("black" if board.turn == "white" else "white")
+    king = own.king
+    board_state = board.board_state
+    moves = 0
+    for piece in list(own):
+        moves += len(piece.get_possible_moves(pieces_pos=board_state, enemy_pieces=enemy,
+                                              own_pieces=own, own_king=king))
+    return moves
+
+
+def run_workload(workload: str, fens: Sequence[str], depth: int, pgn_path: Optional[str]) -> None:
+    if workload == "pgn":
+        board = ChessBoard()
+        for game in read_pgn(pgn_path):
+            for position in replay_game(game, board):
+                position.game_status()
+        return
+    for fen in fens:
+        board = ChessBoard.from_fen(fen)
+        if workload == "perft":
+            board.perft(depth)
+        else:
+            run_legacy_workload(board)
+
+
+def print_report(report: Dict[str, Dict[str, float]]) -> None:
+    for category, stats in report.items():
+        print(f"{category:<34} {stats['calls']:>10,} calls {stats['seconds']:9.3f}s "
+              f"{stats['mean_us']:9.2f} us/call")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Count and time move-generation hot paths.")
+    parser.add_argument("--workload", choices=WORKLOADS, default="legacy",
+                        help="legacy per-piece generation, board perft, or PGN replay")
+    parser.add_argument("--fen", action="append", help="position(s) to use (default: perft suite)")
+    parser.add_argument("--depth", type=int, default=2, help="perft depth")
+    parser.add_argument("--pgn", help="PGN file for the pgn workload")
+    parser.add_argument("--repeat", type=int, default=1, help="run the workload this many times")
+    parser.add_argument("--json", help="write counters and stacks to this JSON file")
+    parser.add_argument("--folded", help="write flame graph folded stacks to this file")
+    args = parser.parse_args(argv)
+    if args.workload == "pgn" and not args.pgn:
+        parser.error("--pgn is required for the pgn workload")
+
+    fens = args.fen or [position.fen for position in REFERENCE_POSITIONS]
+    with profile() as profiler:
+        for _ in range(args.repeat):
+            run_workload(args.workload, fens, args.depth, args.pgn)
+    print_report(profiler.report())
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json_file.write(profiler.to_json())
+    if args.folded:
+        with open(args.folded, "w") as folded_file:
+            folded_file.write(profiler.folded_stacks())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import re
+from typing import TYPE_CHECKING
+from move import Move, PROMOTION_LETTERS, square_name, parse_square
+from pieces import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+
+if TYPE_CHECKING:
+    from board import ChessBoard
+
+SAN_PIECE_TYPES = {"N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN, "K": KING}
+SAN_PIECE_LETTERS = {piece_type: letter for letter, piece_type in SAN_PIECE_TYPES.items()}
+SAN_PROMOTION_TYPES = {"N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN}
+SAN_PATTERN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$")
+KINGSIDE_CASTLING = ("O-O", "0-0")
+QUEENSIDE_CASTLING = ("O-O-O", "0-0-0")
+
+
+def parse_san(board: 'ChessBoard', text: str) -> Move:
+    san = text.rstrip("+#!?")
+    legal_moves = board.generate_legal_moves()
+
+    if san in KINGSIDE_CASTLING or san in QUEENSIDE_CASTLING:
+        offset = 2 if san in KINGSIDE_CASTLING else -2
+        for move in legal_moves:
+            piece = board.piece_at(move.from_square)
+            if piece.piece_type == KING and move.to_square - move.from_square == offset:
+                return move
+        raise ValueError(f"Illegal castling in this position: {text!r}")
+
+    match = SAN_PATTERN.match(san)
+    if match is None:
+        raise ValueError(f"Invalid SAN: {text!r}")
+    piece_letter, from_file, from_rank, target, promotion_letter = match.groups()
+    piece_type = SAN_PIECE_TYPES[piece_letter] if piece_letter else PAWN
+    to_square = parse_square(target)
+    promotion = SAN_PROMOTION_TYPES[promotion_letter] if promotion_letter else None
+
+    candidates = []
+    for move in legal_moves:
+        if move.to_square != to_square or move.promotion != promotion:
+            continue
+        if board.piece_at(move.from_square).piece_type != piece_type:
+            continue
+        from_name = square_name(move.from_square)
+        if (from_file and from_name[0] != from_file) or (from_rank and from_name[1] != from_rank):
+            continue
+        candidates.append(move)
+
+    if not candidates:
+        raise ValueError(f"Illegal move in this position: {text!r}")
+    if len(candidates) > 1:
+        raise ValueError(f"Ambiguous move in this position: {text!r}")
+    return candidates[0]
+
+
+def move_to_san(board: 'ChessBoard', move: Move) -> str:
+    piece = board.piece_at(move.from_square)
+    legal_moves = board.generate_legal_moves()
+
+    if piece.piece_type == KING and abs(move.to_square - move.from_square) == 2:
+        san = "O-O" if move.to_square > move.from_square else "O-O-O"
+    else:
+        is_capture = board.piece_at(move.to_square) is not None or \
+            (piece.piece_type == PAWN and move.to_square == board.en_passant_square)
+        from_name = square_name(move.from_square)
+        if piece.piece_type == PAWN:
+            san = from_name[0] + "x" if is_capture else ""
+        else:
+            san = SAN_PIECE_LETTERS[piece.piece_type]
+            rivals = [square_name(other.from_square) for other in legal_moves
+                      if other.to_square == move.to_square and other.from_square != move.from_square
+                      and board.piece_at(other.from_square).piece_type == piece.piece_type]
+            if rivals:
+                if all(rival[0] != from_name[0] for rival in rivals):
+                    san += from_name[0]
+                elif all(rival[1] != from_name[1] for rival in rivals):
+                    san += from_name[1]
+                else:
+                    san += from_name
+            if is_capture:
+                san += "x"
+        san += square_name(move.to_square)
+        if move.promotion is not None:
+            san += "=" + PROMOTION_LETTERS[move.promotion].upper()
+
+    board.make_move(move)
+    try:
+        if board.is_check():
+            san += "+" if board.has_legal_move() else "#"
+    finally:
+        board.unmake_move()
+    return san
@@ -0,0 +1,424 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+from board import ChessBoard, STARTING_FEN, ONGOING
+from move import Move
+
+UCI_PATTERN = re.compile(r"^[a-h][1-8][a-h][1-8][nbrq]?$")
+DEFAULT_PORT = 7878
+# Latency samples kept per operation; percentiles describe the most recent window.
+LATENCY_WINDOW = 20_000
+EXECUTOR_KINDS = ("thread", "process", "inline")
+
+
+def parse_move_text(board: ChessBoard, text: str) -> Move:
+    # Accepts UCI ("e2e4", "e7e8q") or SAN ("e4", "Nf3", "O-O").
+    if UCI_PATTERN.match(text):
+        move = Move.from_uci(text)
+        if move not in board.generate_legal_moves():
+            raise ValueError(f"Illegal move in this position: {text!r}")
+        return move
+    return board.parse_san(text)
+
+
+def apply_move(board: ChessBoard, text: str) -> Tuple[str, str, str]:
+    move = parse_move_text(board, text)
+    san = board.san(move)
+    board.make_move(move)
+    return move.uci(), san, board.game_status()
+
+
+def legal_moves_uci(board: ChessBoard) -> List[str]:
+    return [move.uci() for move in board.generate_legal_moves()]
+
+
+# Process-pool workers only see FENs, so they rebuild positions on one reused board. The
+# repetition history stays in the host process and is checked there.
+_worker_board: Optional[ChessBoard] = None
+
+
+def _get_worker_board() -> ChessBoard:
+    global _worker_board
+    if _worker_board is None:
+        _worker_board = ChessBoard()
+    return _worker_board
+
+
+def validate_move_fen(fen: str, text: str) -> Tuple[str, str, str]:
+    board = _get_worker_board()
+    board.set_fen(fen)
+    return apply_move(board, text)
+
+
+def legal_moves_fens(fens: Sequence[str]) -> List[List[str]]:
+    board = _get_worker_board()
+    results = []
+    for fen in fens:
+        board.set_fen(fen)
+        results.append(legal_moves_uci(board))
+    return results
+
+
+class LatencyRecorder:
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._window = window
+
+    def record(self, operation: str, seconds: float) -> None:
+        samples = self._samples.get(operation)
+        if samples is None:
+            samples = self._samples[operation] = deque(maxlen=self._window)
+        samples.append(seconds)
+        self._counts[operation] = self._counts.get(operation, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for operation, samples in self._samples.items():
+            ordered = sorted(samples)
+            result[operation] = {"count": self._counts[operation],
+                                 "p50_ms": percentile(ordered, 50) * 1000,
+                                 "p99_ms": percentile(ordered, 99) * 1000,
+                                 "max_ms": ordered[-1] * 1000 if ordered else 0.0}
+        return result
+
+
+def percentile(ordered: Sequence[float], percent: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class GameSession:
+    __slots__ = ("board", "lock")
+
+    def __init__(self, fen: str) -> None:
+        self.board = ChessBoard(fen=fen)
+        self.lock = asyncio.Lock()
+
+
+class GameHost:
+    # Hosts many games on one event loop. Each game has its own lock, so moves in one game
+    # are serialised while different games proceed independently; legality work runs on
+    # the executor so the loop keeps accepting requests.
+    def __init__(self, executor_kind: str = "thread", workers: Optional[int] = None) -> None:
+        if executor_kind not in EXECUTOR_KINDS:
+            raise ValueError(f"executor must be one of {EXECUTOR_KINDS}")
+        self._executor_kind = executor_kind
+        self._executor: Optional[Executor] = None
+        if executor_kind == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=workers)
+        elif executor_kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._games: Dict[int, GameSession] = {}
+        self._next_game_id = 1
+        self.latency = LatencyRecorder()
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "new_game": self._new_game,
+            "move": self._move,
+            "legal_moves": self._legal_moves,
+            "state": self._state,
+            "close_game": self._close_game,
+            "metrics": self._metrics,
+        }
+
+    @property
+    def game_count(self) -> int:
+        return len(self._games)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    async def _run(self, function: Callable, *args) -> Any:
+        if self._executor is None:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _session(self, request: Dict[str, Any]) -> GameSession:
+        session = self._games.get(request.get("game"))
+        if session is None:
+            raise ValueError(f"Unknown game: {request.get('game')!r}")
+        return session
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        operation = request.get("op")
+        start = time.perf_counter()
+        try:
+            handler = self._handlers.get(operation)
+            if handler is None:
+                raise ValueError(f"Unknown op: {operation!r}")
+            response = await handler(request)
+            response["ok"] = True
+        except Exception as exc:
+            # Any handler failure is answered on the connection rather than ending it.
+            response = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        self.latency.record(operation if operation in self._handlers else "invalid",
+                            time.perf_counter() - start)
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    async def _new_game(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        session = GameSession(request.get("fen", STARTING_FEN))
+        game_id = self._next_game_id
+        self._next_game_id += 1
+        self._games[game_id] = session
+        return {"game": game_id, "fen": session.board.to_fen()}
+
+    async def _move(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        session = self._session(request)
+        text = str(request.get("move", ""))
+        async with session.lock:
+            board = session.board
+            if self._executor_kind == "process":
+                uci, san, status = await self._run(validate_move_fen, board.to_fen(), text)
+                board.make_move(Move.from_uci(uci))
+                if status == ONGOING:
+                    status = board.game_status()
+            elif self._executor_kind == "thread":
+                uci, san, status = await self._run(apply_move, board, text)
+            else:
+                uci, san, status = apply_move(board, text)
+            return {"game": request["game"], "move": uci, "san": san, "status": status,
+                    "fen": board.to_fen()}
+
+    async def _legal_moves(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        # Batched: one executor round trip answers for every game in the request.
+        game_ids = request.get("games")
+        if game_ids is None:
+            game_ids = [request.get("game")]
+        sessions = [self._session({"game": game_id}) for game_id in game_ids]
+        # Locks are taken once per game in id order, so overlapping batches cannot deadlock.
+        locked = [self._games[game_id] for game_id in sorted(set(game_ids))]
+        for session in locked:
+            await session.lock.acquire()
+        try:
+            boards = [session.board for session in sessions]
+            if self._executor_kind == "process":
+                moves = await self._run(legal_moves_fens, [board.to_fen() for board in boards])
+            else:
+                moves = await self._run(_legal_moves_for_boards, boards)
+        finally:
+            for session in locked:
+                session.lock.release()
+        return {"moves": {str(game_id): game_moves for game_id, game_moves in zip(game_ids, moves)}}
+
+    async def _state(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        session = self._session(request)
+        async with session.lock:
+            board = session.board
+            return {"game": request["game"], "fen": board.to_fen(), "status": board.game_status(),
+                    "moves": [move.uci() for move in board.move_stack]}
+
+    async def _close_game(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self._session(request)
+        del self._games[request["game"]]
+        return {"game": request["game"]}
+
+    async def _metrics(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return {"games": self.game_count, "latency": self.latency.summary()}
+
+    async def serve_connection(self, reader: asyncio.StreamReader,
+                               writer: asyncio.StreamWriter) -> None:
+        # Newline-delimited JSON: one request object per line, one response line each.
+        try:
+            while True:
+                try:
+                    # readline() raises ValueError for a line over the stream limit, after
+                    # discarding it, so that is answered like any other malformed request.
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as exc:
+                    response = {"ok": False, "error": f"Bad request: {exc}"}
+                else:
+                    response = await self.handle(request)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def _legal_moves_for_boards(boards: Sequence[ChessBoard]) -> List[List[str]]:
+    return [legal_moves_uci(board) for board in boards]
+
+
+async def serve(host: str = "127.0.0.1", port: int = DEFAULT_PORT, executor_kind: str = "thread",
+                workers: Optional[int] = None,
+                ready: Optional[Callable[[int], None]] = None) -> None:
+    game_host = GameHost(executor_kind, workers)
+    server = await asyncio.start_server(game_host.serve_connection, host, port, limit=1 << 20)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        game_host.close()
+
+
+class Client:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> 'Client':
+        reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+        return cls(reader, writer)
+
+    async def request(self, op: str, **fields) -> Dict[str, Any]:
+        self._next_id += 1
+        self._writer.write(json.dumps({"id": self._next_id, "op": op, **fields}).encode() + b"\n")
+        await self._writer.drain()
+        response = json.loads(await self._reader.readline())
+        if not response.get("ok"):
+            raise ValueError(response.get("error"))
+        return response
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+async def _load_client(host: str, port: int, games: int, max_plies: int, rng: random.Random,
+                       latencies: List[float]) -> int:
+    # One simulated client: keeps `games` games going, asks for their legal moves in one
+    # batch, then plays a random move in each until every game is over.
+    client = await Client.connect(host, port)
+    moves_played = 0
+    try:
+        active = [(await client.request("new_game"))["game"] for _ in range(games)]
+        plies = 0
+        while active and plies < max_plies:
+            legal = (await client.request("legal_moves", games=active))["moves"]
+            still_active = []
+            for game_id in active:
+                choices = legal[str(game_id)]
+                if not choices:
+                    continue
+                start = time.perf_counter()
+                response = await client.request("move", game=game_id, move=rng.choice(choices))
+                latencies.append(time.perf_counter() - start)
+                moves_played += 1
+                if response["status"] == ONGOING:
+                    still_active.append(game_id)
+            active = still_active
+            plies += 1
+        for game_id in active:
+            await client.request("close_game", game=game_id)
+    finally:
+        await client.close()
+    return moves_played
+
+
+async def run_load(host: str, port: int, clients: int, games: int, max_plies: int,
+                   seed: int = 0) -> Dict[str, Any]:
+    latencies: List[float] = []
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    moves = await asyncio.gather(*[
+        _load_client(host, port, games, max_plies, random.Random(rng.random()), latencies)
+        for _ in range(clients)])
+    seconds = time.perf_counter() - start
+    metrics_client = await Client.connect(host, port)
+    try:
+        server_metrics = await metrics_client.request("metrics")
+    finally:
+        await metrics_client.close()
+    ordered = sorted(latencies)
+    return {"clients": clients,
+            "games": clients * games,
+            "moves": sum(moves),
+            "seconds": seconds,
+            "moves_per_second": sum(moves) / seconds if seconds > 0 else 0.0,
+            "client_p50_ms": percentile(ordered, 50) * 1000,
+            "client_p99_ms": percentile(ordered, 99) * 1000,
+            "server": server_metrics["latency"]}
+
+
+def print_load_report(report: Dict[str, Any]) -> None:
+    print(f"{report['clients']} clients, {report['games']:,} games, {report['moves']:,} moves "
+          f"in {report['seconds']:.2f}s ({report['moves_per_second']:,.0f} moves/s)")
+    print(f"client move latency: p50 {report['client_p50_ms']:.2f} ms, "
+          f"p99 {report['client_p99_ms']:.2f} ms")
+    for operation, stats in sorted(report["server"].items()):
+        print(f"  server {operation:<12} {stats['count']:>9,}  p50 {stats['p50_ms']:7.3f} ms  "
+              f"p99 {stats['p99_ms']:7.3f} ms  max {stats['max_ms']:7.3f} ms")
+
+
+async def _bench(args: argparse.Namespace) -> Dict[str, Any]:
+    # Starts a host on an ephemeral port in this process and drives it with the load generator.
+    ready = asyncio.get_running_loop().create_future()
+    server_task = asyncio.create_task(serve("127.0.0.1", 0, args.executor, args.workers,
+                                            ready=ready.set_result))
+    port = await ready
+    try:
+        return await run_load("127.0.0.1", port, args.clients, args.games, args.max_plies,
+                              args.seed)
+    finally:
+        server_task.cancel()
+        try:
+            await server_task
+        except asyncio.CancelledError:
+            pass
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Asyncio JSON-over-TCP host for many games.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="run the game host")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    load_parser = subparsers.add_parser("load", help="drive a running host with simulated clients")
+    load_parser.add_argument("--host", default="127.0.0.1")
+    load_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    bench_parser = subparsers.add_parser("bench", help="start a host in-process and load it")
+
+    for sub in (serve_parser, bench_parser):
+        sub.add_argument("--executor", choices=EXECUTOR_KINDS, default="thread",
+                         help="where legality checks run")
+        sub.add_argument("--workers", type=int, help="executor workers")
+    for sub in (load_parser, bench_parser):
+        sub.add_argument("--clients", type=int, default=50, help="simulated clients")
+        sub.add_argument("--games", type=int, default=20, help="games per client")
+        sub.add_argument("--max-plies", type=int, default=200, help="plies per game at most")
+        sub.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        print(f"serving on {args.host}:{args.port} ({args.executor} executor)")
+        try:
+            asyncio.run(serve(args.host, args.port, args.executor, args.workers))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if args.command == "load":
+        report = asyncio.run(run_load(args.host, args.port, args.clients, args.games,
+                                      args.max_plies, args.seed))
+    else:
+        report = asyncio.run(_bench(args))
+    print_load_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
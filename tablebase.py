@@ -0,0 +1,548 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+import numpy as np
+from bitboard import KING_ATTACKS, BLACK_INDEX
+from board import ChessBoard
+from pieces import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, COLOR_NAMES
+from position import Position
+
+# Endgame tables built by retrograde analysis. A table covers one material signature
+# ("KQvK", "KRvKP", ...) with the stronger side as white; positions with the colours the
+# other way round are probed through the mirrored board. Each position maps to an index
+#
+#     ((turn * K + king slot) * 64 + square of piece 1) * 64 + ...
+#
+# after a symmetry moves the white king into a fundamental region (the a1-d1-d4 triangle
+# without pawns, files a-d with them), so a probe is a few multiplications and two reads.
+# <signature>.wdl packs a 2-bit result per index and <signature>.dtm holds the distance to
+# mate in plies, both memory-mapped. Castling rights and en passant are not covered, so
+# material with pawns on both sides, where en passant can arise, has no tables.
+ILLEGAL, LOSS, DRAW, WIN = 0, 1, 2, 3
+UNKNOWN = 255
+TABLE_HEADER = struct.Struct("<8s16sQB7x")
+WDL_MAGIC = b"CCTBWDL1"
+DTM_MAGIC = b"CCTBDTM1"
+SIGNATURE_LETTERS = "QRBNP"
+LETTER_TYPES = {"P": PAWN, "N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN}
+PIECE_SIGNATURE_LETTERS = "PNBRQ"
+LETTER_VALUES = {"P": 1, "N": 3, "B": 3, "R": 5, "Q": 9}
+DEFAULT_SIGNATURES = ("KQvK", "KRvK", "KPvK", "KBNvK")
+MAX_PIECES = 4
+
+
+class TablebaseEntry(NamedTuple):
+    # wdl from the side to move: 1 win, 0 draw, -1 loss. dtm counts plies to mate, so a
+    # won position has an odd dtm and a lost one an even dtm (0 when already mated).
+    wdl: int
+    dtm: int
+
+
+class BuildReport(NamedTuple):
+    signature: str
+    entries: int
+    legal: int
+    wins: int
+    draws: int
+    losses: int
+    max_dtm: int
+    scan_seconds: float
+    solve_seconds: float
+    file_bytes: int
+
+
+def _sorted_letters(letters: Iterable[str]) -> str:
+    return "".join(sorted(letters, key=SIGNATURE_LETTERS.index))
+
+
+def _strength(letters: str) -> Tuple[int, List[int]]:
+    return sum(LETTER_VALUES[letter] for letter in letters), \
+        [-SIGNATURE_LETTERS.index(letter) for letter in letters]
+
+
+def canonical_signature(white: str, black: str) -> Tuple[str, bool]:
+    # (signature, swapped): swapped when black holds the stronger material and the
+    # position has to be mirrored onto the table.
+    white, black = _sorted_letters(white), _sorted_letters(black)
+    if _strength(black) > _strength(white):
+        return f"K{black}vK{white}", True
+    return f"K{white}vK{black}", False
+
+
+def parse_signature(text: str) -> str:
+    # Accepts "KQvK" as well as the shorter "KQK"; the second K starts the black side.
+    text = text.strip().upper()
+    if "V" in text:
+        white, black = text.split("V", 1)
+    else:
+        second_king = text.find("K", 1)
+        if second_king < 0:
+            raise ValueError(f"Invalid material signature: {text!r}")
+        white, black = text[:second_king], text[second_king:]
+    if not white.startswith("K") or not black.startswith("K") or \
+            any(letter not in LETTER_TYPES for letter in white[1:] + black[1:]):
+        raise ValueError(f"Invalid material signature: {text!r}")
+    if len(white) + len(black) > MAX_PIECES:
+        raise ValueError(f"Tables cover at most {MAX_PIECES} pieces: {text!r}")
+    if "P" in white and "P" in black:
+        raise ValueError(f"Tables do not model en passant, so both sides cannot have pawns: "
+                         f"{text!r}")
+    return canonical_signature(white[1:], black[1:])[0]
+
+
+def _transform(x: int, y: int, flip_x: bool, flip_y: bool, swap: bool) -> int:
+    if flip_x:
+        x = 7 - x
+    if flip_y:
+        y = 7 - y
+    if swap:
+        # Reflection in the a1-h8 diagonal: the file and rank trade places.
+        x, y = 7 - y, 7 - x
+    return y * 8 + x
+
+
+def _build_transforms(has_pawns: bool) -> Tuple[List[int], List[List[int]]]:
+    # (allowed king squares, per king square the permutation that brings it there).
+    if has_pawns:
+        options = [(False, False, False), (True, False, False)]
+        allowed = [square for square in range(64) if square & 7 <= 3]
+    else:
+        options = [(flip_x, flip_y, swap) for swap in (False, True)
+                   for flip_y in (False, True) for flip_x in (False, True)]
+        allowed = [square for square in range(64)
+                   if square & 7 <= 3 and square >> 3 >= 4 and 7 - (square >> 3) <= square & 7]
+    allowed_set = set(allowed)
+    transforms = []
+    for king_square in range(64):
+        for option in options:
+            permutation = [_transform(square & 7, square >> 3, *option) for square in range(64)]
+            if permutation[king_square] in allowed_set:
+                transforms.append(permutation)
+                break
+    return allowed, transforms
+
+
+class TableLayout:
+    # Piece order and index arithmetic for one signature: white king, white pieces, black
+    # king, black pieces, each as a bitboard index (colour * 6 + piece type).
+    def __init__(self, signature: str) -> None:
+        white, black = signature.split("v")
+        self.signature = signature
+        self.pieces = [KING] + [LETTER_TYPES[letter] for letter in white[1:]] + \
+            [6 + KING] + [6 + LETTER_TYPES[letter] for letter in black[1:]]
+        self.black_king_slot = len(white)
+        self.pawn_slots = [slot for slot, index in enumerate(self.pieces) if index % 6 == PAWN]
+        self.king_squares, self.transforms = _build_transforms(bool(self.pawn_slots))
+        self.king_slots = [-1] * 64
+        for slot, square in enumerate(self.king_squares):
+            self.king_slots[square] = slot
+        self.size = 2 * len(self.king_squares) * 64 ** (len(self.pieces) - 1)
+
+    def index(self, squares: Sequence[int], turn: int) -> int:
+        transform = self.transforms[squares[0]]
+        number = turn * len(self.king_squares) + self.king_slots[transform[squares[0]]]
+        for square in squares[1:]:
+            number = number * 64 + transform[square]
+        return number
+
+    def decode(self, number: int) -> Tuple[List[int], int]:
+        squares = []
+        for _ in range(len(self.pieces) - 1):
+            number, square = divmod(number, 64)
+            squares.append(square)
+        turn, king_slot = divmod(number, len(self.king_squares))
+        squares.append(self.king_squares[king_slot])
+        squares.reverse()
+        return squares, turn
+
+    def is_valid(self, squares: Sequence[int]) -> bool:
+        # Placement only: distinct squares, kings apart, no pawns on the back ranks.
+        if len(set(squares)) != len(squares):
+            return False
+        if KING_ATTACKS[squares[0]] & (1 << squares[self.black_king_slot]):
+            return False
+        return all(8 <= squares[slot] < 56 for slot in self.pawn_slots)
+
+
+_layouts: Dict[str, TableLayout] = {}
+
+
+def table_layout(signature: str) -> TableLayout:
+    layout = _layouts.get(signature)
+    if layout is None:
+        layout = _layouts[signature] = TableLayout(signature)
+    return layout
+
+
+def table_paths(directory: str, signature: str) -> Tuple[str, str]:
+    base = os.path.join(directory, signature)
+    return base + ".wdl", base + ".dtm"
+
+
+def _open_table(path: str, magic: bytes, signature: str) -> Tuple[mmap.mmap, int]:
+    with open(path, "rb") as stream:
+        mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    found, name, entries, width = TABLE_HEADER.unpack_from(mapped, 0)
+    if found != magic or name.rstrip(b"\0").decode() != signature:
+        mapped.close()
+        raise ValueError(f"{path} is not the {signature} table")
+    return mapped, width
+
+
+class Tablebase:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        # Only tables that exist are cached, so one built later is picked up on next use.
+        self._tables: Dict[str, Tuple[TableLayout, mmap.mmap, mmap.mmap, int]] = {}
+
+    def close(self) -> None:
+        for _, wdl, dtm, _ in self._tables.values():
+            wdl.close()
+            dtm.close()
+        self._tables.clear()
+
+    def has_table(self, signature: str) -> bool:
+        return os.path.exists(table_paths(self.directory, signature)[1])
+
+    def _table(self, signature: str) -> Optional[Tuple[TableLayout, mmap.mmap, mmap.mmap, int]]:
+        table = self._tables.get(signature)
+        if table is None:
+            wdl_path, dtm_path = table_paths(self.directory, signature)
+            if not os.path.exists(dtm_path):
+                return None
+            wdl, _ = _open_table(wdl_path, WDL_MAGIC, signature)
+            dtm, width = _open_table(dtm_path, DTM_MAGIC, signature)
+            table = self._tables[signature] = (table_layout(signature), wdl, dtm, width)
+        return table
+
+    def probe(self, board: ChessBoard) -> Optional[TablebaseEntry]:
+        return board.probe_tablebase(self)
+
+    def probe_placed(self, placed: Sequence[Tuple[int, int]], turn: int) \
+            -> Optional[TablebaseEntry]:
+        # placed holds (square, bitboard index) pairs. None when there is no table for the
+        # material or the placement is not a legal position.
+        if len(placed) > MAX_PIECES:
+            return None
+        white = _sorted_letters(PIECE_SIGNATURE_LETTERS[index] for _, index in placed
+                                if index < KING)
+        black = _sorted_letters(PIECE_SIGNATURE_LETTERS[index - 6] for _, index in placed
+                                if 6 <= index < 6 + KING)
+        if not white and not black:
+            return TablebaseEntry(0, 0)
+        signature, swapped = canonical_signature(white, black)
+        table = self._table(signature)
+        if table is None:
+            return None
+        layout, wdl, dtm, width = table
+
+        if swapped:
+            placed = [(square ^ 56, (index + 6) % 12) for square, index in placed]
+            turn ^= 1
+        squares = []
+        used = set()
+        for index in layout.pieces:
+            for position, (square, placed_index) in enumerate(placed):
+                if placed_index == index and position not in used:
+                    used.add(position)
+                    squares.append(square)
+                    break
+            else:
+                return None
+        number = layout.index(squares, turn)
+
+        code = (wdl[TABLE_HEADER.size + (number >> 2)] >> ((number & 3) << 1)) & 3
+        if code == ILLEGAL:
+            return None
+        if width == 8:
+            distance = dtm[TABLE_HEADER.size + number]
+        else:
+            distance = struct.unpack_from("<H", dtm, TABLE_HEADER.size + number * 2)[0]
+        return TablebaseEntry(code - DRAW, distance)
+
+
+def sub_signatures(signature: str) -> Set[str]:
+    # Tables reached by a capture or a promotion; bare kings need no table.
+    white, black = (side[1:] for side in signature.split("v"))
+    found = set()
+    for own, other, flip in ((white, black, False), (black, white, True)):
+        variants = [own[:i] + own[i + 1:] for i in range(len(own))]
+        variants += [own[:i] + promoted + own[i + 1:] for i, letter in enumerate(own)
+                     if letter == "P" for promoted in "QRBN"]
+        for variant in variants:
+            if variant or other:
+                found.add(canonical_signature(other, variant)[0] if flip
+                          else canonical_signature(variant, other)[0])
+    found.discard(signature)
+    return found
+
+
+class ScanResult(NamedTuple):
+    start: int
+    move_counts: np.ndarray
+    mated: np.ndarray
+    # child << 32 | parent for every move that stays in the table.
+    edges: np.ndarray
+    # Moves into another table: parent, result of the child for the side to move there,
+    # and the child's dtm.
+    seed_parents: np.ndarray
+    seed_results: np.ndarray
+    seed_dtms: np.ndarray
+
+
+_worker_board: Optional[ChessBoard] = None
+_worker_tablebase: Optional[Tablebase] = None
+
+
+def scan_range(signature: str, directory: str, start: int, stop: int) -> ScanResult:
+    # Forward pass over [start, stop): every legal position is set up on a board and its
+    # moves come from the board's own generator. Moves that capture or promote are looked
+    # up in the smaller tables built before this one.
+    global _worker_board, _worker_tablebase
+    if _worker_board is None:
+        _worker_board = ChessBoard()
+    if _worker_tablebase is None or _worker_tablebase.directory != directory:
+        _worker_tablebase = Tablebase(directory)
+    board = _worker_board
+    tablebase = _worker_tablebase
+    layout = table_layout(signature)
+    pieces = layout.pieces
+    black_king_slot = layout.black_king_slot
+
+    move_counts = np.full(stop - start, -1, dtype=np.int16)
+    mated = array("q")
+    edges = array("Q")
+    seed_parents = array("q")
+    seed_results = array("B")
+    seed_dtms = array("H")
+    for number in range(start, stop):
+        squares, turn = layout.decode(number)
+        if not layout.is_valid(squares):
+            continue
+        bitboards = [0] * 12
+        for index, square in zip(pieces, squares):
+            bitboards[index] |= 1 << square
+        board.set_position(Position(tuple(bitboards), turn, 0, None, 0, 1, 0))
+        their_king = squares[0] if turn == BLACK_INDEX else squares[black_king_slot]
+        if board.is_square_attacked(their_king, COLOR_NAMES[turn]):
+            continue
+
+        moves = board.generate_legal_moves()
+        move_counts[number - start] = len(moves)
+        if not moves:
+            if board.is_check():
+                mated.append(number)
+            continue
+        for from_square, to_square, promotion in moves:
+            slot = squares.index(from_square)
+            if promotion is None and to_square not in squares:
+                child = list(squares)
+                child[slot] = to_square
+                edges.append(layout.index(child, turn ^ 1) << 32 | number)
+                continue
+            placed = [(square, index) for square, index in zip(squares, pieces)
+                      if square != from_square and square != to_square]
+            placed.append((to_square, pieces[slot] if promotion is None
+                           else pieces[slot] - PAWN + promotion))
+            entry = tablebase.probe_placed(placed, turn ^ 1)
+            if entry is None:
+                raise ValueError(f"{signature} needs a table that has not been built")
+            if entry.wdl:
+                seed_parents.append(number)
+                seed_results.append(WIN if entry.wdl > 0 else LOSS)
+                seed_dtms.append(entry.dtm)
+    return ScanResult(start, move_counts, np.frombuffer(mated, dtype=np.int64),
+                      np.frombuffer(edges, dtype=np.uint64),
+                      np.frombuffer(seed_parents, dtype=np.int64),
+                      np.frombuffer(seed_results, dtype=np.uint8),
+                      np.frombuffer(seed_dtms, dtype=np.uint16))
+
+
+def _gather_parents(nodes: np.ndarray, offsets: np.ndarray, parents: np.ndarray) -> np.ndarray:
+    starts = offsets[nodes]
+    lengths = offsets[nodes + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    within = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return parents[np.repeat(starts, lengths) + within]
+
+
+def solve(size: int, scans: Sequence[ScanResult]) -> Tuple[np.ndarray, np.ndarray]:
+    # Retrograde pass in order of increasing distance. A position whose child is lost at
+    # distance t is won at t + 1, the first time that happens; a position is lost at t + 1
+    # once its last child turns out to be won at t. Moves into smaller tables enter the
+    # same sweep at their known distance. Whatever is left undecided is a draw.
+    move_counts = np.concatenate([scan.move_counts for scan in scans]).astype(np.int32)
+    edges = np.concatenate([scan.edges for scan in scans])
+    edges.sort()
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount((edges >> np.uint64(32)).astype(np.int64), minlength=size),
+              out=offsets[1:])
+    parents = (edges & np.uint64(0xFFFF_FFFF)).astype(np.int32)
+    del edges
+
+    results = np.where(move_counts < 0, ILLEGAL, UNKNOWN).astype(np.uint8)
+    distances = np.zeros(size, dtype=np.int32)
+    mated = np.concatenate([scan.mated for scan in scans])
+    results[mated] = LOSS
+    results[(move_counts == 0) & (results == UNKNOWN)] = DRAW
+
+    seed_parents = np.concatenate([scan.seed_parents for scan in scans])
+    seed_results = np.concatenate([scan.seed_results for scan in scans])
+    seed_dtms = np.concatenate([scan.seed_dtms for scan in scans]).astype(np.int64)
+    last_seed = int(seed_dtms.max()) if len(seed_dtms) else -1
+
+    remaining = move_counts
+    lost = mated
+    won = np.empty(0, dtype=np.int64)
+    t = 0
+    while len(lost) or len(won) or t <= last_seed:
+        at_t = seed_dtms == t
+        candidates = np.concatenate([_gather_parents(lost, offsets, parents),
+                                     seed_parents[at_t & (seed_results == LOSS)]])
+        candidates = np.unique(candidates[results[candidates] == UNKNOWN])
+        results[candidates] = WIN
+        distances[candidates] = t + 1
+
+        refuted = np.concatenate([_gather_parents(won, offsets, parents),
+                                  seed_parents[at_t & (seed_results == WIN)]])
+        refuted = refuted[results[refuted] == UNKNOWN]
+        nodes, counts = np.unique(refuted, return_counts=True)
+        remaining[nodes] -= counts
+        lost = nodes[remaining[nodes] == 0]
+        results[lost] = LOSS
+        distances[lost] = t + 1
+        won = candidates
+        t += 1
+    results[results == UNKNOWN] = DRAW
+    return results, distances
+
+
+def write_table(directory: str, signature: str, results: np.ndarray,
+                distances: np.ndarray) -> int:
+    wdl_path, dtm_path = table_paths(directory, signature)
+    codes = results.reshape(-1, 4)
+    packed = (codes[:, 0] | (codes[:, 1] << 2) | (codes[:, 2] << 4) | (codes[:, 3] << 6))
+    width = 8 if distances.max(initial=0) < 256 else 16
+    name = signature.encode()
+    # The .dtm file is written last: its presence marks the table as complete.
+    for path, magic, bits, data in ((wdl_path, WDL_MAGIC, 2, packed.astype(np.uint8)),
+                                    (dtm_path, DTM_MAGIC, width,
+                                     distances.astype(np.uint8 if width == 8 else "<u2"))):
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as stream:
+            stream.write(TABLE_HEADER.pack(magic, name, len(results), bits))
+            stream.write(data.tobytes())
+        os.replace(temporary, path)
+    return os.path.getsize(wdl_path) + os.path.getsize(dtm_path)
+
+
+def _ranges(size: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, size, chunk_size):
+        yield start, min(start + chunk_size, size)
+
+
+def build_table(signature: str, directory: str, executor: Optional[Executor] = None,
+                chunk_size: int = 16_384) -> BuildReport:
+    signature = parse_signature(signature)
+    layout = table_layout(signature)
+    start_time = time.perf_counter()
+    ranges = list(_ranges(layout.size, chunk_size))
+    if executor is None:
+        scans = [scan_range(signature, directory, start, stop) for start, stop in ranges]
+    else:
+        scans = list(executor.map(scan_range, [signature] * len(ranges),
+                                  [directory] * len(ranges), *zip(*ranges)))
+    scan_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    results, distances = solve(layout.size, scans)
+    del scans
+    file_bytes = write_table(directory, signature, results, distances)
+    solve_seconds = time.perf_counter() - start_time
+    counts = np.bincount(results, minlength=4)
+    return BuildReport(signature, layout.size, int(counts[LOSS] + counts[DRAW] + counts[WIN]),
+                       int(counts[WIN]), int(counts[DRAW]), int(counts[LOSS]),
+                       int(distances.max(initial=0)), scan_seconds, solve_seconds, file_bytes)
+
+
+def build_order(signatures: Iterable[str], directory: str, rebuild: bool = False) -> List[str]:
+    # Requested tables plus any missing tables they depend on, dependencies first.
+    tablebase = Tablebase(directory)
+    order: List[str] = []
+    requested = [parse_signature(signature) for signature in signatures]
+
+    def visit(signature: str, explicit: bool) -> None:
+        if signature in order or (tablebase.has_table(signature) and not (explicit and rebuild)):
+            return
+        for dependency in sorted(sub_signatures(signature)):
+            visit(dependency, False)
+        order.append(signature)
+
+    for signature in requested:
+        visit(signature, True)
+    return order
+
+
+def build_tables(signatures: Iterable[str], directory: str, workers: int = 1,
+                 rebuild: bool = False, chunk_size: int = 16_384) -> Iterator[BuildReport]:
+    os.makedirs(directory, exist_ok=True)
+    order = build_order(signatures, directory, rebuild)
+    if workers <= 1:
+        for signature in order:
+            yield build_table(signature, directory, chunk_size=chunk_size)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for signature in order:
+            yield build_table(signature, directory, executor, chunk_size)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Retrograde endgame tables.")
+    parser.add_argument("--directory", default="tablebases", help="where the tables live")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="generate tables (and missing dependencies)")
+    build.add_argument("signatures", nargs="*", default=list(DEFAULT_SIGNATURES),
+                       help="material such as KQvK or KRKP (default: %(default)s)")
+    build.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                       help="worker processes for the forward scan")
+    build.add_argument("--chunk-size", type=int, default=16_384, help="positions per work item")
+    build.add_argument("--rebuild", action="store_true", help="regenerate existing tables")
+    probe = commands.add_parser("probe", help="look up a position")
+    probe.add_argument("fen")
+    args = parser.parse_args(argv)
+
+    if args.command == "probe":
+        board = ChessBoard.from_fen(args.fen)
+        entry = board.probe_tablebase(Tablebase(args.directory))
+        if entry is None:
+            print("not in the tables")
+            return 1
+        print(f"{('loss', 'draw', 'win')[entry.wdl + 1]}, mate in {entry.dtm} plies"
+              if entry.wdl else "draw")
+        return 0
+
+    total_bytes = 0
+    total_seconds = 0.0
+    for report in build_tables(args.signatures, args.directory, args.workers, args.rebuild,
+                               args.chunk_size):
+        seconds = report.scan_seconds + report.solve_seconds
+        total_bytes += report.file_bytes
+        total_seconds += seconds
+        print(f"{report.signature:<8} {report.legal:>10,} legal of {report.entries:>10,}: "
+              f"+{report.wins:,} ={report.draws:,} -{report.losses:,}, max dtm "
+              f"{report.max_dtm} plies, {seconds:.1f}s (scan {report.scan_seconds:.1f}s, "
+              f"solve {report.solve_seconds:.1f}s), {report.file_bytes:,} bytes")
+    print(f"total: {total_seconds:.1f}s, {total_bytes:,} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
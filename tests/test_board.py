@@ -0,0 +1,52 @@
+from board import ChessBoard
+
+
+def test_en_passant_only_for_the_capturing_colour():
+    # White to move after ...e7-e5: e6 is white's en passant square. Black's d7 pawn also
+    # attacks e6, but asking for black's moves must not turn that into a capture.
+    board = ChessBoard.from_fen("4k3/3p4/8/3Pp3/8/8/8/4K3 w - e6 0 2")
+    assert board.en_passant_square is not None
+    black_moves = {move.uci() for move in board.generate_legal_moves("black")}
+    white_moves = {move.uci() for move in board.generate_legal_moves("white")}
+    assert "d7e6" not in black_moves
+    assert {"d7d6", "e8d8"} <= black_moves
+    assert "d5e6" in white_moves
+
+
+def test_board_state_view_is_live_while_held_and_freed_after():
+    board = ChessBoard()
+    view = board.board_state
+    board.push_san("e4")
+    assert view[(4, 4)] is board.piece_at(36) and view[(4, 6)] is None
+    assert board.board_state is view
+    del view
+    assert board._live_view() is None
+    assert board.board_state[(4, 4)] is board.piece_at(36)
+
+
+def test_unmake_without_moves_raises():
+    board = ChessBoard()
+    try:
+        board.unmake_move()
+    except IndexError:
+        pass
+    else:
+        raise AssertionError("expected IndexError")
+    assert board.move_stack == [] and board.repetition_count() == 1
+
+
+def test_board_state_setter_starts_a_new_history():
+    board = ChessBoard()
+    for san in ("e4", "d5", "e5", "f5"):
+        board.push_san(san)
+    assert board.en_passant_square is not None
+    board.board_state = dict(ChessBoard().board_state)
+    assert board.move_stack == [] and board.en_passant_square is None
+    assert board.zobrist_hash == board.compute_zobrist_hash()
+    try:
+        board.unmake_move()
+    except IndexError:
+        pass
+    else:
+        raise AssertionError("expected IndexError")
+    assert len(board.generate_legal_moves()) == 20
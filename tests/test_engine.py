@@ -0,0 +1,16 @@
+from board import ChessBoard
+from engine import Engine
+from move import Move
+
+
+def test_en_passant_is_ordered_and_recorded_as_a_capture():
+    # After ...d7-d5 the e5 pawn can take en passant on d6; it is the only capture.
+    board = ChessBoard.from_fen("4k3/8/8/3pP3/8/8/8/4K2R w K d6 0 2")
+    en_passant = Move.from_uci("e5d6")
+    engine = Engine()
+    ordered = engine._order_moves(board, board.generate_legal_moves(), 0)
+    assert ordered[0] == en_passant
+
+    engine.search(board, max_depth=4)
+    assert en_passant not in engine._history
+    assert all(en_passant not in killers for killers in engine._killers)
@@ -0,0 +1,35 @@
+from pgn import iter_pgn_games, movetext_tokens, replay_game
+
+
+def _games(text):
+    return list(iter_pgn_games(text.splitlines()))
+
+
+def test_wrapped_clock_comment_stays_in_movetext():
+    games = _games('[Event "a"]\n[Result "1-0"]\n\n1. e4 { \n[%clk 0:05:00] } e5 2. Qh5 Nc6 {\n'
+                   '[%clk 0:04:58] }\n3. Bc4 Nf6 4. Qxf7# 1-0\n')
+    assert len(games) == 1
+    assert games[0].headers == {"Event": "a", "Result": "1-0"}
+    board = None
+    for board in replay_game(games[0]):
+        pass
+    assert board is not None and board.is_checkmate()
+
+
+def test_games_without_headers_split_on_result():
+    games = _games("1. e4 e5 1-0\n\n1. d4 d5 0-1\n1. c4 *\n")
+    assert [game.movetext for game in games] == ["1. e4 e5 1-0", "1. d4 d5 0-1", "1. c4 *"]
+
+
+def test_result_inside_comment_does_not_end_the_game():
+    games = _games('[Event "b"]\n\n1. e4 {White resigned? no, 1-0\nwas a typo} e5 1/2-1/2\n'
+                   '[Event "c"]\n\n1. d4 *\n')
+    assert [game.headers["Event"] for game in games] == ["b", "c"]
+    assert games[0].movetext.endswith("e5 1/2-1/2")
+
+
+def test_rest_of_line_comment_ends_at_the_line():
+    games = _games('[Event "d"]\n\n1. e4 e5 ; king pawn\n2. Nf3 Nc6 3. Bb5 a6 *\n')
+    assert len(games) == 1
+    assert movetext_tokens(games[0].movetext) == ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6"]
+    assert sum(1 for _ in replay_game(games[0])) == 6
@@ -0,0 +1,57 @@
+import copy
+import pickle
+from board import ChessBoard
+from piece_list import PieceList
+from pieces import Knight, Pawn, Rook
+
+
+def test_pieces_shared_between_lists_keep_separate_slots():
+    pawns = [Pawn(x, 6, "white") for x in range(3)]
+    rook = Rook(0, 7, "white")
+    first = PieceList(pawns + [rook])
+    second = PieceList(reversed(pawns))
+
+    first.remove(pawns[0])
+    assert list(first) == [pawns[2], pawns[1], rook]
+    assert list(second) == [pawns[2], pawns[1], pawns[0]]
+
+    second.remove(pawns[2])
+    assert pawns[2] in first and pawns[2] not in second
+    first.remove(pawns[1])
+    assert list(first) == [pawns[2], rook]
+    assert list(second) == [pawns[0], pawns[1]]
+
+
+def test_board_setter_shares_pieces_with_another_board():
+    source = ChessBoard()
+    target = ChessBoard()
+    target.white_pieces = source.white_pieces
+    pawn = source.white_pieces[0]
+
+    source.white_pieces.remove(pawn)
+    assert pawn not in source.white_pieces
+    assert pawn in target.white_pieces
+    assert len(source.white_pieces) == 15 and len(target.white_pieces) == 16
+    assert len(set(map(id, source.white_pieces))) == 15
+
+
+def test_indexing_follows_iteration_order():
+    knight = Knight(1, 7, "white")
+    pawn = Pawn(0, 6, "white")
+    pieces = PieceList([knight, pawn])
+    assert pieces[0] is pawn and pieces[1] is knight and pieces[-1] is knight
+    assert pieces[:] == [pawn, knight]
+    try:
+        pieces[2]
+    except IndexError:
+        pass
+    else:
+        raise AssertionError("expected IndexError")
+
+
+def test_copies_are_independent():
+    pieces = ChessBoard().black_pieces
+    for duplicate in (copy.deepcopy(pieces), pickle.loads(pickle.dumps(pieces))):
+        assert len(duplicate) == 16
+        duplicate.remove(duplicate[3])
+        assert len(duplicate) == 15 and len(pieces) == 16
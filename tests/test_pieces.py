@@ -0,0 +1,13 @@
+from board import ChessBoard
+
+
+def test_legacy_pawn_moves_from_the_seventh_rank():
+    board = ChessBoard.from_fen("4k3/P7/8/8/8/8/7p/4K3 w - - 0 1")
+    state = board.board_state
+    for color, square, push in (("white", (0, 1), (0, 0)), ("black", (7, 6), (7, 7))):
+        own = board.pieces(color)
+        enemy = board.pieces("black" if color == "white" else "white")
+        pawn = state[square]
+        moves = pawn.get_possible_moves(pieces_pos=state, enemy_pieces=enemy, own_pieces=own,
+                                        own_king=own.king)
+        assert push in moves
@@ -0,0 +1,52 @@
+from board import ChessBoard
+from posdb import PositionDatabase, RECORD, WHITE_WIN, add_games
+
+
+def _positions():
+    board = ChessBoard()
+    yield board
+    for san in ("e4", "e5", "Nf3"):
+        board.push_san(san)
+        yield board
+
+
+def test_partial_trailing_record_is_dropped_on_open(tmp_path):
+    path = str(tmp_path / "db")
+    with PositionDatabase(path) as database:
+        for board in _positions():
+            database.append(board, WHITE_WIN)
+    with open(path + ".dat", "ab") as stream:
+        stream.write(b"\0" * (RECORD.size // 2))
+    with PositionDatabase(path) as database:
+        assert len(database) == 4
+        database.append(ChessBoard(), WHITE_WIN)
+        assert len(list(database.iter_records())) == 5
+        assert database.record(4).position == ChessBoard().to_bytes()
+        assert database.build_index() == 5
+        assert database.stats(ChessBoard()).count == 2
+
+
+def test_close_while_iterating(tmp_path):
+    database = PositionDatabase(str(tmp_path / "db"))
+    for board in _positions():
+        database.append(board)
+    records = database.iter_records()
+    assert next(records).position == ChessBoard().to_bytes()
+    database.record(0)
+    database.close()
+    assert len(list(records)) == 3
+    records = PositionDatabase(str(tmp_path / "db")).iter_records(2)
+    next(records)
+    records.close()
+
+
+def test_add_games_stores_starting_positions(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text('[Result "1-0"]\n\n1. e4 e5 1-0\n\n'
+                        '[Result "0-1"]\n[FEN "4k3/8/8/8/8/8/8/4K2R w K - 0 1"]\n\n1. Rh8+ Kd7 0-1\n')
+    with PositionDatabase(str(tmp_path / "db")) as database:
+        summary = add_games(database, [str(pgn_path)])
+        assert summary == {"games": 2, "positions": 6, "errors": 0}
+        assert database.stats(ChessBoard()).white_wins == 1
+        start = ChessBoard.from_fen("4k3/8/8/8/8/8/8/4K2R w K - 0 1")
+        assert database.stats(start).black_wins == 1
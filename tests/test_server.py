@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from server import GameHost
+
+
+class _Writer:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.extend(json.loads(line) for line in data.splitlines())
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_unexpected_handler_error_becomes_error_response():
+    async def broken(request):
+        raise RuntimeError("handler bug")
+
+    host = GameHost("inline")
+    host._handlers["broken"] = broken
+    response = asyncio.run(host.handle({"op": "broken", "id": 7}))
+    assert response == {"ok": False, "error": "RuntimeError: handler bug", "id": 7}
+    assert host.latency.summary()["broken"]["count"] == 1
+    assert asyncio.run(host.handle({"op": "new_game"}))["ok"]
+
+
+def test_connection_survives_errors_and_overlong_lines():
+    async def broken(request):
+        raise IndexError("out of range")
+
+    async def run():
+        host = GameHost("inline")
+        host._handlers["broken"] = broken
+        reader = asyncio.StreamReader(limit=64)
+        reader.feed_data(b'{"op": "broken"}\n' + b'{"op": "' + b"x" * 100 + b'"}\n'
+                         + b'{"op": "new_game"}\n')
+        reader.feed_eof()
+        writer = _Writer()
+        await host.serve_connection(reader, writer)
+        return writer.lines
+
+    lines = asyncio.run(run())
+    assert [line["ok"] for line in lines] == [False, False, True]
+    assert lines[0]["error"] == "IndexError: out of range"
+    assert lines[1]["error"].startswith("Bad request")
@@ -0,0 +1,30 @@
+import pytest
+
+from board import ChessBoard
+from tablebase import Tablebase, build_order, build_table, parse_signature
+
+
+def test_signatures_with_pawns_on_both_sides_are_refused(tmp_path):
+    for text in ("KPvKP", "kpkp"):
+        with pytest.raises(ValueError, match="en passant"):
+            parse_signature(text)
+    with pytest.raises(ValueError, match="en passant"):
+        build_order(["KPvKP"], str(tmp_path))
+    assert parse_signature("KPvKR") == "KRvKP"
+
+
+def test_en_passant_positions_are_not_probed(tmp_path):
+    board = ChessBoard.from_fen("8/8/8/3pP3/8/8/8/K6k w - d6 0 1")
+    assert board.probe_tablebase(Tablebase(str(tmp_path))) is None
+
+
+def test_build_table_accepts_any_spelling_of_the_signature(tmp_path):
+    report = build_table("kvkr", str(tmp_path))
+    assert report.signature == "KRvK"
+    tablebase = Tablebase(str(tmp_path))
+    assert tablebase.has_table("KRvK")
+    # Black holds the rook, so the position is probed through the mirrored table.
+    entry = tablebase.probe(ChessBoard.from_fen("8/8/8/4k3/8/8/r7/4K3 b - - 0 1"))
+    assert entry is not None and entry.wdl == 1 and entry.dtm > 0
+    entry = tablebase.probe(ChessBoard.from_fen("k7/8/8/8/8/8/6r1/5K2 w - - 0 1"))
+    assert entry is not None and entry.wdl == 0
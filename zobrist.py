@@ -0,0 +1,38 @@
+import random
+from typing import List, Optional
+from bitboard import iter_squares
+
+# Fixed seed so keys (and anything persisted with them) are stable across runs.
+_rng = random.Random(0x5A0B_2157)
+
+PIECE_SQUARE_KEYS = [[_rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+BLACK_TO_MOVE_KEY = _rng.getrandbits(64)
+_CASTLING_RIGHT_KEYS = [_rng.getrandbits(64) for _ in range(4)]
+EN_PASSANT_FILE_KEYS = [_rng.getrandbits(64) for _ in range(8)]
+
+
+def _castling_key(rights: int) -> int:
+    key = 0
+    for bit, right_key in enumerate(_CASTLING_RIGHT_KEYS):
+        if rights >> bit & 1:
+            key ^= right_key
+    return key
+
+
+CASTLING_KEYS = [_castling_key(rights) for rights in range(16)]
+
+
+def en_passant_key(square: Optional[int]) -> int:
+    return 0 if square is None else EN_PASSANT_FILE_KEYS[square & 7]
+
+
+def compute_hash(bitboards: List[int], black_to_move: bool, castling_rights: int,
+                 en_passant_square: Optional[int]) -> int:
+    key = 0
+    for index, bb in enumerate(bitboards):
+        piece_keys = PIECE_SQUARE_KEYS[index]
+        for square in iter_squares(bb):
+            key ^= piece_keys[square]
+    if black_to_move:
+        key ^= BLACK_TO_MOVE_KEY
+    return key ^ CASTLING_KEYS[castling_rights] ^ en_passant_key(en_passant_square)